@@ -2,11 +2,16 @@
 import os
 import threading
 import json
+from typing import Optional
 import pandas as pd
 from coordinates import get_coordinates
+from record import Bolig, load_bolig, save_bolig
 
 OUTPUT_FOLDER_PATH: str = r"./output/part_1"
 file_lock = threading.Lock()
+# The price table, loaded by the first bolig that needs it and shared by the others
+_postal_avg_sqm_price: Optional[dict] = None
+_postal_avg_sqm_price_lock = threading.Lock()
 
 
 def _load_postal_avg_sqm_price() -> dict:
@@ -84,22 +89,29 @@ def _load_postal_avg_sqm_price() -> dict:
     return postal_avg_sqm_price
 
 
-def add_postal_avg_sqm_price(bolig_data: dict) -> dict:
-    """Adds the average square meter price to the bolig data."""
-    if "postal_avg_sqm_price" in bolig_data:
-        return bolig_data
-    postal_avg_sqm_price = _load_postal_avg_sqm_price()
-    postal_code = bolig_data["postal_code"]
-    bolig_data["postal_avg_sqm_price"] = postal_avg_sqm_price.get(postal_code, 0)
-    return bolig_data
-
-def add_coordinates(bolig_data: dict) -> dict:
-    """Adds the coordinates to the bolig data."""
-    if "lat" in bolig_data and "lng" in bolig_data:
-        return bolig_data
-    address: str = bolig_data["address"]
-    bolig_data["lat"], bolig_data["lng"] = get_coordinates(address)
-    if bolig_data["lat"] == 0 or bolig_data["lng"] == 0:
+def _get_postal_avg_sqm_price() -> dict:
+    global _postal_avg_sqm_price  # pylint: disable=global-statement
+    with _postal_avg_sqm_price_lock:
+        if _postal_avg_sqm_price is None:
+            _postal_avg_sqm_price = _load_postal_avg_sqm_price()
+        return _postal_avg_sqm_price
+
+
+def add_postal_avg_sqm_price(bolig: Bolig) -> Bolig:
+    """Adds the average square meter price to the bolig, unless it has been looked up before."""
+    if bolig.is_looked_up("postal_avg_sqm_price"):
+        return bolig
+    bolig.set_postal_avg_sqm_price(_get_postal_avg_sqm_price().get(bolig.postal_code))
+    return bolig
+
+def add_coordinates(bolig: Bolig) -> Bolig:
+    """Adds the coordinates to the bolig, unless they have been looked up before. Addresses
+    without coordinates are counted in address_errors.json once per lookup."""
+    if bolig.is_looked_up("coordinates"):
+        return bolig
+    address: str = bolig.address
+    bolig.set_coordinates(get_coordinates(address))
+    if bolig.lat is None:
         with file_lock:
             with open("address_errors.json", "r", encoding="utf-8") as f:
                 address_errors_file = json.load(f)
@@ -109,8 +121,8 @@ def add_coordinates(bolig_data: dict) -> dict:
                 address_errors_file[address] = 1
             with open("address_errors.json", "w", encoding="utf-8") as f:
                 json.dump(address_errors_file, f, indent=4, ensure_ascii=False)
-    print(f"Coordinates for {address}: {bolig_data['lat'], bolig_data['lng']}")
-    return bolig_data
+    print(f"Coordinates for {address}: {bolig.lat, bolig.lng}")
+    return bolig
 
 
 def add_new_features(bolig_folder: str) -> None:
@@ -120,12 +132,10 @@ def add_new_features(bolig_folder: str) -> None:
         return
 
     data_path = os.path.join(folder_path, "data.json")
-    with open(data_path, "r", encoding="utf-8") as file:
-        bolig_data = json.load(file)
-    bolig_data = add_postal_avg_sqm_price(bolig_data)
-    bolig_data = add_coordinates(bolig_data)
-    with open(data_path, "w", encoding="utf-8") as file:
-        json.dump(bolig_data, file, indent=4, ensure_ascii=False)
+    bolig = load_bolig(data_path)
+    bolig = add_postal_avg_sqm_price(bolig)
+    bolig = add_coordinates(bolig)
+    save_bolig(data_path, bolig)
 
 
 if __name__ == "__main__":
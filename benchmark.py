@@ -0,0 +1,180 @@
+"""Times the post-processing tools on synthetic data at growing scales and records their peak
+memory, so tools that grow faster than linearly show up before real data reaches that size."""
+
+import argparse
+import csv
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+from synthetic import POSTAL_AVG_SQM_PRICE_PATH, generate
+
+REPO_PATH: Path = Path(__file__).parent.resolve()
+SCALES: tuple = (10_000, 100_000, 1_000_000)
+RESULTS_PATH: str = "benchmark_results.csv"
+
+# The code run for each tool, in a work folder with the synthetic boliger in ./output
+TOOLS: dict = {
+    "converter": "import converter; converter.convert()",
+    "folder_tools": "import folder_tools; folder_tools.maintain('output', dry_run=True)",
+    "duplicate_checker": "import duplicate_checker; duplicate_checker.check_duplicates()",
+    "add_new_features": (
+        "import os, add_new_features as tool; tool.OUTPUT_FOLDER_PATH = 'output'\n"
+        "for folder in os.listdir('output'): tool.add_new_features(folder)"
+    ),
+    "export": "import dataset; dataset.export_dataset('output', 'dataset')",
+    "stats": "import stats; stats.update_stats('output', 'stats.npz', 'stats.csv', rebuild=True)",
+    "manifest": (
+        "import manifest; manifest.write_manifest(manifest.build_manifest('output'), 'manifest.tsv')"
+    ),
+    "splitter": (
+        "import splitter; splitter.INPUT_FOLDER = 'output'; splitter.OUTPUT_FOLDER = 'split'\n"
+        "splitter.split_data(splitter.N, splitter.TRAIN_RATIO, splitter.TEST_RATIO, "
+        "splitter.VALID_RATIO)"
+    ),
+}
+
+
+def _run_tool(code: str, work_dir: Path, log_path: Path, timeout: float) -> tuple:
+    """
+    Runs a tool in a separate process, so its peak memory is its own.
+
+    Returns:
+        tuple: The wall time in seconds, the peak RSS in MiB (None where unsupported) and the
+            status: "ok", "failed" or "timeout".
+    """
+    env: dict = dict(os.environ, PYTHONPATH=str(REPO_PATH))
+    start_time: float = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-c", code], cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        if not hasattr(os, "wait4"):
+            try:
+                returncode: int = process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                return time.perf_counter() - start_time, None, "timeout"
+            return time.perf_counter() - start_time, None, "ok" if returncode == 0 else "failed"
+
+        status: str = "ok"
+        while True:
+            pid, exit_status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.perf_counter() - start_time > timeout:
+                process.send_signal(signal.SIGKILL)
+                _, exit_status, usage = os.wait4(process.pid, 0)
+                status = "timeout"
+                break
+            time.sleep(0.05)
+        process.returncode = 0
+        if status == "ok" and os.waitstatus_to_exitcode(exit_status) != 0:
+            status = "failed"
+    # ru_maxrss is in KiB on Linux
+    return time.perf_counter() - start_time, usage.ru_maxrss / 1024, status
+
+
+def run_scale(count: int, tools: list, work_dir: Path, timeout: float) -> list:
+    """Generates count boliger and runs each tool on them."""
+    print(f"Generating {count} boliger...")
+    generate(str(work_dir / "output"), count)
+    # add_new_features reads the price table from the working folder
+    shutil.copy(POSTAL_AVG_SQM_PRICE_PATH, work_dir)
+    (work_dir / "address_errors.json").write_text("{}", encoding="utf-8")
+
+    results: list = []
+    for tool in tools:
+        print(f"Running {tool} on {count} boliger...")
+        seconds, peak_rss, status = _run_tool(
+            TOOLS[tool], work_dir, work_dir / f"{tool}.log", timeout
+        )
+        results.append(
+            {"tool": tool, "boliger": count, "seconds": seconds, "peak_rss": peak_rss, "status": status}
+        )
+        if status != "ok":
+            print(f"{tool} {status}, see {work_dir / f'{tool}.log'}")
+    return results
+
+
+def _scaling(results: list, result: dict) -> Optional[float]:
+    """The exponent of the growth in time from the previous scale: 1 is linear, 2 quadratic."""
+    previous: list = [
+        other
+        for other in results
+        if other["tool"] == result["tool"] and other["boliger"] < result["boliger"]
+    ]
+    if not previous or result["status"] != "ok" or previous[-1]["status"] != "ok":
+        return None
+    before: dict = previous[-1]
+    if before["seconds"] <= 0:
+        return None
+    return math.log(result["seconds"] / before["seconds"]) / math.log(
+        result["boliger"] / before["boliger"]
+    )
+
+
+def _print_report(results: list) -> None:
+    print(
+        f"{'tool':<18} {'boliger':>9} {'seconds':>9} {'us/bolig':>9} {'growth':>7} "
+        f"{'RSS MiB':>8} {'status':>8}"
+    )
+    for result in results:
+        growth: Optional[float] = _scaling(results, result)
+        peak_rss: str = "n/a" if result["peak_rss"] is None else f"{result['peak_rss']:.0f}"
+        print(
+            f"{result['tool']:<18} {result['boliger']:>9} {result['seconds']:>9.1f} "
+            f"{result['seconds'] / result['boliger'] * 1e6:>9.0f} "
+            f"{'' if growth is None else f'{growth:.2f}':>7} {peak_rss:>8} {result['status']:>8}"
+        )
+
+
+def benchmark(
+    scales: tuple = SCALES,
+    tools: Optional[list] = None,
+    timeout: float = 3600,
+    results_path: Optional[str] = RESULTS_PATH,
+) -> list:
+    """
+    Runs the tools on synthetic data at each scale, in a temporary folder that is removed after.
+
+    Args:
+        scales (tuple): The numbers of boliger.
+        tools (list): The tools to run, see TOOLS. Defaults to all of them.
+        timeout (float): Seconds before a tool is stopped and marked as timed out.
+        results_path (str): Where the results are written as csv. None to not write them.
+
+    Returns:
+        list: A dict for each tool and scale.
+    """
+    tools = list(TOOLS) if tools is None else tools
+    results: list = []
+    for count in sorted(scales):
+        with tempfile.TemporaryDirectory(prefix="nybolig-benchmark-") as temp_dir:
+            results += run_scale(count, tools, Path(temp_dir), timeout)
+        _print_report(results)
+
+    if results_path is not None:
+        with open(results_path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, ["tool", "boliger", "seconds", "peak_rss", "status"])
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Results written to {results_path}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tools on synthetic data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES))
+    parser.add_argument("--tools", nargs="+", choices=list(TOOLS))
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--results-path", default=RESULTS_PATH)
+    args = parser.parse_args()
+    benchmark(tuple(args.scales), args.tools, args.timeout, args.results_path)
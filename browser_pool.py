@@ -0,0 +1,76 @@
+"""A bounded pool of long-lived headless browser sessions for sites that need JS to render."""
+
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from selenium import webdriver
+
+
+def headless_chrome() -> webdriver.Chrome:
+    """Starts a headless Chrome session."""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    return webdriver.Chrome(options=options)
+
+
+class BrowserPool:
+    """
+    Leases browser sessions to workers. At most `size` sessions exist at once, and workers wait
+    for a free session when all are leased. Sessions are started on first use, and are quit and
+    replaced after `max_pages` pages or when a page fails.
+
+    Args:
+        size (int): The maximum number of sessions.
+        max_pages (int): The number of pages a session serves before it is recycled.
+        factory (Callable): Starts a new session. Defaults to headless Chrome, but anything with
+            the used parts of the WebDriver interface can be passed, e.g. a fake driver in tests.
+    """
+
+    def __init__(
+        self, size: int, max_pages: int, factory: Optional[Callable] = None
+    ) -> None:
+        self._factory: Callable = factory or headless_chrome
+        self._max_pages: int = max_pages
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: queue.Queue = queue.Queue()
+
+    @contextmanager
+    def lease(self) -> Iterator:
+        """Leases a session for a single page."""
+        with self._slots:
+            try:
+                driver, pages = self._idle.get_nowait()
+            except queue.Empty:
+                driver, pages = self._factory(), 0
+
+            try:
+                yield driver
+            except Exception:
+                # The session may be in a broken state, so it is not reused
+                self._quit(driver)
+                raise
+
+            pages += 1
+            if pages >= self._max_pages:
+                self._quit(driver)
+            else:
+                self._idle.put((driver, pages))
+
+    def close(self) -> None:
+        """Quits all idle sessions. The pool starts new sessions if it is used again."""
+        while True:
+            try:
+                driver, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+    @staticmethod
+    def _quit(driver) -> None:
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Could not quit browser session: {e}")
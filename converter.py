@@ -1,23 +1,25 @@
 """Converts the jsons from the output folder to a single csv file"""
-import json
 from pathlib import Path
+from record import FIELD_NAMES, load_bolig
 
 def convert() -> None:
     """Converts the jsons from the output folder to a single csv file"""
-    # Load the json files from the output folder. It is structured as: output/address/1.json
-    jsons = []
-    for json_file in Path("output").rglob("*.json"):
-        with open(json_file, "r", encoding="utf-8") as file:
-            jsons.append(json.load(file))
+    # Load the json files from the output folder. It is structured as: output/listing_id/data.json
+    boliger = []
+    for json_file in Path("output").rglob("data.json"):
+        try:
+            boliger.append(load_bolig(json_file))
+        except ValueError:
+            print(f"Skipping invalid json: {json_file}")
 
     print("Converting jsons to csv...")
-    print(f"Found {len(jsons)} boliger (json files).")
+    print(f"Found {len(boliger)} boliger (json files).")
 
-    # Convert the jsons to a csv, based on the jsons keys
+    # Convert the boliger to a csv, with a column for each field
     csv = []
-    csv.append(",".join(jsons[0].keys()))
-    for json_data in jsons:
-        csv.append(",".join(str(value) for value in json_data.values()))
+    csv.append(",".join(FIELD_NAMES))
+    for bolig in boliger:
+        csv.append(",".join(str(value) for value in bolig.to_row()))
 
     # Write the csv to a file
     with open("nybolig_data.csv", "w", encoding="utf-8") as csv_file:
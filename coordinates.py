@@ -1,7 +1,24 @@
 """This module is used to get the coordinates of an address using the geoapi.dk API."""
 
+import concurrent.futures
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
 import requests
 
+GEOAPI_URL: str = "http://geoapi.dk/"
+# Sends the GET requests. The scraper replaces it with its hedged session.
+GET: Callable = requests.get
+
+# Responses by query, and the requests currently in flight. Boliger in the same building share
+# their address, or the "street 1" fallback, so the same query is often made concurrently. Only the
+# most recent responses are kept, so a long running --watch does not grow without bound.
+MAX_CACHED_RESPONSES: int = 4096
+_responses: OrderedDict = OrderedDict()
+_in_flight: dict = {}
+_lock = threading.Lock()
+
 MANUAL_COORDINATES_FIRST: dict = {
     "Johan Wilmanns Vej 29 st. th 2800 Kongens Lyngby": (55.764868665793344, 12.50519455796523),
 }
@@ -20,14 +37,43 @@ MANUAL_COORDINATES_SECOND: dict = {
 }
 
 
-def get_coordinates(address: str) -> tuple:
-    """Gets the coordinates of an address"""
+def _query(address: str, timeout: int) -> dict:
+    """Queries geoapi.dk. Identical concurrent queries share a single request, and the response is
+    reused for later queries."""
+    with _lock:
+        if address in _responses:
+            _responses.move_to_end(address)
+            return _responses[address]
+        future: Future = _in_flight.get(address)
+        is_owner: bool = future is None
+        if is_owner:
+            future = Future()
+            _in_flight[address] = future
+    if not is_owner:
+        return future.result()
+
     try:
-        response: requests.Response = requests.get(
-            f"http://geoapi.dk/?q={address}", timeout=200
-        )
+        response: requests.Response = GET(f"{GEOAPI_URL}?q={address}", timeout=timeout)
         response.raise_for_status()
         data: dict = response.json()
+    except Exception as e:
+        with _lock:
+            _in_flight.pop(address)
+        future.set_exception(e)
+        raise
+    with _lock:
+        _responses[address] = data
+        if len(_responses) > MAX_CACHED_RESPONSES:
+            _responses.popitem(last=False)
+        _in_flight.pop(address)
+    future.set_result(data)
+    return data
+
+
+def get_coordinates(address: str) -> tuple:
+    """Gets the coordinates of an address"""
+    try:
+        data: dict = _query(address, 200)
         # If "lat" or "lng" is not in json, try again by only including the street name
         if "lat" not in data or "lng" not in data:
             # Try again by only including the street name
@@ -46,9 +92,7 @@ def get_coordinates(address: str) -> tuple:
             if address in MANUAL_COORDINATES_SECOND:
                 return MANUAL_COORDINATES_SECOND[address]
             print(f"Trying again with {address}")
-            response = requests.get(f"http://geoapi.dk/?q={address}", timeout=1000)
-            response.raise_for_status()
-            data = response.json()
+            data = _query(address, 1000)
             try:
                 return data["lat"], data["lng"]
             except KeyError:
@@ -60,6 +104,60 @@ def get_coordinates(address: str) -> tuple:
         return (0, 0)
 
 
+class Geocoder:
+    """
+    Gets coordinates on a small dedicated pool of threads, so callers do not wait for geoapi.dk
+    as long as it keeps up. At most max_pending lookups wait or run at once, and submit blocks
+    when there are more, like a full queue of the pipeline.
+
+    Args:
+        workers (int): The number of concurrent lookups.
+        max_pending (int): The number of lookups that may wait or run at once.
+    """
+
+    def __init__(self, workers: int, max_pending: int = 64) -> None:
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="geocode")
+        self._slots = threading.BoundedSemaphore(max(max_pending, workers))
+        self._pending: set = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, address: str, callback: Callable[[tuple], None]) -> Future:
+        """Looks up the address in the background, and calls callback with the coordinates.
+        Blocks while max_pending lookups are waiting or running."""
+        self._slots.acquire()
+        try:
+            future: Future = self._executor.submit(self._lookup, address, callback)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    @staticmethod
+    def _lookup(address: str, callback: Callable[[tuple], None]) -> None:
+        try:
+            callback(get_coordinates(address))
+        except Exception as e:
+            print(f"Could not save coordinates for {address}: {e}")
+
+    def _discard(self, future: Future) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def wait(self) -> None:
+        """Waits for the submitted lookups to finish. More lookups can be submitted after."""
+        with self._pending_lock:
+            pending: list = list(self._pending)
+        concurrent.futures.wait(pending)
+
+    def shutdown(self) -> None:
+        """Waits for all submitted lookups to finish."""
+        self._executor.shutdown(wait=True)
+
+
 if __name__ == "__main__":
     test_address: str = "Nytorv 10"
     coordinates: tuple = get_coordinates(test_address)
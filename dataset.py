@@ -0,0 +1,137 @@
+"""Exports the jsons from the output folder to a typed columnar dataset, partitioned by postal
+code, and loads it back with column and postal code filters."""
+
+import json
+import shutil
+from pathlib import Path
+from typing import Optional
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+from record import Bolig, load_bolig
+
+INPUT_FOLDER: str = "output"
+DATASET_FOLDER: str = "nybolig_dataset"
+
+# Narrowed types for each column. Types and energy labels only take a handful of values, so they
+# are stored as dictionary encoded (categorical) columns.
+SCHEMA: pa.Schema = pa.schema(
+    [
+        ("listing_id", pa.string()),
+        ("url", pa.string()),
+        ("address", pa.string()),
+        ("postal_code", pa.int16()),
+        ("type", pa.dictionary(pa.int8(), pa.string())),
+        ("price", pa.int32()),
+        ("size", pa.int32()),
+        ("basement_size", pa.int32()),
+        ("rooms", pa.int16()),
+        ("year_built", pa.int16()),
+        ("year_rebuilt", pa.int16()),
+        ("energy_label", pa.dictionary(pa.int8(), pa.string())),
+        ("postal_avg_sqm_price", pa.float32()),
+        ("lat", pa.float32()),
+        ("lng", pa.float32()),
+    ]
+)
+
+FORMATS: dict = {"arrow": "ipc", "parquet": "parquet"}
+
+
+def _read_columns(input_path: str) -> dict:
+    columns: dict = {field.name: [] for field in SCHEMA}
+    for json_file in Path(input_path).rglob("data.json"):
+        try:
+            bolig: Bolig = load_bolig(json_file)
+        except (json.JSONDecodeError, ValueError):
+            print(f"Skipping invalid json: {json_file}")
+            continue
+        if bolig.postal_code is None:
+            continue
+        for field in SCHEMA:
+            columns[field.name].append(getattr(bolig, field.name))
+    return columns
+
+
+def export_dataset(
+    input_path: str = INPUT_FOLDER,
+    dataset_path: str = DATASET_FOLDER,
+    file_format: str = "arrow",
+) -> None:
+    """
+    Exports the jsons from the output folder to a dataset partitioned by postal code.
+
+    Args:
+        input_path (str): The folder containing a folder with a data.json for each bolig.
+        dataset_path (str): The folder to write the dataset to. Existing data is replaced.
+        file_format (str): "arrow" for uncompressed Arrow IPC files, which can be memory mapped
+            without copying, or "parquet" for smaller files.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported dataset format: {file_format}")
+
+    print("Exporting jsons to dataset...")
+    table: pa.Table = pa.Table.from_pydict(_read_columns(input_path), schema=SCHEMA)
+    print(f"Found {table.num_rows} boliger (json files).")
+
+    # Write next to the old dataset and swap it in, so the partitions of postal codes that are
+    # gone are removed too, and readers never see a half written dataset
+    temp_path: Path = Path(f"{dataset_path}.tmp")
+    old_path: Path = Path(f"{dataset_path}.old")
+    shutil.rmtree(temp_path, ignore_errors=True)
+    ds.write_dataset(
+        table,
+        temp_path,
+        format=FORMATS[file_format],
+        partitioning=ds.partitioning(
+            pa.schema([SCHEMA.field("postal_code")]), flavor="hive"
+        ),
+    )
+    shutil.rmtree(old_path, ignore_errors=True)
+    if Path(dataset_path).exists():
+        Path(dataset_path).rename(old_path)
+    temp_path.rename(dataset_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    print(f"Export complete: {dataset_path}")
+
+
+def load_dataset(
+    dataset_path: str = DATASET_FOLDER,
+    columns: Optional[list] = None,
+    postal_codes: Optional[list] = None,
+    file_format: str = "arrow",
+) -> pa.Table:
+    """
+    Loads the exported dataset. Arrow files are memory mapped, so only the selected columns of
+    the selected postal codes are read from disk.
+
+    Args:
+        dataset_path (str): The folder the dataset was exported to.
+        columns (list): The columns to load. Defaults to all columns.
+        postal_codes (list): Only load boliger with these postal codes. Whole partitions are
+            skipped, without being opened. Defaults to all postal codes.
+        file_format (str): The format the dataset was exported with.
+
+    Returns:
+        pa.Table: The boliger. Use `.to_pandas()` to get a DataFrame.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported dataset format: {file_format}")
+
+    dataset = ds.dataset(
+        dataset_path,
+        schema=SCHEMA,
+        format=FORMATS[file_format],
+        partitioning=ds.partitioning(
+            pa.schema([SCHEMA.field("postal_code")]), flavor="hive"
+        ),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+    postal_filter = None
+    if postal_codes is not None:
+        postal_filter = ds.field("postal_code").isin(postal_codes)
+    return dataset.to_table(columns=columns, filter=postal_filter)
+
+
+if __name__ == "__main__":
+    export_dataset()
@@ -1,131 +1,261 @@
 """Folder tools"""
 
+import argparse
 import os
 import shutil
 import json
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, Optional
+from record import FIELD_NAMES, Bolig
 
 
-WANTED_DATA: list = [
-    "url",
-    "address",
-    "postal_code",
-    "type",
-    "price",
-    "size",
-    "basement_size",
-    "rooms",
-    "year_built",
-    "year_rebuilt",
-    "energy_label",
-    "postal_avg_sqm_price",
-    "lat",
-    "lng",
-]
-
-UNWANTED_DATA: dict = {
-    "lat": 0,
-    "lng": 0,
-    "postal_avg_sqm_price": 0,
-}
-
-
-def remove_empty_folders(path):
+OPERATIONS: tuple = (
+    "rename_folders",
+    "remove_empty_folders",
+    "remove_empty_data",
+    "normalize_data",
+    "list_missing_data",
+)
+
+
+def _scan_folders(path: str) -> Iterator:
+    """Walks the tree once, yielding (folder, file names, sub folder names) for each folder."""
+    with os.scandir(path) as it:
+        entries = list(it)
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        with os.scandir(entry.path) as it:
+            children = list(it)
+        files: list = [child.name for child in children if child.is_file()]
+        dirs: list = [child.name for child in children if child.is_dir(follow_symlinks=False)]
+        yield entry.path, files, dirs
+        if dirs:
+            yield from _scan_folders(entry.path)
+
+
+def _write_json_atomic(file_path: str, text: str) -> None:
+    """Writes to a temporary file next to the target and replaces it, so the file is never left
+    half written."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _normalize_changes(data: dict, bolig: Bolig) -> list:
+    """The keys of a loaded data.json that differ from the bolig it is read as."""
+    normalized: dict = bolig.to_dict()
+    changed: list = [key for key in data if key not in normalized or data[key] != normalized[key]]
+    changed += [key for key in normalized if key not in data and normalized[key] is not None]
+    return changed
+
+
+def _maintain_folder(
+    dir_path: str, files: list, dirs: list, operations: set, dry_run: bool
+) -> list:
+    """
+    Applies the operations to a single folder. Changes to data.json are written right away,
+    while renames and removals are returned as actions, so they can be applied after the walk.
+
+    Returns:
+        list: (operation, folder, detail) tuples describing what was (or would be) done.
+    """
+    actions: list = []
+    name: str = os.path.basename(dir_path)
+
+    if not files and not dirs:
+        if "remove_empty_folders" in operations:
+            actions.append(("remove_empty_folders", dir_path, ""))
+        return actions
+
+    if "rename_folders" in operations and " " in name:
+        new_path = os.path.join(os.path.dirname(dir_path), name.replace(" ", "_"))
+        actions.append(("rename_folders", dir_path, new_path))
+
+    data_operations: set = operations & {
+        "remove_empty_data",
+        "normalize_data",
+        "list_missing_data",
+    }
+    if "data.json" not in files or not data_operations:
+        return actions
+
+    data_path = os.path.join(dir_path, "data.json")
+    try:
+        with open(data_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        # A corrupt file, the folder is removed with everything in it
+        if "remove_empty_data" in operations:
+            actions.append(("remove_empty_data", dir_path, "invalid json"))
+        return actions
+    except OSError as e:
+        print(f"Skipping {data_path}: {e}")
+        return actions
+    if not data:
+        if "remove_empty_data" in operations:
+            actions.append(("remove_empty_data", dir_path, ""))
+        return actions
+
+    try:
+        bolig: Bolig = Bolig.from_dict(data)
+    except ValueError as e:
+        print(f"Skipping {data_path}: {e}")
+        return actions
+
+    if "normalize_data" in operations:
+        changed: list = _normalize_changes(data, bolig)
+        if changed:
+            if not dry_run:
+                _write_json_atomic(data_path, bolig.to_json())
+            actions.append(("normalize_data", data_path, ", ".join(changed)))
+
+    if "list_missing_data" in operations:
+        missing_data: list = [name for name in FIELD_NAMES if getattr(bolig, name) is None]
+        if missing_data:
+            actions.append(("list_missing_data", data_path, ", ".join(missing_data)))
+
+    return actions
+
+
+def _apply_folder_action(
+    operation: str, dir_path: str, detail: str, root: str, queued: set
+) -> None:
+    if operation == "rename_folders":
+        os.rename(dir_path, detail)
+    elif operation == "remove_empty_data":
+        if detail:
+            shutil.rmtree(dir_path)
+            return
+        # Only the empty data.json is removed, any images are kept with their folder
+        os.remove(os.path.join(dir_path, "data.json"))
+        if not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    elif operation == "remove_empty_folders":
+        os.rmdir(dir_path)
+        # Removing a folder may leave its parent empty. Folders with an action of their own are
+        # left to it.
+        parent = os.path.dirname(dir_path)
+        while (
+            os.path.abspath(parent) != os.path.abspath(root)
+            and parent not in queued
+            and not os.listdir(parent)
+        ):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+
+
+def _collect_actions(report: dict, done: set) -> None:
+    for future in done:
+        for operation, dir_path, detail in future.result():
+            report[operation].append((dir_path, detail))
+
+
+def maintain(
+    path: str = "output",
+    operations: Optional[list] = None,
+    workers: int = 8,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Applies a set of maintenance operations to every folder in a single walk of the tree.
+
+    Args:
+        path (str): The folder containing the bolig folders.
+        operations (list): The operations to apply, see OPERATIONS. Defaults to all of them.
+        workers (int): The number of threads processing folders.
+        dry_run (bool): If True, nothing is changed and the report lists what would be done.
+
+    Returns:
+        dict: The report, mapping each operation to a list of (folder, detail) tuples.
+    """
+    operations = set(OPERATIONS if operations is None else operations)
+    unknown: set = operations - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations: {sorted(unknown)}")
+
+    report: dict = {operation: [] for operation in OPERATIONS if operation in operations}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Only a few folders per worker are in flight, so the walk does not run ahead of the
+        # workers and hold a future for every folder of a large tree
+        pending: set = set()
+        for dir_path, files, dirs in _scan_folders(path):
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect_actions(report, done)
+            pending.add(
+                executor.submit(_maintain_folder, dir_path, files, dirs, operations, dry_run)
+            )
+        _collect_actions(report, wait(pending).done)
+    for entries in report.values():
+        entries.sort()
+
+    if not dry_run:
+        # Apply renames and removals deepest first, so no folder moves before its contents
+        removed: set = {dir_path for dir_path, _ in report.get("remove_empty_data", [])}
+        folder_actions: list = [
+            (operation, dir_path, detail)
+            for operation in ("remove_empty_data", "remove_empty_folders", "rename_folders")
+            for dir_path, detail in report.get(operation, [])
+            if operation == "remove_empty_data" or dir_path not in removed
+        ]
+        folder_actions.sort(key=lambda action: action[1].count(os.sep), reverse=True)
+        queued: set = {dir_path for _, dir_path, _ in folder_actions}
+        for operation, dir_path, detail in folder_actions:
+            try:
+                _apply_folder_action(operation, dir_path, detail, path, queued)
+            except OSError as e:
+                print(f"Could not apply {operation} to {dir_path}: {e}")
+
+    prefix: str = "Would apply" if dry_run else "Applied"
+    for operation, entries in report.items():
+        for dir_path, detail in entries:
+            print(f"{operation}: {dir_path} {detail}".rstrip())
+        print(f"{prefix} {operation} to {len(entries)} entries.")
+    return report
+
+
+def remove_empty_folders(path: str = "output") -> None:
     """Removes all empty folders in a folder"""
-    for root, dirs, _ in os.walk(path, topdown=False):
-        for name in dirs:
-            dir_path = os.path.join(root, name)
-            if not os.listdir(dir_path):
-                os.rmdir(dir_path)
-                print(f"Removed folder: {dir_path}")
+    maintain(path, ["remove_empty_folders"])
 
 
-def rename_folders(path: str) -> None:
+def rename_folders(path: str = "output") -> None:
     """Renames folders with spaces and replaces them with underscores"""
-    for root, dirs, _ in os.walk(path, topdown=False):
-        for name in dirs:
-            dir_path = os.path.join(root, name)
-            if " " in name:
-                new_name = name.replace(" ", "_")
-                new_path = os.path.join(root, new_name)
-                os.rename(dir_path, new_path)
-                print(f"Renamed folder: {dir_path} to {new_path}")
+    maintain(path, ["rename_folders"])
 
 
-def remove_empty_data(path: str) -> None:
+def remove_empty_data(path: str = "output") -> None:
     """Removes any folders with an empty data.json file."""
-    count: int = 0
-    for root, dirs, _ in os.walk(path, topdown=False):
-        for name in dirs:
-            dir_path = os.path.join(root, name)
-            data_path = os.path.join(dir_path, "data.json")
-            if not os.path.exists(data_path):
-                continue
-            # Check if the data.json file is empty
-            try:
-                with open(data_path, "r", encoding="utf-8") as file:
-                    data = json.load(file)
-                if not data:
-                    os.rmdir(dir_path)
-                    print(f"Removed folder: {dir_path}")
-                    count += 1
-            except json.JSONDecodeError:
-                shutil.rmtree(dir_path)
-                print(f"Removed folder: {dir_path}")
-                count += 1
-    print(f"Removed {count} empty data folders.")
-
-
-def remove_unwanted_data() -> None:
-    """Removes any data from the data.jsons that is not needed."""
-    count: int = 0
-    for root, _, files in os.walk("output", topdown=False):
-        for file in files:
-            if file != "data.json":
-                continue
-            msg: str = ""
-            file_path = os.path.join(root, file)
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-            unwanted_encountered = False
-            for key in list(data):
-                if key not in WANTED_DATA:
-                    data.pop(key)
-                    msg += f"Removed {key} from {file_path}\n"
-                    unwanted_encountered = True
-                elif key in UNWANTED_DATA and data[key] == UNWANTED_DATA[key]:
-                    data.pop(key)
-                    msg += f"Removed {key} from {file_path}\n"
-                    unwanted_encountered = True
-            if unwanted_encountered:
-                count += 1
-                with open(file_path, "w", encoding="utf-8") as file:
-                    json.dump(data, file, indent=4, ensure_ascii=False)
-                if msg:
-                    print(msg)
-    print(f"Removed {count} files containing unwanted data.")
-
-
-def list_missing_data() -> None:
+    maintain(path, ["remove_empty_data"])
+
+
+def normalize_data(path: str = "output") -> None:
+    """Rewrites the data.jsons in the format of the current bolig record, renaming legacy keys
+    and removing any data that is not needed."""
+    maintain(path, ["normalize_data"])
+
+
+def list_missing_data(path: str = "output") -> None:
     """Lists all entries with missing data."""
-    for root, _, files in os.walk("output", topdown=False):
-        for file in files:
-            if file != "data.json":
-                continue
-            file_path = os.path.join(root, file)
-            with open(file_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-            missing_data = []
-            for key in WANTED_DATA:
-                if key not in data:
-                    missing_data.append(key)
-            if missing_data:
-                print(f"Missing data in {file_path}: {missing_data}")
+    maintain(path, ["list_missing_data"], dry_run=True)
 
 
 if __name__ == "__main__":
-    rename_folders("output")
-    # remove_empty_data("output")
-    # remove_unwanted_data()
-    # list_missing_data()
-    # with open("address_errors.json", "w", encoding="utf-8") as file:
-    #     json.dump({}, file, indent=4, ensure_ascii=False)
+    parser = argparse.ArgumentParser(description="Maintenance of the scraped bolig folders.")
+    parser.add_argument("path", nargs="?", default="output", help="The folder to maintain.")
+    parser.add_argument(
+        "-o", "--operations", nargs="+", choices=OPERATIONS, help="Defaults to all operations."
+    )
+    parser.add_argument("-w", "--workers", type=int, default=8)
+    parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="Only report what would be done."
+    )
+    args = parser.parse_args()
+    maintain(args.path, args.operations, args.workers, args.dry_run)
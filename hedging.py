@@ -0,0 +1,164 @@
+"""Hedged GET requests: if a request has not answered by the p95 latency of its host, a second
+identical request is sent and whichever answers first is used. This cuts the long tail of slow
+responses, at the cost of a small, bounded amount of extra load."""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+from urllib.parse import urlparse
+import requests
+
+
+def _close_response(future: Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+class LatencyTracker:
+    """
+    Tracks the recent response times of a host and estimates their p95.
+
+    Args:
+        window (int): The number of recent response times the estimate is based on.
+        quantile (float): The quantile to estimate.
+    """
+
+    def __init__(self, window: int = 256, quantile: float = 0.95) -> None:
+        self._latencies: deque = deque(maxlen=window)
+        self._quantile: float = quantile
+        self._estimate: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def add(self, seconds: float) -> None:
+        """Adds a response time."""
+        with self._lock:
+            self._latencies.append(seconds)
+            # Sorting the window is cheap, but not needed for every response
+            if self._estimate is None or len(self._latencies) % 16 == 0:
+                ordered: list = sorted(self._latencies)
+                index: int = min(len(ordered) - 1, int(len(ordered) * self._quantile))
+                self._estimate = ordered[index]
+
+    def estimate(self) -> Optional[float]:
+        """The estimated quantile, or None before the first response."""
+        return self._estimate
+
+
+class HedgedSession:
+    """
+    Sends GET requests through a session, hedging those that are slower than the p95 of their
+    host. Only use it for idempotent requests.
+
+    Args:
+        session (requests.Session): The session the requests are sent with.
+        enabled (bool): If False, requests are sent directly and only the latencies are tracked.
+        budget (float): The largest share of requests that may be hedged, across all hosts.
+        min_samples (int): The number of responses from a host before its requests are hedged.
+        min_delay (float): Requests are never hedged sooner than this many seconds.
+        workers (int): The number of threads sending hedged requests. It should be larger than
+            the number of threads calling get, so no request waits for a free thread.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        enabled: bool = False,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+        workers: int = 32,
+    ) -> None:
+        self._session: requests.Session = session
+        self.enabled: bool = enabled
+        self.budget: float = budget
+        self.min_samples: int = min_samples
+        self.min_delay: float = min_delay
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._trackers: dict = {}
+        # Host -> [requests, hedged, hedges that answered first]
+        self._counts: dict = {}
+
+    def _tracker(self, host: str) -> LatencyTracker:
+        with self._lock:
+            if host not in self._trackers:
+                self._trackers[host] = LatencyTracker()
+                self._counts[host] = [0, 0, 0]
+            return self._trackers[host]
+
+    def _timed_get(self, session: requests.Session, url: str, tracker: LatencyTracker, kwargs):
+        start_time: float = time.perf_counter()
+        response: requests.Response = session.get(url, **kwargs)
+        tracker.add(time.perf_counter() - start_time)
+        return response
+
+    def _may_hedge(self, host: str) -> bool:
+        with self._lock:
+            total_requests: int = sum(counts[0] for counts in self._counts.values())
+            total_hedged: int = sum(counts[1] for counts in self._counts.values())
+            if total_hedged + 1 > self.budget * total_requests:
+                return False
+            self._counts[host][1] += 1
+            return True
+
+    def get(
+        self, url: str, session: Optional[requests.Session] = None, **kwargs
+    ) -> requests.Response:
+        """
+        Sends a GET request, hedged if it is slow. Takes the same arguments as requests.get.
+
+        Args:
+            url (str): The url.
+            session (requests.Session): Send with this session instead of the default one.
+        """
+        session = session or self._session
+        host: str = urlparse(url).netloc
+        tracker: LatencyTracker = self._tracker(host)
+        with self._lock:
+            self._counts[host][0] += 1
+        delay: Optional[float] = tracker.estimate()
+        if not self.enabled or delay is None or len(tracker) < self.min_samples:
+            return self._timed_get(session, url, tracker, kwargs)
+
+        primary: Future = self._executor.submit(self._timed_get, session, url, tracker, kwargs)
+        done, _ = wait([primary], timeout=max(delay, self.min_delay))
+        if done or not self._may_hedge(host):
+            return primary.result()
+
+        hedge: Future = self._executor.submit(self._timed_get, session, url, tracker, kwargs)
+        pending: set = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    with self._lock:
+                        self._counts[host][2] += 1
+                # The other request is closed when it finishes, in the background, or right away
+                # if it finished at the same time, so a streamed response does not hold on to its
+                # connection
+                other: Future = primary if future is hedge else hedge
+                other.add_done_callback(_close_response)
+                return future.result()
+        raise error
+
+    def summary(self) -> str:
+        """The number of requests and the hedge rate of each host."""
+        with self._lock:
+            lines: list = []
+            for host, (total, hedged, won) in sorted(self._counts.items()):
+                p95: Optional[float] = self._trackers[host].estimate()
+                p95_text: str = "n/a" if p95 is None else f"{p95:.2f} s"
+                lines.append(
+                    f"{host}: {total} requests, p95 {p95_text}, "
+                    f"{hedged} hedged ({hedged / total:.1%}), {won} answered first by the hedge"
+                )
+        return "\n".join(lines)
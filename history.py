@@ -0,0 +1,177 @@
+"""An append-only history of bolig data across scraping runs. Only the fields that changed since
+the previous run are stored, so the history grows with the actual changes."""
+
+import argparse
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Optional, TextIO
+from record import Bolig
+
+HISTORY_PATH: str = "./price_history.jsonl"
+TRACKED_FIELDS: tuple = (
+    "price",
+    "address",
+    "size",
+    "basement_size",
+    "rooms",
+    "year_built",
+    "year_rebuilt",
+    "energy_label",
+)
+
+
+def run_timestamp() -> str:
+    """The timestamp of a run. ISO timestamps sort the same way as the times they represent."""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class HistoryStore:
+    """
+    Stores one line per change: {"id": listing id, "run": run timestamp, "changes": {...}}. The
+    first line of a listing holds all tracked fields, and later lines only the changed ones.
+    The log is replayed into memory when the store is opened, so queries do not touch the disk.
+    Changes are appended through a single handle, opened on the first change and kept until
+    close is called.
+
+    Args:
+        path (str): The history file. It is created on the first change.
+    """
+
+    def __init__(self, path: str = HISTORY_PATH) -> None:
+        self._path: str = path
+        self._lock = threading.Lock()
+        # Listing id -> list of (run, changes), oldest first
+        self._entries: dict = {}
+        # Listing id -> the current value of each tracked field
+        self._state: dict = {}
+        self._file: Optional[TextIO] = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry: dict = json.loads(line)
+                        self._apply(entry["id"], entry["run"], entry["changes"])
+
+    def _apply(self, listing_id: str, run: str, changes: dict) -> None:
+        self._entries.setdefault(listing_id, []).append((run, changes))
+        self._state.setdefault(listing_id, {}).update(changes)
+
+    def record(self, bolig: Bolig, run: str, fields: tuple = TRACKED_FIELDS) -> dict:
+        """
+        Records the tracked fields of a bolig, if any of them changed since the last run.
+
+        Args:
+            bolig (Bolig): The bolig.
+            run (str): The timestamp of the run.
+            fields (tuple): The fields to compare. Records with only some fields known, such as
+                those from the listing tiles, only compare those.
+
+        Returns:
+            dict: The changed fields. Empty if nothing changed.
+        """
+        listing_id: str = bolig.listing_id
+        with self._lock:
+            state: dict = self._state.get(listing_id, {})
+            changes: dict = {
+                field: getattr(bolig, field)
+                for field in fields
+                if field not in state or state[field] != getattr(bolig, field)
+            }
+            if not changes:
+                return changes
+            if self._file is None:
+                self._file = open(self._path, "a", encoding="utf-8")
+            entry: dict = {"id": listing_id, "run": run, "changes": changes}
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            # Flushed per line, so a crashed run keeps the changes recorded before the crash
+            self._file.flush()
+            self._apply(listing_id, run, changes)
+        return changes
+
+    def close(self) -> None:
+        """Closes the history file. It is opened again by the next change."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def price_trajectory(self, listing_id: str) -> list:
+        """Returns the (run, price) pairs of every price a listing has had, oldest first."""
+        return [
+            (run, changes["price"])
+            for run, changes in self._entries.get(listing_id, [])
+            if "price" in changes
+        ]
+
+    def price_changed_since(self, since: str) -> dict:
+        """
+        Finds the listings whose price changed in a run at or after `since`.
+
+        Args:
+            since (str): An ISO date or timestamp, e.g. "2024-03-01".
+
+        Returns:
+            dict: Listing id -> (price before the first change since then, current price).
+        """
+        changed: dict = {}
+        for listing_id, entries in self._entries.items():
+            prices: list = [
+                (run, changes["price"]) for run, changes in entries if "price" in changes
+            ]
+            # The first price is when the listing was first seen, not a change
+            for i in range(1, len(prices)):
+                if prices[i][0] >= since:
+                    changed[listing_id] = (prices[i - 1][1], prices[-1][1])
+                    break
+        return changed
+
+
+def read_changed_ids(path: str = HISTORY_PATH, offset: int = 0) -> tuple:
+    """
+    Reads the ids of the listings with changes recorded after a position in the history file,
+    without replaying the history before it.
+
+    Args:
+        path (str): The history file.
+        offset (int): The position returned by the previous call. 0 reads the whole file.
+
+    Returns:
+        tuple: The set of listing ids, and the position to pass to the next call.
+    """
+    if not os.path.exists(path):
+        return set(), 0
+    if offset > os.path.getsize(path):
+        # The file was replaced by a shorter one, so the position means nothing in it
+        offset = 0
+    changed: set = set()
+    with open(path, "rb") as file:
+        file.seek(offset)
+        for line in file:
+            if not line.endswith(b"\n"):
+                # Still being written, it is read by the next call
+                break
+            offset += len(line)
+            if line.strip():
+                changed.add(json.loads(line)["id"])
+    return changed, offset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the price history of the boliger.")
+    parser.add_argument("--path", default=HISTORY_PATH, help="The history file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    trajectory_parser = subparsers.add_parser("trajectory", help="Price history of a listing.")
+    trajectory_parser.add_argument("listing_id")
+    changed_parser = subparsers.add_parser("changed", help="Listings with price changes.")
+    changed_parser.add_argument("since", help="ISO date, e.g. 2024-03-01.")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.path)
+    if args.command == "trajectory":
+        for run, price in store.price_trajectory(args.listing_id):
+            print(f"{run}: {price}")
+    else:
+        for listing_id, (old_price, new_price) in store.price_changed_since(args.since).items():
+            print(f"{listing_id}: {old_price} -> {new_price}")
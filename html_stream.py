@@ -0,0 +1,59 @@
+"""Reads an HTML page from a streamed response only as far as it is needed: the chunks are parsed
+incrementally as they arrive, and the download stops once every element the caller needs has
+been closed."""
+
+from typing import Optional
+from lxml import etree
+import requests
+
+CHUNK_SIZE: int = 16 * 1024
+
+
+def _matches(element, tag: str, class_name: Optional[str]) -> bool:
+    if element.tag != tag:
+        return False
+    if class_name is None:
+        return True
+    # Like BeautifulSoup, a class matches the whole attribute or any one of its classes
+    classes: str = element.get("class") or ""
+    return classes == class_name or class_name in classes.split()
+
+
+def read_until(
+    response: requests.Response, markers: tuple, chunk_size: int = CHUNK_SIZE
+) -> tuple:
+    """
+    Reads a response opened with stream=True until an element matching each marker has been
+    closed, then closes the response. Without markers, the whole page is read.
+
+    Args:
+        response (requests.Response): The response, opened with stream=True.
+        markers (tuple): (tag, class) pairs. The class may be None to match any element with
+            the tag. They should be the last elements the data is read from.
+        chunk_size (int): The number of bytes read at a time.
+
+    Returns:
+        tuple: The bytes read and whether the reading stopped before the end of the page.
+    """
+    pending: list = list(markers)
+    parser = etree.HTMLPullParser(events=("end",), encoding=response.encoding)
+    chunks: list = []
+    stopped: bool = False
+    try:
+        for chunk in response.iter_content(chunk_size):
+            chunks.append(chunk)
+            if not pending:
+                continue
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                pending = [
+                    marker for marker in pending if not _matches(element, *marker)
+                ]
+            if not pending:
+                stopped = True
+                break
+    finally:
+        # Closing a response that has not been read to the end drops its connection, so the rest
+        # of the page is not downloaded
+        response.close()
+    return b"".join(chunks), stopped
@@ -0,0 +1,253 @@
+"""Decodes the floorplans once into fixed size uint8 arrays, stored as memory mapped .npy shards, so
+training reads pixels directly instead of decoding and resizing JPEGs on every pass."""
+
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+import numpy as np
+from numpy.lib.format import open_memmap
+from PIL import Image
+
+INPUT_FOLDER: str = "output"
+CACHE_FOLDER: str = "image_cache"
+IMAGE_SIZE: int = 448
+SHARD_SIZE: int = 512
+FLOORPLAN: str = "0.jpg"
+CHUNK_SIZE: int = 1024 * 1024
+
+
+def load_floorplan(args: tuple) -> Optional[np.ndarray]:
+    """Decodes a floorplan and fits it into a square of the image size, padded with white."""
+    path, image_size = args
+    try:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            image.thumbnail((image_size, image_size))
+            canvas = Image.new("RGB", (image_size, image_size), (255, 255, 255))
+            canvas.paste(
+                image, ((image_size - image.width) // 2, (image_size - image.height) // 2)
+            )
+            return np.asarray(canvas, dtype=np.uint8)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Could not decode {path}: {e}")
+        return None
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCache:
+    """
+    Reads the floorplans from the cache. Arrays are slices of memory mapped shards, so nothing is
+    copied until the pixels are used.
+
+    Floorplans are stored by the hash of their file, so a changed floorplan is decoded again and
+    identical floorplans are stored once. Each listing id points to the hash of its floorplan,
+    along with the size and modification time of the file, so unchanged files are not hashed
+    again. Floorplans that could not be decoded are remembered by hash and not retried until the
+    file changes.
+
+    Args:
+        cache_path (str): The folder the cache was built in.
+    """
+
+    def __init__(self, cache_path: str = CACHE_FOLDER) -> None:
+        self._cache_path = Path(cache_path)
+        index_path: Path = self._cache_path / "index.json"
+        index: dict = {"image_size": IMAGE_SIZE, "shards": [], "hashes": {}, "ids": {}}
+        if index_path.exists():
+            with open(index_path, "r", encoding="utf-8") as file:
+                stored: dict = json.load(file)
+            if "hashes" in stored:
+                index = stored
+            else:
+                print(f"{index_path} is from an older version, the cache is rebuilt")
+        self.image_size: int = index["image_size"]
+        # Each shard as {"name": file name, "rows": number of filled rows}
+        self.shards: list = index["shards"]
+        # Hash of a floorplan file -> (shard number, row in the shard)
+        self.hashes: dict = {key: tuple(value) for key, value in index["hashes"].items()}
+        # Listing id -> (hash, file size, modification time) of its floorplan
+        self.ids: dict = {key: tuple(value) for key, value in index["ids"].items()}
+        # Hash -> path of the floorplans that could not be decoded
+        self.failed: dict = index.get("failed", {})
+        self._open_shards: dict = {}
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self.ids.values() if entry[0] in self.hashes)
+
+    def __contains__(self, listing_id: str) -> bool:
+        return listing_id in self.ids and self.ids[listing_id][0] in self.hashes
+
+    def shard(self, shard: int) -> np.ndarray:
+        """Returns the filled rows of a shard as a read only memory mapped array of shape
+        (n, H, W, 3)."""
+        if shard not in self._open_shards:
+            entry: dict = self.shards[shard]
+            self._open_shards[shard] = np.load(
+                self._cache_path / entry["name"], mmap_mode="r"
+            )[: entry["rows"]]
+        return self._open_shards[shard]
+
+    def get(self, listing_id: str) -> np.ndarray:
+        """Returns the floorplan of a listing as a (H, W, 3) uint8 array."""
+        shard, row = self.hashes[self.ids[listing_id][0]]
+        return self.shard(shard)[row]
+
+    def _write_index(self) -> None:
+        index: dict = {
+            "image_size": self.image_size,
+            "shards": self.shards,
+            "hashes": self.hashes,
+            "ids": self.ids,
+            "failed": self.failed,
+        }
+        temp_path: Path = self._cache_path / "index.json.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self._cache_path / "index.json")
+
+    def _changed(self, floorplans: dict) -> dict:
+        """Hashes the floorplans whose file is new or changed since it was last seen, and
+        returns their new (hash, size, modification time) by listing id."""
+        changed: dict = {}
+        for listing_id, path in floorplans.items():
+            stat = os.stat(path)
+            entry: Optional[tuple] = self.ids.get(listing_id)
+            if entry is not None and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            changed[listing_id] = (_hash_file(path), stat.st_size, stat.st_mtime_ns)
+        return changed
+
+    def _open_last_shard(self) -> Optional[np.ndarray]:
+        """Opens the last shard for writing if it has free rows."""
+        if not self.shards:
+            return None
+        entry: dict = self.shards[-1]
+        shard = open_memmap(self._cache_path / entry["name"], mode="r+")
+        if entry["rows"] >= len(shard):
+            del shard
+            return None
+        # The read only view of the shard ends at the rows filled before
+        self._open_shards.pop(len(self.shards) - 1, None)
+        return shard
+
+    def _write_shard(self, decoded: Iterator, remaining: int) -> int:
+        """
+        Writes decoded floorplans into the free rows of the last shard, or a new one. Shards are
+        created with room for SHARD_SIZE floorplans and filled in place, so adding floorplans
+        never rewrites those already cached. The rows are only counted in the index once they
+        are on disk, and the file of a new shard is sparse until its rows are written.
+
+        Returns:
+            int: The number of floorplans read from decoded, including those that failed.
+        """
+        shard: Optional[np.ndarray] = self._open_last_shard()
+        if shard is None:
+            shard_name: str = f"shard_{len(self.shards):05d}.npy"
+            shape: tuple = (SHARD_SIZE, self.image_size, self.image_size, 3)
+            shard = open_memmap(
+                self._cache_path / shard_name, mode="w+", dtype=np.uint8, shape=shape
+            )
+            self.shards.append({"name": shard_name, "rows": 0})
+        shard_number: int = len(self.shards) - 1
+
+        rows: int = self.shards[shard_number]["rows"]
+        read: int = 0
+        shard_hashes: dict = {}
+        while rows < len(shard) and read < remaining:
+            file_hash, path, image = next(decoded)
+            read += 1
+            if image is None:
+                self.failed[file_hash] = path
+                continue
+            shard[rows] = image
+            shard_hashes[file_hash] = (shard_number, rows)
+            rows += 1
+        shard.flush()
+        del shard
+
+        # The index is only updated once the rows are on disk
+        self.shards[shard_number]["rows"] = rows
+        self.hashes.update(shard_hashes)
+        return read
+
+    def append(self, floorplans: dict, workers: Optional[int] = None) -> int:
+        """
+        Decodes the new and changed floorplans in a process pool and adds them to the cache.
+
+        Args:
+            floorplans (dict): Listing id -> path of the floorplan.
+            workers (int): The number of processes. Defaults to the number of CPUs.
+
+        Returns:
+            int: The number of floorplans decoded and added.
+        """
+        self._cache_path.mkdir(parents=True, exist_ok=True)
+        changed: dict = self._changed(floorplans)
+        # Each new hash is decoded once, however many listings share it
+        to_decode: dict = {}
+        for listing_id, (file_hash, _, _) in changed.items():
+            if file_hash not in self.hashes and file_hash not in self.failed:
+                to_decode.setdefault(file_hash, floorplans[listing_id])
+        hashes: list = list(to_decode)
+        added: int = len(self.hashes)
+
+        def _decoded(executor: ProcessPoolExecutor) -> Iterator:
+            for start in range(0, len(hashes), SHARD_SIZE):
+                batch: list = hashes[start : start + SHARD_SIZE]
+                images = executor.map(
+                    load_floorplan,
+                    [(to_decode[file_hash], self.image_size) for file_hash in batch],
+                    chunksize=16,
+                )
+                for file_hash, image in zip(batch, images):
+                    yield file_hash, to_decode[file_hash], image
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            decoded: Iterator = _decoded(executor)
+            remaining: int = len(hashes)
+            while remaining:
+                remaining -= self._write_shard(decoded, remaining)
+                self._write_index()
+                print(f"Cached {len(self.hashes)} floorplans")
+        self.ids.update(changed)
+        self._write_index()
+        return len(self.hashes) - added
+
+
+def find_floorplans(input_path: str = INPUT_FOLDER) -> dict:
+    """Finds the floorplan of every bolig, keyed by the name of its folder."""
+    return {path.parent.name: str(path) for path in sorted(Path(input_path).rglob(FLOORPLAN))}
+
+
+def build_cache(
+    input_path: str = INPUT_FOLDER,
+    cache_path: str = CACHE_FOLDER,
+    workers: Optional[int] = None,
+) -> ImageCache:
+    """Adds the floorplans that are not cached yet to the cache."""
+    cache = ImageCache(cache_path)
+    floorplans: dict = find_floorplans(input_path)
+    print(f"Found {len(floorplans)} floorplans, {len(cache)} already cached.")
+    added: int = cache.append(floorplans, workers)
+    print(f"Added {added} floorplans to {cache_path}")
+    return cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cache the decoded floorplans.")
+    parser.add_argument("input_path", nargs="?", default=INPUT_FOLDER)
+    parser.add_argument("--cache-path", default=CACHE_FOLDER)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    build_cache(args.input_path, args.cache_path, args.workers)
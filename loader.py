@@ -0,0 +1,284 @@
+"""Loads batches of tabular features and floorplans from a split made by splitter.py, decoding in
+background threads so training does not wait on reading and decoding the files."""
+
+import argparse
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+import numpy as np
+from image_cache import FLOORPLAN, IMAGE_SIZE, ImageCache, load_floorplan
+from record import ENERGY_LABELS, Bolig, load_bolig
+from splitter import SEED
+
+SPLIT_FOLDER: str = "./output/train"
+
+# The columns of the tabular features. Missing values are NaN, and energy labels are 0 for "a"
+# up to 6 for "g".
+FEATURES: tuple = (
+    "postal_code",
+    "price",
+    "size",
+    "basement_size",
+    "rooms",
+    "year_built",
+    "year_rebuilt",
+    "energy_label",
+    "postal_avg_sqm_price",
+    "lat",
+    "lng",
+)
+
+_DONE = object()
+
+
+def find_boliger(split_path: str = SPLIT_FOLDER) -> list:
+    """Finds the bolig folders of a split, including those in train_N parts, in sorted order."""
+    folders: list = []
+    for dir_path, dir_names, file_names in os.walk(split_path):
+        dir_names.sort()
+        if "data.json" in file_names and FLOORPLAN in file_names:
+            folders.append(dir_path)
+    return sorted(folders)
+
+
+def bolig_features(bolig: Bolig) -> np.ndarray:
+    """The tabular features of a bolig, in the order of FEATURES."""
+    values: list = []
+    for name in FEATURES:
+        value = getattr(bolig, name)
+        if name == "energy_label":
+            label: str = (value or "")[:1].lower()
+            value = ENERGY_LABELS.index(label) if label in ENERGY_LABELS else None
+        values.append(np.nan if value is None else value)
+    return np.array(values, dtype=np.float32)
+
+
+class DataLoader:
+    """
+    Yields (features, floorplans) batches from a split, as (batch, len(FEATURES)) float32 and
+    (batch, image size, image size, 3) uint8 arrays.
+
+    The folders are shuffled for each epoch, divided between the shards, and decoded by a pool of
+    threads a few batches ahead of the training loop. The decoded samples then pass through a
+    shuffle buffer. Everything is seeded from the split seed and the epoch, so an epoch yields the
+    same batches every time, however many threads decode it.
+
+    Args:
+        split_path (str): The split to load, e.g. "./output/train".
+        batch_size (int): The number of boliger in a batch.
+        shuffle_buffer (int): The number of decoded samples to draw from at random. 0 to only
+            shuffle the folders.
+        workers (int): The number of decoding threads. 0 decodes in the training loop.
+        prefetch_batches (int): The number of batches prepared ahead of the training loop.
+        seed (int): Defaults to the seed of the split.
+        shard (int): The shard read by this loader, from 0 to shards - 1.
+        shards (int): The number of loaders reading the split, e.g. one for each training worker.
+            Each reads a disjoint part of every epoch.
+        drop_last (bool): Skip the last batch of an epoch if it is smaller than batch_size.
+        cache_path (str): An image cache built by image_cache.py. Cached floorplans are read from
+            it instead of being decoded.
+        image_size (int): The size of the floorplans, if they are not read from a cache.
+    """
+
+    def __init__(
+        self,
+        split_path: str = SPLIT_FOLDER,
+        batch_size: int = 32,
+        shuffle_buffer: int = 256,
+        workers: int = 4,
+        prefetch_batches: int = 2,
+        seed: int = SEED,
+        shard: int = 0,
+        shards: int = 1,
+        drop_last: bool = False,
+        cache_path: Optional[str] = None,
+        image_size: int = IMAGE_SIZE,
+    ) -> None:
+        if not 0 <= shard < shards:
+            raise ValueError(f"Shard {shard} is not in range(0, {shards})")
+        self.folders: list = find_boliger(split_path)
+        self.batch_size: int = batch_size
+        self.shuffle_buffer: int = shuffle_buffer
+        self.workers: int = workers
+        self.prefetch_batches: int = prefetch_batches
+        self.seed: int = seed
+        self.shard: int = shard
+        self.shards: int = shards
+        self.drop_last: bool = drop_last
+        self.cache: Optional[ImageCache] = None if cache_path is None else ImageCache(cache_path)
+        self.image_size: int = image_size if self.cache is None else self.cache.image_size
+        self.epoch: int = 0
+
+    def __len__(self) -> int:
+        """The number of batches in an epoch of this shard."""
+        samples: int = len(self.folders[self.shard :: self.shards])
+        if self.drop_last:
+            return samples // self.batch_size
+        return -(-samples // self.batch_size)
+
+    def __iter__(self) -> Iterator:
+        """Iterates the next epoch."""
+        epoch: int = self.epoch
+        self.epoch += 1
+        return self.iter_epoch(epoch)
+
+    def _load(self, folder: str) -> Optional[tuple]:
+        """Reads the features and the floorplan of a bolig. None if either cannot be read."""
+        try:
+            bolig: Bolig = load_bolig(os.path.join(folder, "data.json"))
+        except (OSError, ValueError) as e:
+            print(f"Could not read {folder}: {e}")
+            return None
+        listing_id: str = bolig.listing_id or os.path.basename(folder)
+        if self.cache is not None and listing_id in self.cache:
+            floorplan = self.cache.get(listing_id)
+        else:
+            floorplan = load_floorplan((os.path.join(folder, FLOORPLAN), self.image_size))
+            if floorplan is None:
+                return None
+        return bolig_features(bolig), floorplan
+
+    def _samples(self, folders: list) -> Iterator:
+        """Loads the folders in order, with up to workers * prefetch_batches * batch_size loads
+        in flight."""
+        if self.workers == 0:
+            yield from map(self._load, folders)
+            return
+        in_flight: int = max(1, self.workers * self.prefetch_batches * self.batch_size)
+        with ThreadPoolExecutor(self.workers, thread_name_prefix="loader") as executor:
+            futures: deque = deque()
+            for folder in folders:
+                futures.append(executor.submit(self._load, folder))
+                if len(futures) >= in_flight:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def _batches(self, epoch: int) -> Iterator:
+        rng = random.Random(self.seed * 1_000_003 + epoch)
+        folders: list = list(self.folders)
+        rng.shuffle(folders)
+
+        buffer: list = []
+        batch: list = []
+        for sample in self._samples(folders[self.shard :: self.shards]):
+            if sample is None:
+                continue
+            if self.shuffle_buffer > 0:
+                buffer.append(sample)
+                if len(buffer) < self.shuffle_buffer:
+                    continue
+                # Swap a random sample to the end and take it
+                i: int = rng.randrange(len(buffer))
+                buffer[i], buffer[-1] = buffer[-1], buffer[i]
+                sample = buffer.pop()
+            batch.append(sample)
+            if len(batch) == self.batch_size:
+                yield _collate(batch)
+                batch = []
+        rng.shuffle(buffer)
+        for sample in buffer:
+            batch.append(sample)
+            if len(batch) == self.batch_size:
+                yield _collate(batch)
+                batch = []
+        if batch and not self.drop_last:
+            yield _collate(batch)
+
+    def iter_epoch(self, epoch: int) -> Iterator:
+        """Iterates the batches of an epoch, prepared in a background thread."""
+        if self.workers == 0:
+            yield from self._batches(epoch)
+            return
+
+        batches: queue.Queue = queue.Queue(maxsize=max(1, self.prefetch_batches))
+        stop = threading.Event()
+
+        def _put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _produce() -> None:
+            try:
+                for batch in self._batches(epoch):
+                    if not _put(batch):
+                        return
+            except Exception as e:  # pylint: disable=broad-except
+                _put(e)
+                return
+            _put(_DONE)
+
+        producer = threading.Thread(target=_produce, name="loader-prefetch", daemon=True)
+        producer.start()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                yield batch
+        finally:
+            # Stop the producer if the training loop stops early
+            stop.set()
+            producer.join()
+
+
+def _collate(samples: list) -> tuple:
+    features, floorplans = zip(*samples)
+    return np.stack(features), np.stack(floorplans)
+
+
+def benchmark(split_path: str = SPLIT_FOLDER, batches: int = 50, **loader_args) -> float:
+    """
+    Measures how fast a loader yields batches, without a training loop consuming them.
+
+    Returns:
+        float: Samples per second.
+    """
+    loader = DataLoader(split_path, **loader_args)
+    samples: int = 0
+    start_time: float = time.perf_counter()
+    for i, (features, _) in enumerate(loader):
+        samples += len(features)
+        if i + 1 >= batches:
+            break
+    elapsed: float = time.perf_counter() - start_time
+    throughput: float = samples / elapsed if elapsed else 0.0
+    print(
+        f"workers={loader.workers} batch_size={loader.batch_size}: {samples} samples in "
+        f"{elapsed:.2f} s, {throughput:.1f} samples/s"
+    )
+    return throughput
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark loading a split.")
+    parser.add_argument("split_path", nargs="?", default=SPLIT_FOLDER)
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--shuffle-buffer", type=int, default=256)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[0, 4, 8], help="Worker counts to compare."
+    )
+    parser.add_argument("--cache-path")
+    args = parser.parse_args()
+    for worker_count in args.workers:
+        benchmark(
+            args.split_path,
+            args.batches,
+            batch_size=args.batch_size,
+            shuffle_buffer=args.shuffle_buffer,
+            workers=worker_count,
+            cache_path=args.cache_path,
+        )
@@ -0,0 +1,176 @@
+"""Runs the real scraper against the local mock server with different pipeline settings, and
+reports the throughput, listing latency and peak memory of each."""
+
+import argparse
+import copy
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+from mock_server import MockConfig, start_server
+
+REPO_PATH: Path = Path(__file__).parent
+
+# Pipeline settings to compare. Each is applied on top of the pipeline settings in config.json.
+CONFIGURATIONS: list = [
+    {"detail_workers": 2},
+    {"detail_workers": 8},
+    {"detail_workers": 16, "queue_size": 64},
+]
+
+
+def _percentile(values: list, percentile: float) -> float:
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+# The scraper function run for each way of discovering the listings
+DISCOVERY: dict = {"pages": "scrape", "sitemap": "scrape_sitemap", "tiles": "scrape_tiles"}
+
+
+def _run_scraper(config_path: Path, log_path: Path, discovery: str = "pages") -> tuple:
+    """Runs a scrape in a separate process, so each run starts from a clean state.
+
+    Returns:
+        tuple: The wall time in seconds and the peak RSS in MiB (None where unsupported).
+
+    Raises:
+        RuntimeError: If the scraper exits with an error, with the end of its log.
+    """
+    env: dict = dict(os.environ, NYBOLIG_CONFIG=str(config_path))
+    start_time: float = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-c", f"import scraper; scraper.{DISCOVERY[discovery]}()"],
+            cwd=REPO_PATH,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        peak_rss: Optional[float] = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in KiB on Linux
+            peak_rss = usage.ru_maxrss / 1024
+        else:
+            process.wait()
+    wall_time: float = time.perf_counter() - start_time
+    if process.returncode != 0:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as log:
+            log_tail: str = "".join(log.readlines()[-20:])
+        raise RuntimeError(f"The scraper exited with {process.returncode}:\n{log_tail}")
+    return wall_time, peak_rss
+
+
+def run_configuration(
+    mock_config: MockConfig,
+    pipeline: dict,
+    work_dir: Path,
+    discovery: str = "pages",
+    hedging: bool = False,
+) -> dict:
+    """Scrapes a fresh mock server with the given pipeline settings, discovering the listings
+    from the listing pages or the sitemap, and with or without hedged requests."""
+    server = start_server(mock_config)
+    try:
+        with open(REPO_PATH / "config.json", "r", encoding="utf-8") as config_file:
+            config: dict = json.load(config_file)
+        config = copy.deepcopy(config)
+        config["url"] = server.base_url
+        config["geoapi_url"] = f"{server.base_url}/geoapi/"
+        config["sitemap"] = {"url": f"{server.base_url}/sitemap.xml", "include": ["boliger"]}
+        config["output_path"] = str(work_dir / "output")
+        config["history_path"] = str(work_dir / "history.jsonl")
+        config["tiles_path"] = str(work_dir / "tiles.jsonl")
+        config["delta"]["seen_path"] = str(work_dir / "seen_ids.txt")
+        config["pages"] = 0
+        config["override_previous_data"] = True
+        config["pipeline"].update(pipeline)
+        config["hedging"]["enabled"] = hedging
+        config_path: Path = work_dir / "config.json"
+        with open(config_path, "w", encoding="utf-8") as config_file:
+            json.dump(config, config_file, indent=2, ensure_ascii=False)
+
+        wall_time, peak_rss = _run_scraper(config_path, work_dir / "scrape.log", discovery)
+        latencies: list = server.listing_latencies()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if discovery == "tiles":
+        with open(work_dir / "tiles.jsonl", "r", encoding="utf-8") as tiles:
+            boliger: int = sum(1 for _ in tiles)
+    else:
+        boliger = sum(1 for _ in (work_dir / "output").glob("*/data.json"))
+    return {
+        "pipeline": pipeline,
+        "wall_time": wall_time,
+        "boliger": boliger,
+        "throughput": boliger / wall_time if wall_time else 0.0,
+        "requests": server.requests,
+        "injected_errors": server.injected_errors,
+        "megabytes": server.bytes_sent / 1024 / 1024,
+        "p50": _percentile(latencies, 0.50),
+        "p95": _percentile(latencies, 0.95),
+        "p99": _percentile(latencies, 0.99),
+        "peak_rss": peak_rss,
+    }
+
+
+def _print_report(results: list) -> None:
+    print(
+        f"{'pipeline':<40} {'wall s':>7} {'boliger':>7} {'/s':>6} {'reqs':>6} {'errs':>5} "
+        f"{'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'RSS MiB':>8}"
+    )
+    for result in results:
+        peak_rss: str = "n/a" if result["peak_rss"] is None else f"{result['peak_rss']:.0f}"
+        print(
+            f"{json.dumps(result['pipeline']):<40} {result['wall_time']:>7.1f} "
+            f"{result['boliger']:>7} {result['throughput']:>6.1f} {result['requests']:>6} "
+            f"{result['injected_errors']:>5} {result['p50']:>6.2f} {result['p95']:>6.2f} "
+            f"{result['p99']:>6.2f} {peak_rss:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the scraper against a mock server.")
+    parser.add_argument("--pages", type=int, default=MockConfig.pages)
+    parser.add_argument("--listings-per-page", type=int, default=MockConfig.listings_per_page)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=MockConfig.throttle_rate)
+    parser.add_argument("--tail-rate", type=float, default=MockConfig.tail_rate)
+    parser.add_argument("--hedging", action="store_true", help="Enable hedged requests.")
+    parser.add_argument("--discovery", choices=DISCOVERY, default="pages")
+    parser.add_argument(
+        "--pipeline",
+        type=json.loads,
+        action="append",
+        help='Pipeline settings to test as JSON, e.g. \'{"detail_workers": 4}\'. Repeatable.',
+    )
+    args = parser.parse_args()
+
+    mock = MockConfig(
+        pages=args.pages,
+        listings_per_page=args.listings_per_page,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        tail_rate=args.tail_rate,
+    )
+    run_results: list = []
+    for pipeline_settings in args.pipeline or CONFIGURATIONS:
+        with tempfile.TemporaryDirectory(prefix="nybolig-loadtest-") as temp_dir:
+            print(f"Running {json.dumps(pipeline_settings)}...")
+            run_results.append(
+                run_configuration(
+                    mock, pipeline_settings, Path(temp_dir), args.discovery, args.hedging
+                )
+            )
+    _print_report(run_results)
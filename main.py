@@ -1,8 +1,21 @@
 """Main module for the scraping and converting tool."""
 import argparse
+import contextlib
 import time
 import scraper
 import converter
+import dataset
+import profiler
+import stats
+
+def _run_stage(stage: str, func, run_dir, trace_memory: bool) -> None:
+    """Runs a stage, profiled if a run directory is given."""
+    if run_dir is None:
+        context = contextlib.nullcontext()
+    else:
+        context = profiler.profiled(stage, run_dir, trace_memory)
+    with context:
+        func()
 
 def main():
     """Main function for the scraping and converting tool."""
@@ -13,31 +26,127 @@ def main():
     parser.add_argument(
         '-c', '--convert', action='store_true', help='Start the conversion process.'
     )
+    parser.add_argument(
+        '-n', '--new', action='store_true',
+        help='Only scrape boliger listed since the last run, newest first.'
+    )
+    parser.add_argument(
+        '-m', '--sitemap', action='store_true',
+        help='Scrape the boliger listed in the sitemap instead of the listing pages.'
+    )
+    parser.add_argument(
+        '-f', '--fast', action='store_true',
+        help='Only scrape what the listing tiles show, without opening the detail pages.'
+    )
+    parser.add_argument(
+        '-u', '--upgrade', nargs='*', metavar='ID',
+        help='Fully scrape boliger from the last --fast run. Defaults to those not scraped yet.'
+    )
+    parser.add_argument(
+        '--plan', action='store_true',
+        help='Estimate the requests, download, time and disk use of a scrape, then exit.'
+    )
+    parser.add_argument(
+        '-w', '--watch', nargs='?', const=-1, type=float, metavar='SECONDS',
+        help='Keep scraping new boliger, polling every SECONDS (default from config.json).'
+    )
+    parser.add_argument(
+        '-e', '--export', choices=['arrow', 'parquet'],
+        help='Export the data to a columnar dataset partitioned by postal code.'
+    )
+    parser.add_argument(
+        '-t', '--stats', action='store_true',
+        help='Update the market statistics per postal code with the newly scraped boliger.'
+    )
+    parser.add_argument(
+        '--stdout', choices=['ndjson'],
+        help='Write each scraped bolig to stdout as a JSON line as soon as it is ready.'
+    )
+    parser.add_argument(
+        '-p', '--profile', nargs='?', const='profiles', metavar='DIR',
+        help='Profile each stage and write flamegraph stacks to a run directory in DIR.'
+    )
+    parser.add_argument(
+        '--trace-memory', action='store_true',
+        help='With --profile, also write the top allocation sites of each stage.'
+    )
 
     args = parser.parse_args()
+    scrapes = any((
+        args.scrape, args.new, args.sitemap, args.fast, args.upgrade is not None,
+        args.watch is not None,
+    ))
+    if args.stdout and (args.plan or not scrapes and any((args.convert, args.export, args.stats))):
+        parser.error('--stdout needs a scraping mode, e.g. --scrape, --new or --fast')
+    run_dir = profiler.new_run_dir(args.profile) if args.profile else None
 
     start_time = time.time()
 
-    # Check if neither -s nor -c options are provided, then call both functions
-    try:
-        if not args.scrape and not args.convert:
-            scraper.scrape()
-            converter.convert()
-        else:
-            # Otherwise, execute the corresponding functions based on the provided arguments
-            if args.scrape:
-                scraper.scrape()
-
-            if args.convert:
-                converter.convert()
-
-        end_time = time.time()
-        print(
-            f"Time taken:\n{end_time - start_time} seconds\n{(end_time - start_time) / 60} minutes"
-        )
-
-    except ValueError as ve:
-        print(f"Value error: {ve}")
+    # With --stdout ndjson, the boliger are written to stdout and everything else to stderr
+    output = scraper.ndjson_output() if args.stdout == 'ndjson' else contextlib.nullcontext()
+    with output:
+        # Check if neither -s nor -c options are provided, then call both functions
+        try:
+            if args.plan:
+                _run_stage('plan', scraper.plan, run_dir, args.trace_memory)
+            elif args.watch is not None:
+                # The profile of a watch is written when it is stopped, e.g. with Ctrl+C
+                _run_stage(
+                    'watch',
+                    lambda: scraper.watch(None if args.watch < 0 else args.watch),
+                    run_dir,
+                    args.trace_memory,
+                )
+            elif not any((
+                args.scrape, args.new, args.sitemap, args.fast, args.upgrade is not None,
+                args.convert, args.export, args.stats,
+            )):
+                _run_stage('scrape', scraper.scrape, run_dir, args.trace_memory)
+                if not args.stdout:
+                    _run_stage('convert', converter.convert, run_dir, args.trace_memory)
+            else:
+                # Otherwise, execute the corresponding functions based on the provided arguments
+                if args.scrape:
+                    _run_stage('scrape', scraper.scrape, run_dir, args.trace_memory)
+
+                if args.new:
+                    _run_stage('scrape_new', scraper.scrape_new, run_dir, args.trace_memory)
+
+                if args.sitemap:
+                    _run_stage('scrape_sitemap', scraper.scrape_sitemap, run_dir, args.trace_memory)
+
+                if args.fast:
+                    _run_stage('scrape_tiles', scraper.scrape_tiles, run_dir, args.trace_memory)
+
+                if args.upgrade is not None:
+                    _run_stage(
+                        'upgrade',
+                        lambda: scraper.upgrade(args.upgrade or None),
+                        run_dir,
+                        args.trace_memory,
+                    )
+
+                if args.convert:
+                    _run_stage('convert', converter.convert, run_dir, args.trace_memory)
+
+                if args.export:
+                    _run_stage(
+                        'export',
+                        lambda: dataset.export_dataset(file_format=args.export),
+                        run_dir,
+                        args.trace_memory,
+                    )
+
+                if args.stats:
+                    _run_stage('stats', stats.update_stats, run_dir, args.trace_memory)
+
+            end_time = time.time()
+            print(
+                f"Time taken:\n{end_time - start_time} seconds\n{(end_time - start_time) / 60} minutes"
+            )
+
+        except ValueError as ve:
+            print(f"Value error: {ve}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,258 @@
+"""Content hash manifests of the scraped boliger, to tell what changed between two runs and move
+only that between machines.
+
+A manifest has a line for each bolig folder, sorted by folder name, with the hash of its files.
+The hash of a folder is the hash of the names and hashes of its files, and the digest on the
+first line is the hash of all folder names and hashes, so two manifests with the same digest are
+equal. It is a flat hash over the sorted lines, not a tree, so it only tells whether anything
+changed; what changed is found by walking both manifests."""
+
+import argparse
+import hashlib
+import io
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+INPUT_FOLDER: str = "output_raw"
+MANIFEST_PATH: str = "manifest.tsv"
+REMOVED_FILE: str = "removed.txt"
+CHUNK_SIZE: int = 1024 * 1024
+
+
+def _hash_file(path: str) -> str:
+    # hashlib releases the GIL while hashing, so files are hashed in parallel by threads
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_folder(folder_path: str) -> tuple:
+    """The files of a folder, their total size and the newest modification time. Temporary
+    files, such as a data.json being rewritten, are left out."""
+    with os.scandir(folder_path) as it:
+        files: list = sorted(
+            (entry.name, entry.stat())
+            for entry in it
+            if entry.is_file() and not entry.name.endswith(".tmp")
+        )
+    size: int = sum(stat.st_size for _, stat in files)
+    mtime: int = max((stat.st_mtime_ns for _, stat in files), default=0)
+    return [name for name, _ in files], size, mtime
+
+
+def hash_folder(folder_path: str, previous: Optional[tuple] = None) -> tuple:
+    """
+    Hashes the files of a bolig folder.
+
+    Args:
+        folder_path (str): The bolig folder.
+        previous (tuple): The entry of the folder in an earlier manifest. Reused without reading
+            the files if the number of files, their size and modification times are unchanged.
+
+    Returns:
+        tuple: (hash, number of files, total size, newest modification time in ns).
+    """
+    names, size, mtime = _stat_folder(folder_path)
+    if previous is not None and previous[1:] == (len(names), size, mtime):
+        return previous
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(f"{name}\0{_hash_file(os.path.join(folder_path, name))}\n".encode())
+    return digest.hexdigest(), len(names), size, mtime
+
+
+def build_manifest(
+    input_path: str = INPUT_FOLDER, previous: Optional[dict] = None, workers: int = 8
+) -> dict:
+    """
+    Hashes every bolig folder in a thread pool.
+
+    Args:
+        input_path (str): The folder with a folder for each bolig.
+        previous (dict): An earlier manifest of the same folder, see hash_folder.
+        workers (int): The number of hashing threads.
+
+    Returns:
+        dict: Folder name -> (hash, number of files, total size, modification time), sorted by
+            folder name.
+    """
+    previous = previous or {}
+    with os.scandir(input_path) as it:
+        names: list = sorted(entry.name for entry in it if entry.is_dir())
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        entries = executor.map(
+            lambda name: hash_folder(os.path.join(input_path, name), previous.get(name)), names
+        )
+        return dict(zip(names, entries))
+
+
+def _format_entry(name: str, entry: tuple) -> str:
+    return "\t".join((name, entry[0], str(entry[1]), str(entry[2]), str(entry[3])))
+
+
+def manifest_digest(manifest: dict) -> str:
+    """The hash of the names and hashes of all entries of a manifest."""
+    digest = hashlib.sha256()
+    for name, entry in manifest.items():
+        digest.update(f"{name}\0{entry[0]}\n".encode())
+    return digest.hexdigest()
+
+
+def _manifest_text(manifest: dict) -> str:
+    lines: list = [f"# digest\t{manifest_digest(manifest)}"]
+    lines += [_format_entry(name, entry) for name, entry in manifest.items()]
+    return "\n".join(lines) + "\n"
+
+
+def write_manifest(manifest: dict, manifest_path: str = MANIFEST_PATH) -> str:
+    """Writes a manifest, and returns its digest."""
+    temp_path: str = f"{manifest_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(_manifest_text(manifest))
+    os.replace(temp_path, manifest_path)
+    return manifest_digest(manifest)
+
+
+def read_manifest(manifest_path: str = MANIFEST_PATH) -> dict:
+    """Reads a manifest written by write_manifest."""
+    manifest: dict = {}
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.startswith("#"):
+                continue
+            name, digest, files, size, mtime = line.rstrip("\n").split("\t")
+            manifest[name] = (digest, int(files), int(size), int(mtime))
+    return manifest
+
+
+def _merge_walk(old: dict, new: dict) -> Iterator:
+    """Walks two sorted manifests side by side, yielding (name, old entry, new entry) with None
+    for a missing entry."""
+    old_items = iter(old.items())
+    new_items = iter(new.items())
+    old_item = next(old_items, None)
+    new_item = next(new_items, None)
+    while old_item is not None or new_item is not None:
+        if new_item is None or (old_item is not None and old_item[0] < new_item[0]):
+            yield old_item[0], old_item[1], None
+            old_item = next(old_items, None)
+        elif old_item is None or new_item[0] < old_item[0]:
+            yield new_item[0], None, new_item[1]
+            new_item = next(new_items, None)
+        else:
+            yield old_item[0], old_item[1], new_item[1]
+            old_item = next(old_items, None)
+            new_item = next(new_items, None)
+
+
+def diff(old: dict, new: dict) -> dict:
+    """
+    Compares two manifests in a single pass over both.
+
+    Returns:
+        dict: The "added", "removed" and "changed" folder names.
+    """
+    changes: dict = {"added": [], "removed": [], "changed": []}
+    if manifest_digest(old) == manifest_digest(new):
+        return changes
+    for name, old_entry, new_entry in _merge_walk(old, new):
+        if old_entry is None:
+            changes["added"].append(name)
+        elif new_entry is None:
+            changes["removed"].append(name)
+        elif old_entry[0] != new_entry[0]:
+            changes["changed"].append(name)
+    return changes
+
+
+def export_changes(input_path: str, old: dict, new: dict, archive_path: str) -> dict:
+    """
+    Packs the added and changed bolig folders into a single tar archive, with the new manifest
+    and a list of the removed folders. Unpacking it over the old folder and deleting the removed
+    folders brings it up to date. A .tar.gz archive is compressed. Only the files the manifest
+    hashes are packed, so temporary files are left out.
+
+    Returns:
+        dict: The changes, see diff.
+    """
+    changes: dict = diff(old, new)
+    mode: str = "w:gz" if archive_path.endswith((".tar.gz", ".tgz")) else "w"
+    with tarfile.open(archive_path, mode) as archive:
+        for name in changes["added"] + changes["changed"]:
+            folder_path: str = os.path.join(input_path, name)
+            archive.add(folder_path, arcname=name, recursive=False)
+            for file_name in _stat_folder(folder_path)[0]:
+                archive.add(os.path.join(folder_path, file_name), arcname=f"{name}/{file_name}")
+
+        def _add_text(arcname: str, text: str) -> None:
+            data: bytes = text.encode("utf-8")
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+        _add_text(MANIFEST_PATH, _manifest_text(new))
+        _add_text(REMOVED_FILE, "".join(f"{name}\n" for name in changes["removed"]))
+    return changes
+
+
+def _print_changes(changes: dict) -> None:
+    for kind, names in changes.items():
+        for name in names:
+            print(f"{kind}: {name}")
+    print(", ".join(f"{len(names)} {kind}" for kind, names in changes.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Content hash manifests of the boliger.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Hash the boliger and write a manifest.")
+    build_parser.add_argument("input_path", nargs="?", default=INPUT_FOLDER)
+    build_parser.add_argument("-o", "--output", default=MANIFEST_PATH)
+    build_parser.add_argument("-w", "--workers", type=int, default=8)
+    build_parser.add_argument(
+        "--rehash", action="store_true", help="Hash every file, even if it looks unchanged."
+    )
+
+    diff_parser = subparsers.add_parser("diff", help="Compare two manifests.")
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+
+    export_parser = subparsers.add_parser(
+        "export", help="Pack the boliger changed since a manifest into an archive."
+    )
+    export_parser.add_argument("input_path", nargs="?", default=INPUT_FOLDER)
+    export_parser.add_argument("--since", required=True, help="The manifest of the other side.")
+    export_parser.add_argument("-o", "--output", default="changes.tar")
+    export_parser.add_argument(
+        "-m",
+        "--manifest",
+        default=MANIFEST_PATH,
+        help="The manifest of this side. Its hashes are reused and it is brought up to date.",
+    )
+    export_parser.add_argument("-w", "--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        earlier: Optional[dict] = None
+        if not args.rehash and os.path.exists(args.output):
+            earlier = read_manifest(args.output)
+        built: dict = build_manifest(args.input_path, earlier, args.workers)
+        print(f"{len(built)} boliger, digest {write_manifest(built, args.output)}")
+    elif args.command == "diff":
+        _print_changes(diff(read_manifest(args.old), read_manifest(args.new)))
+    elif args.command == "export":
+        stored: Optional[dict] = None
+        if os.path.exists(args.manifest):
+            stored = read_manifest(args.manifest)
+        current: dict = build_manifest(args.input_path, stored, args.workers)
+        write_manifest(current, args.manifest)
+        exported: dict = export_changes(
+            args.input_path, read_manifest(args.since), current, args.output
+        )
+        _print_changes(exported)
+        print(f"Written to {args.output}")
@@ -0,0 +1,381 @@
+"""A local stand-in for nybolig.dk, the sites it redirects to and geoapi.dk, for load testing the
+scraper without sending any requests to the real sites."""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+# The start of a JPEG file, enough for anything that only stores the floorplans
+PLACEHOLDER_IMAGE: bytes = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + b"\x00" * 1024 + b"\xff\xd9"
+
+STREETS: tuple = ("Kongevejen", "Nørrebrogade", "Vesterbrogade", "Amagerbrogade", "Strandvejen")
+BOLIG_TYPES: tuple = ("Ejerlejlighed", "Villa", "Rækkehus", "Andelsbolig")
+SITEMAP_NAMESPACE: str = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+@dataclass
+class MockConfig:
+    """
+    Args:
+        pages (int): The number of listing pages of a search without filters.
+        listings_per_page (int): The number of listings on each page.
+        latency (float): Seconds added to every response.
+        latency_jitter (float): Up to this many seconds are added at random to every response.
+        error_rate (float): The share of requests answered with a 500.
+        throttle_rate (float): The share of requests answered with a 429.
+        tail_rate (float): The share of responses delayed by tail_latency, like a stuck request.
+        tail_latency (float): Seconds added to the delayed responses.
+        redirect_rate (float): The share of listings redirected to an external site.
+        home_rate (float): The share of the redirected listings that go to home instead of
+            danbolig. Scraping them needs a browser session.
+        sitemap_size (int): The number of listings in each gzipped sitemap of the sitemap index.
+        seed (int): The seed of the generated listings and injected failures.
+    """
+
+    pages: int = 10
+    listings_per_page: int = 20
+    latency: float = 0.05
+    latency_jitter: float = 0.05
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    tail_rate: float = 0.0
+    tail_latency: float = 2.0
+    redirect_rate: float = 0.2
+    home_rate: float = 0.0
+    sitemap_size: int = 100
+    seed: int = 42
+
+
+def _listing(config: MockConfig, index: int) -> dict:
+    rng = random.Random(config.seed * 1_000_003 + index)
+    postal_code: int = rng.choice((1000, 1500, 2100, 2200, 2300, 2800, 5000, 8000))
+    return {
+        "index": index,
+        "type": rng.choice(BOLIG_TYPES),
+        "street": rng.choice(STREETS),
+        "number": rng.randint(1, 200),
+        "postal_code": postal_code,
+        "price": rng.randrange(1_000_000, 10_000_000, 5_000),
+        "size": rng.randint(30, 250),
+        "rooms": (1, rng.randint(1, 5)),
+        "year_built": rng.randint(1850, 2023),
+        "energy_label": rng.choice("ABCDEFG").lower(),
+        "redirect": rng.random() < config.redirect_rate,
+        "home": rng.random() < config.home_rate,
+    }
+
+
+def _search(config: MockConfig, query: dict) -> list:
+    """Finds the listings passing the type and postal code filters of a search query, like the
+    boligtype, postnrFra and postnrTil parameters of nybolig."""
+    types: list = [t for t in query.get("boligtype", [""])[0].lower().split(",") if t]
+    postal_from: int = int(query.get("postnrFra", ["0"])[0])
+    postal_to: int = int(query.get("postnrTil", ["9999"])[0])
+    indices: list = []
+    for index in range(config.pages * config.listings_per_page):
+        listing: dict = _listing(config, index)
+        if types and listing["type"].lower() not in types:
+            continue
+        if postal_from <= listing["postal_code"] <= postal_to:
+            indices.append(index)
+    return indices
+
+
+def _listing_page(config: MockConfig, base_url: str, indices: list, pages: int) -> str:
+    tiles: list = []
+    for index in indices:
+        listing: dict = _listing(config, index)
+        if listing["redirect"]:
+            href = f"{base_url}/viderestillingekstern/{index}"
+        else:
+            href = _listing_path(listing)
+        tiles.append(
+            f'<li class="list__item"><div class="tile">'
+            f'<a class="tile__image-container" href="{href}"></a>'
+            f'<p class="tile__mix">{listing["type"]} {listing["size"]} m²</p>'
+            f'<p class="tile__address">{listing["street"]} {listing["number"]}, '
+            f'{listing["postal_code"]} By</p>'
+            f'<p class="tile__price">{listing["price"]:,} kr.</p>'
+            f"</div></li>"
+        )
+    spans: str = "".join(f"<span>{n}</span>" for n in range(1, pages + 1))
+    return (
+        f"<html><body><ul>{''.join(tiles)}</ul>"
+        f'<div class="results-pagination">{spans}</div></body></html>'
+    )
+
+
+def _listing_path(listing: dict) -> str:
+    return (
+        f"/{listing['type'].lower()}/{listing['postal_code']}/"
+        f"{listing['street'].lower()}/{100000 + listing['index']}/{200000 + listing['index']}"
+    )
+
+
+def _sitemap_index(config: MockConfig, base_url: str) -> str:
+    listings: int = config.pages * config.listings_per_page
+    sitemaps: list = [f"{base_url}/sitemap-pages.xml"] + [
+        f"{base_url}/sitemap-boliger-{n}.xml.gz"
+        for n in range(-(-listings // config.sitemap_size))
+    ]
+    entries: str = "".join(f"<sitemap><loc>{escape(url)}</loc></sitemap>" for url in sitemaps)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<sitemapindex xmlns="{SITEMAP_NAMESPACE}">{entries}</sitemapindex>'
+    )
+
+
+def _sitemap(urls: list) -> str:
+    entries: str = "".join(f"<url><loc>{escape(url)}</loc></url>" for url in urls)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="{SITEMAP_NAMESPACE}">{entries}</urlset>'
+    )
+
+
+def _nybolig_page(listing: dict, base_url: str) -> str:
+    living_rooms, rooms = listing["rooms"]
+    return (
+        "<html><body>"
+        '<h1 class="case-info__property__info__main__title">'
+        f'<strong class="case-info__property__info__main__title__address">'
+        f'{listing["street"]} {listing["number"]}</strong>'
+        f'<strong class="case-info__property__info__main__title__address">'
+        f'{listing["postal_code"]} By</strong></h1>'
+        f'<span class="case-info__property__info__text__price">{listing["price"]:,} kr.</span>'
+        '<div class="case-facts__box">'
+        f'<div class="case-facts__box-inner-wrap">Boligareal<strong>{listing["size"]} m²'
+        "</strong></div>"
+        f'<div class="case-facts__box-inner-wrap">Stue/Værelser<strong>{living_rooms}/{rooms}'
+        "</strong></div>"
+        f'<div class="case-facts__box-inner-wrap">Bygget/Ombygget<strong>'
+        f'{listing["year_built"]}</strong></div>'
+        '<div class="case-facts__box-inner-wrap"><p>Energimærke</p><span></span><span></span>'
+        f'<div class="icon energy-label-{listing["energy_label"]}"></div></div></div>'
+        '<nav class="sliderControls"><a></a><a></a><a></a><a></a><a></a><a></a><a></a></nav>'
+        '<div class="floorplan__drawing-container"><img class="floorplan__drawing lazy" '
+        f'data-src="{base_url}/images/{listing["index"]}.jpg"></div>'
+        "</body></html>"
+    )
+
+
+def _home_path(listing: dict) -> str:
+    return (
+        f"/home/{listing['street'].lower()}-{listing['number']}-{listing['postal_code']}-by-"
+        f"{listing['index']}"
+    )
+
+
+def _home_page(listing: dict, base_url: str) -> str:
+    # The facts are in the page already, where the real site shows them after a button press
+    living_rooms, rooms = listing["rooms"]
+    return (
+        "<html><body>"
+        f'<h3 class="h3--bold">{listing["street"]} {listing["number"]}, '
+        f'{listing["postal_code"]} By</h3>'
+        f'<h3 class="property-details-information__fact">{listing["price"]:,} kr.</h3>'
+        "<button>Se flere fakta</button>"
+        '<div class="property-details-facts-tab">'
+        f'<div><span>Boligareal</span><span>{listing["size"]} m²</span></div>'
+        f"<div><span>Værelser</span><span>{living_rooms + rooms}</span></div>"
+        f'<div><span>Byggeår</span><span>{listing["year_built"]}</span></div>'
+        f'<div><span>Energimærke</span><span>{listing["energy_label"].upper()}</span></div>'
+        "</div>"
+        f'<img alt="Plantegning" src="{base_url}/images/{listing["index"]}.jpg">'
+        "</body></html>"
+    )
+
+
+def _danbolig_page(listing: dict, base_url: str) -> str:
+    floorplan: str = json.dumps({"url": f"{base_url}/images/{listing['index']}.jpg", "w": 1})
+    floorplan = floorplan.replace('"', "&quot;")
+    return (
+        "<html><body>"
+        f'<h1 class="a-lead o-propertyHero__address">{listing["street"]} {listing["number"]}, '
+        f'{listing["postal_code"]} By</h1>'
+        f'<ul><li class="a-label u-none md:u-flex">Kontantpris {listing["price"]:,} kr.</li></ul>'
+        '<div class="m-table o-propertyPresentationInNumbers__table"><table>'
+        f'<tr><td>Boligareal</td><td>{listing["size"]} m²</td></tr>'
+        f'<tr><td>Rum</td><td>{sum(listing["rooms"])}</td></tr>'
+        f'<tr><td>Byggeår</td><td>{listing["year_built"]}</td></tr>'
+        f'<tr><td>Energimærke</td><td>{listing["energy_label"].upper()}</td></tr>'
+        "</table></div>"
+        f'<o-property-floorplan :floorplan2d="{floorplan}"></o-property-floorplan>'
+        "</body></html>"
+    )
+
+
+class MockServer(ThreadingHTTPServer):
+    """Serves generated listings, and records when each listing is listed and completed, so the
+    time a listing spends in the scraper can be measured."""
+
+    daemon_threads = True
+
+    def __init__(self, config: MockConfig, port: int = 0) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.config: MockConfig = config
+        self.base_url: str = f"http://127.0.0.1:{self.server_address[1]}"
+        self.lock = threading.Lock()
+        self.requests: int = 0
+        self.injected_errors: int = 0
+        self.bytes_sent: int = 0
+        # Listing index -> time its listing page / floorplan was served
+        self.listed_at: dict = {}
+        self.completed_at: dict = {}
+        self._rng = random.Random(config.seed)
+
+    def inject_failure(self) -> Optional[int]:
+        """Returns the status code of an injected failure, if any."""
+        with self.lock:
+            self.requests += 1
+            roll: float = self._rng.random()
+        if roll < self.config.throttle_rate:
+            return 429
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            return 500
+        return None
+
+    def listing_latencies(self) -> list:
+        """Seconds from a listing was served on a listing page until its floorplan was fetched."""
+        with self.lock:
+            return sorted(
+                done - self.listed_at[index]
+                for index, done in self.completed_at.items()
+                if index in self.listed_at
+            )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockServer
+
+    def log_message(self, format: str, *args) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def _redirect(self, location: str) -> None:
+        self._send(302, b"", "text/plain", {"Location": location})
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Routes a request."""
+        config: MockConfig = self.server.config
+        delay: float = config.latency + random.random() * config.latency_jitter
+        if random.random() < config.tail_rate:
+            delay += config.tail_latency
+        time.sleep(delay)
+
+        failure: Optional[int] = self.server.inject_failure()
+        if failure is not None:
+            with self.server.lock:
+                self.server.injected_errors += 1
+            self._send(failure, b"", "text/plain", {"Retry-After": "1"})
+            return
+
+        url = urlparse(self.path)
+        parts: list = [part for part in url.path.split("/") if part]
+        base_url: str = self.server.base_url
+        html: str = "text/html; charset=utf-8"
+
+        if parts == ["til-salg"]:
+            query: dict = parse_qs(url.query)
+            found: list = _search(config, query)
+            page_count: int = max(1, -(-len(found) // config.listings_per_page))
+            page: int = min(max(int(query.get("page", ["1"])[0]), 1), page_count)
+            first: int = (page - 1) * config.listings_per_page
+            shown: list = found[first : first + config.listings_per_page]
+            now: float = time.perf_counter()
+            with self.server.lock:
+                for index in shown:
+                    self.server.listed_at.setdefault(index, now)
+            self._send(200, _listing_page(config, base_url, shown, page_count).encode(), html)
+        elif parts == ["sitemap.xml"]:
+            self._send(200, _sitemap_index(config, base_url).encode(), "application/xml")
+        elif parts == ["sitemap-pages.xml"]:
+            pages: list = [f"{base_url}/til-salg", f"{base_url}/om-nybolig"]
+            self._send(200, _sitemap(pages).encode(), "application/xml")
+        elif parts[:1] and parts[0].startswith("sitemap-boliger-"):
+            first = int(parts[0].split("-")[2].split(".")[0]) * config.sitemap_size
+            last: int = min(first + config.sitemap_size, config.pages * config.listings_per_page)
+            urls: list = []
+            now = time.perf_counter()
+            for index in range(first, last):
+                listing = _listing(config, index)
+                if not listing["redirect"]:
+                    urls.append(base_url + _listing_path(listing))
+                    with self.server.lock:
+                        self.server.listed_at.setdefault(index, now)
+            self._send(200, gzip.compress(_sitemap(urls).encode()), "application/x-gzip")
+        elif parts[:1] == ["viderestillingekstern"]:
+            self._redirect(f"{base_url}/redirect/{parts[1]}")
+        elif parts[:1] == ["redirect"]:
+            listing: dict = _listing(config, int(parts[1]))
+            if listing["home"]:
+                self._redirect(base_url + _home_path(listing))
+            else:
+                self._redirect(f"{base_url}/danbolig/{listing['postal_code']}/{parts[1]}")
+        elif parts[:1] == ["home"]:
+            listing = _listing(config, int(parts[1].rsplit("-", 1)[1]))
+            self._send(200, _home_page(listing, base_url).encode(), html)
+        elif parts[:1] == ["danbolig"]:
+            listing = _listing(config, int(parts[2]))
+            self._send(200, _danbolig_page(listing, base_url).encode(), html)
+        elif parts[:1] == ["images"]:
+            index: int = int(parts[1].split(".")[0])
+            with self.server.lock:
+                self.server.completed_at[index] = time.perf_counter()
+            self._send(200, PLACEHOLDER_IMAGE, "image/jpeg")
+        elif parts[:1] == ["geoapi"]:
+            rng = random.Random(parse_qs(url.query).get("q", [""])[0])
+            coordinates: dict = {"lat": 55 + rng.random(), "lng": 12 + rng.random()}
+            self._send(200, json.dumps(coordinates).encode(), "application/json")
+        elif len(parts) == 5 and parts[-1].isdigit():
+            listing = _listing(config, int(parts[-1]) - 200000)
+            self._send(200, _nybolig_page(listing, base_url).encode(), html)
+        else:
+            self._send(404, b"Not found", "text/plain")
+
+
+def start_server(config: MockConfig, port: int = 0) -> MockServer:
+    """Starts the mock server in a background thread. Port 0 picks a free port."""
+    server = MockServer(config, port)
+    threading.Thread(target=server.serve_forever, name="mock-server", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for nybolig.dk.")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pages", type=int, default=MockConfig.pages)
+    parser.add_argument("--latency", type=float, default=MockConfig.latency)
+    parser.add_argument("--error-rate", type=float, default=MockConfig.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=MockConfig.throttle_rate)
+    args = parser.parse_args()
+
+    mock_server = MockServer(
+        MockConfig(
+            pages=args.pages,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+        ),
+        args.port,
+    )
+    print(f"Serving on {mock_server.base_url}, geoapi at {mock_server.base_url}/geoapi/")
+    mock_server.serve_forever()
@@ -0,0 +1,85 @@
+"""Writes JSON lines to a stream from a single background thread, flushing them in batches."""
+
+import queue
+import sys
+import threading
+import time
+from typing import Optional, TextIO
+
+_DONE = object()
+
+
+class NdjsonWriter:
+    """
+    Writes one line per call to write, in the order of the calls. The lines are flushed once
+    batch_size lines are waiting or flush_interval seconds have passed, whichever comes first, so
+    a reader sees them soon without a flush per line.
+
+    Args:
+        stream (TextIO): Where the lines are written, e.g. sys.stdout.
+        batch_size (int): The number of lines written before a flush.
+        flush_interval (float): The longest time in seconds a line waits before it is flushed.
+    """
+
+    def __init__(
+        self, stream: TextIO, batch_size: int = 100, flush_interval: float = 1.0
+    ) -> None:
+        self._stream: TextIO = stream
+        self._batch_size: int = batch_size
+        self._flush_interval: float = flush_interval
+        self._queue: queue.Queue = queue.Queue()
+        self.lines: int = 0
+        # Set when the reader has gone away, so the producer can stop
+        self.broken = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ndjson-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        """Queues a line. It must not contain newlines."""
+        if not self.broken.is_set():
+            self._queue.put(line)
+
+    def _run(self) -> None:
+        batch: list = []
+        deadline: Optional[float] = None
+        while True:
+            timeout: Optional[float] = None
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                line = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                line = None
+            if line is not None and line is not _DONE:
+                batch.append(line)
+                if deadline is None:
+                    deadline = time.monotonic() + self._flush_interval
+            if batch and (
+                line is None
+                or line is _DONE
+                or len(batch) >= self._batch_size
+                or time.monotonic() >= deadline
+            ):
+                if not self._flush(batch):
+                    return
+                batch = []
+                deadline = None
+            if line is _DONE:
+                return
+
+    def _flush(self, batch: list) -> bool:
+        try:
+            self._stream.write("".join(f"{line}\n" for line in batch))
+            self._stream.flush()
+        except BrokenPipeError:
+            # The reader has gone away, e.g. `| head`. Drop the rest of the lines.
+            print("The output stream was closed, no more lines are written.", file=sys.stderr)
+            self.broken.set()
+            return False
+        self.lines += len(batch)
+        return True
+
+    def close(self) -> None:
+        """Writes the queued lines and stops the writer thread."""
+        self._queue.put(_DONE)
+        self._thread.join()
@@ -0,0 +1,151 @@
+"""A threaded pipeline of stages connected by bounded queues."""
+
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+# Marks the end of the stream. It is passed from stage to stage once all workers are done.
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    A step in the pipeline.
+
+    Args:
+        name (str): The name of the stage, used for thread names and error messages.
+        func (Callable): Takes one item and returns an iterable of items for the next stage, or
+            None if the item should be dropped.
+        workers (int): The number of threads running the stage.
+        queue_size (int): The size of the queue feeding the stage. A full queue blocks the
+            previous stage, which bounds the memory used by items in flight.
+    """
+
+    name: str
+    func: Callable[[object], Optional[Iterable]]
+    workers: int = 1
+    queue_size: int = 32
+
+
+def _stopped(stops: tuple) -> bool:
+    return any(stop.is_set() for stop in stops)
+
+
+def _feed(source: Iterable, outbox: queue.Queue, errors: list, stops: tuple) -> None:
+    try:
+        for item in source:
+            if _stopped(stops):
+                break
+            outbox.put(item)
+    except Exception as e:  # pylint: disable=broad-except
+        # Raised to the consumer of the pipeline once the items already fed are through
+        errors.append(e)
+    finally:
+        outbox.put(_DONE)
+
+
+def _work(
+    stage: Stage,
+    inbox: queue.Queue,
+    outbox: queue.Queue,
+    remaining: list,
+    lock: threading.Lock,
+    stops: tuple,
+) -> None:
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            # Put it back so the other workers of this stage also stop
+            inbox.put(_DONE)
+            break
+        if _stopped(stops):
+            # Drop the items in flight, but keep taking them so the stages before do not block
+            continue
+        try:
+            for result in stage.func(item) or ():
+                outbox.put(result)
+        except Exception as e:
+            print(f"Error in {stage.name} stage: {e}")
+
+    # The last worker to finish tells the next stage that no more items are coming
+    with lock:
+        remaining[0] -= 1
+        last_worker: bool = remaining[0] == 0
+    if last_worker:
+        outbox.put(_DONE)
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: list,
+    output_queue_size: int = 32,
+    stop: Optional[threading.Event] = None,
+) -> Iterator:
+    """
+    Runs the items from source through the stages and yields the output of the last stage as
+    soon as it is ready.
+
+    Args:
+        source (Iterable): The items fed to the first stage.
+        stages (list): The stages, in order.
+        output_queue_size (int): The size of the queue holding results of the last stage.
+        stop (threading.Event): When set, no more items are taken from source and the items in
+            flight are dropped, so the pipeline ends soon. The same happens when the consumer
+            stops iterating early, without setting stop.
+
+    Raises:
+        Exception: Whatever iterating source raised, after the items fed before it have been
+            through all stages. Errors in the stages are printed and the item is dropped.
+    """
+    # Set when the consumer stops early. The stop of the caller is left alone, as it may be
+    # shared with other pipelines.
+    halt = threading.Event()
+    stops: tuple = (halt,) if stop is None else (halt, stop)
+    queues: list = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    queues.append(queue.Queue(maxsize=output_queue_size))
+
+    errors: list = []
+    threads: list = [
+        threading.Thread(
+            target=_feed, args=(source, queues[0], errors, stops), name="feed", daemon=True
+        )
+    ]
+    for i, stage in enumerate(stages):
+        remaining: list = [stage.workers]
+        lock = threading.Lock()
+        for n in range(stage.workers):
+            threads.append(
+                threading.Thread(
+                    target=_work,
+                    args=(stage, queues[i], queues[i + 1], remaining, lock, stops),
+                    name=f"{stage.name}-{n}",
+                    daemon=True,
+                )
+            )
+
+    for thread in threads:
+        thread.start()
+
+    ended: bool = False
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                ended = True
+                break
+            yield item
+    finally:
+        if not ended:
+            # The consumer stopped early. Stop the stages and take the results left, so no
+            # thread stays blocked on a full queue.
+            halt.set()
+            while queues[-1].get() is not _DONE:
+                pass
+        for thread in threads:
+            thread.join()
+        if errors and not ended:
+            print(f"Error in feed: {errors[0]}")
+    if errors:
+        raise errors[0]
@@ -0,0 +1,109 @@
+"""A sampling profiler covering all threads, with optional memory snapshots, for finding out where
+a scrape or conversion spends its time."""
+
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+SAMPLE_INTERVAL: float = 0.005
+TOP_ALLOCATIONS: int = 50
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread at a fixed interval. The stacks are written in the
+    collapsed format ("thread;module:function;... count"), which flamegraph.pl and speedscope
+    read directly. Threads are named by their pipeline stage, so the flamegraph shows how much
+    time each stage spends in parsing, waiting for the network or writing to disk.
+
+    Args:
+        interval (float): Seconds between samples.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL) -> None:
+        self._interval: float = interval
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        """Starts sampling in a background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self) -> None:
+        own_id: int = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            names: dict = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: list = []
+                while frame is not None:
+                    code = frame.f_code
+                    module: str = Path(code.co_filename).stem
+                    stack.append(f"{module}:{code.co_name}")
+                    frame = frame.f_back
+                # Group the workers of a stage, e.g. "detail-3" -> "detail"
+                thread_name: str = names.get(thread_id, str(thread_id)).rsplit("-", 1)[0]
+                stack.append(thread_name)
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def write_collapsed(self, path: Path) -> None:
+        """Writes the sampled stacks in the collapsed format."""
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+def _write_top_allocations(snapshot: tracemalloc.Snapshot, path: Path) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        for stat in snapshot.statistics("traceback")[:TOP_ALLOCATIONS]:
+            file.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format():
+                file.write(f"{line}\n")
+            file.write("\n")
+
+
+def new_run_dir(root: str = "profiles") -> Path:
+    """Creates a directory for the output of a profiled run."""
+    run_dir = Path(root).joinpath(datetime.now().strftime("%Y%m%d-%H%M%S"))
+    run_dir.mkdir(parents=True, exist_ok=True)
+    return run_dir
+
+
+@contextmanager
+def profiled(stage: str, run_dir: Path, trace_memory: bool = False) -> Iterator:
+    """
+    Profiles the code in the block, writing <stage>.collapsed to the run directory. With
+    trace_memory, the top allocation sites still alive at the end of the stage are written to
+    <stage>_allocations.txt.
+    """
+    profiler = SamplingProfiler()
+    if trace_memory:
+        tracemalloc.start(25)
+    profiler.start()
+    start_time: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        print(f"Profiled {stage} for {time.perf_counter() - start_time:.1f} seconds")
+        profiler.write_collapsed(run_dir / f"{stage}.collapsed")
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"Peak traced memory during {stage}: {peak / 1024 / 1024:.1f} MiB")
+            _write_top_allocations(snapshot, run_dir / f"{stage}_allocations.txt")
+        print(f"Profile written to {run_dir}")
@@ -0,0 +1,153 @@
+"""The record of a single bolig, shared by the scraper and the tools working on its output."""
+
+import json
+from dataclasses import dataclass, field, fields
+from typing import Optional, get_args
+
+# Keys used by older versions of data.json, and the fields they map to
+LEGACY_KEYS: dict = {"lattitude": "lat", "longitude": "lng"}
+# The energy labels, best first. Labels such as "A2020" count as their first letter.
+ENERGY_LABELS: tuple = ("a", "b", "c", "d", "e", "f", "g")
+# Values looked up from other sources after scraping, and the fields they fill
+LOOKUPS: dict = {
+    "coordinates": ("lat", "lng"),
+    "postal_avg_sqm_price": ("postal_avg_sqm_price",),
+}
+
+
+@dataclass(slots=True)
+class Bolig:
+    """
+    A bolig with typed fields. Slots keep each record small when millions of them are in memory,
+    and the field order is the key order of data.json and the column order of the csv.
+
+    Missing values are None. Coordinates of (0, 0) and an average square meter price of 0 mean
+    that the value could not be found, so they are stored as None as well, and the lookup is
+    added to not_found. It is stored in data.json when not empty, so a value that was looked up
+    without a result is not looked up again, unlike one that was never looked up.
+    """
+
+    listing_id: Optional[str] = None
+    url: Optional[str] = None
+    address: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    postal_code: Optional[int] = None
+    type: Optional[str] = None
+    price: Optional[int] = None
+    postal_avg_sqm_price: Optional[float] = None
+    size: Optional[int] = None
+    basement_size: Optional[int] = None
+    rooms: Optional[int] = None
+    year_built: Optional[int] = None
+    year_rebuilt: Optional[int] = None
+    energy_label: Optional[str] = None
+    # The LOOKUPS that were made without a result. Not part of the data columns.
+    not_found: tuple = field(default=(), metadata={"data": False})
+
+    def __post_init__(self) -> None:
+        self.validate()
+
+    def validate(self) -> None:
+        """Converts every field to its type, raising a ValueError if that is not possible."""
+        for name, converter in _CONVERTERS:
+            value = getattr(self, name)
+            if value is None or value == "":
+                setattr(self, name, None)
+                continue
+            try:
+                setattr(self, name, converter(value))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid {name}: {value!r}") from e
+        not_found: set = set(self.not_found or ())
+        if self.lat == 0 and self.lng == 0:
+            self.lat = self.lng = None
+            not_found.add("coordinates")
+        if self.postal_avg_sqm_price == 0:
+            self.postal_avg_sqm_price = None
+            not_found.add("postal_avg_sqm_price")
+        unknown: set = not_found - set(LOOKUPS)
+        if unknown:
+            raise ValueError(f"Invalid not_found: {sorted(unknown)!r}")
+        self.not_found = tuple(sorted(not_found))
+
+    def is_looked_up(self, lookup: str) -> bool:
+        """Whether a lookup from LOOKUPS has been made, with or without a result."""
+        return lookup in self.not_found or all(
+            getattr(self, name) is not None for name in LOOKUPS[lookup]
+        )
+
+    def _set_lookup(self, lookup: str, values: tuple) -> None:
+        for name, value in zip(LOOKUPS[lookup], values):
+            # None is a lookup without a result, like 0
+            setattr(self, name, 0 if value is None else value)
+        self.not_found = tuple(name for name in self.not_found if name != lookup)
+        self.validate()
+
+    def set_coordinates(self, coordinates: tuple) -> None:
+        """Sets the coordinates from a (lat, lng) tuple. (0, 0) means they were not found."""
+        self._set_lookup("coordinates", coordinates)
+
+    def set_postal_avg_sqm_price(self, postal_avg_sqm_price: Optional[float]) -> None:
+        """Sets the average square meter price. None or 0 means it was not found."""
+        self._set_lookup("postal_avg_sqm_price", (postal_avg_sqm_price,))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Bolig":
+        """Creates a bolig from a dict, such as a loaded data.json. Legacy keys are renamed and
+        unknown keys are ignored."""
+        values: dict = {}
+        for key, value in data.items():
+            key = LEGACY_KEYS.get(key, key)
+            if key in FIELD_NAMES or key == "not_found":
+                values.setdefault(key, value)
+        return cls(**values)
+
+    def to_dict(self) -> dict:
+        """Returns the fields as a dict, in field order, with not_found at the end if any."""
+        data: dict = {name: getattr(self, name) for name in FIELD_NAMES}
+        if self.not_found:
+            data["not_found"] = list(self.not_found)
+        return data
+
+    def to_row(self) -> tuple:
+        """Returns the data fields as a tuple, in field order."""
+        return tuple(getattr(self, name) for name in FIELD_NAMES)
+
+    @classmethod
+    def from_json(cls, text: str) -> "Bolig":
+        """Creates a bolig from a JSON string."""
+        return cls.from_dict(json.loads(text))
+
+    def to_json(self, indent: Optional[int] = 4) -> str:
+        """Returns the bolig as a JSON string."""
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
+
+
+def _to_int(value) -> int:
+    # Numbers are sometimes stored as floats or strings, e.g. "2500000" or 2500000.0
+    return value if type(value) is int else int(float(value))
+
+
+_TYPE_CONVERTERS: dict = {str: str, int: _to_int, float: float}
+_DATA_FIELDS: tuple = tuple(
+    field_ for field_ in fields(Bolig) if field_.metadata.get("data", True)
+)
+# The data fields: the keys of data.json and the columns of the csv and the dataset
+FIELD_NAMES: tuple = tuple(field_.name for field_ in _DATA_FIELDS)
+# (field name, converter) for each data field, from the type inside Optional[...]
+_CONVERTERS: tuple = tuple(
+    (field_.name, _TYPE_CONVERTERS[get_args(field_.type)[0]]) for field_ in _DATA_FIELDS
+)
+
+
+def load_bolig(path) -> Bolig:
+    """Loads a bolig from a data.json file."""
+    with open(path, "r", encoding="utf-8") as file:
+        return Bolig.from_dict(json.load(file))
+
+
+def save_bolig(path, bolig: Bolig) -> None:
+    """Saves a bolig to a data.json file."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(bolig.to_json())
@@ -1,21 +1,43 @@
 """A script for scraping estate data from nybolig.dk"""
 
+import contextlib
 import json
-from concurrent.futures import ThreadPoolExecutor
+import os
+import re
+import sys
+import threading
+import time
 from pathlib import Path
+from typing import Iterator, Optional, TextIO
+from urllib.parse import unquote, urlencode, urlparse
 import requests
 from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 import pandas as pd
 import coordinates
+from browser_pool import BrowserPool
+from hedging import HedgedSession
+from history import HistoryStore, run_timestamp
+from html_stream import read_until
+from ndjson import NdjsonWriter
+from pipeline import Stage, run_pipeline
+from record import Bolig, load_bolig, save_bolig
+from sitemap import iter_sitemap_urls
 
 # Debugging
 error_count: dict = {}
+error_count_lock = threading.Lock()
+# Tiles seen and tiles the search query should have left out, to notice if the search ignores
+# the filters
+filter_count: dict = {"tiles": 0, "outside_query": 0}
 
 
-# Load configuration from file
-config_file_path: Path = Path(__file__).parent.joinpath("config.json")
+# Load configuration from file. NYBOLIG_CONFIG can point to another file, e.g. for load tests.
+config_file_path: Path = Path(
+    os.environ.get("NYBOLIG_CONFIG", Path(__file__).parent.joinpath("config.json"))
+)
 if not config_file_path.is_file():
     raise FileNotFoundError("Configuration file not found.")
 
@@ -32,27 +54,198 @@ HTML_PARSER: str = config["html_parser"]
 LISTING_CLASS: str = config["listing_class"]
 BOLIG_TYPES: dict = config["bolig_types"]
 POSTAL_CODE_FILTERS: dict = config["postal_code_filters"]
+SEARCH_QUERY: dict = config["search_query"]
+PIPELINE: dict = config["pipeline"]
+BROWSER: dict = config["browser"]
+HISTORY_PATH: str = config["history_path"]
+DELTA: dict = config["delta"]
+TILES_PATH: str = config["tiles_path"]
+SITEMAP: dict = config["sitemap"]
+HEDGING: dict = config["hedging"]
+STREAM_DETAILS: bool = config["stream_details"]
+coordinates.GEOAPI_URL = config["geoapi_url"]
+
+ENABLED_BOLIG_TYPES: frozenset = frozenset(
+    bolig_type for bolig_type, enabled in BOLIG_TYPES.items() if enabled
+)
+# Danish postal codes are four digits, so every possible code fits in a 10,000-bit set.
+POSTAL_CODE_SPACE: int = 10_000
+
+
+def _validate_config():
+    for postal_range in POSTAL_CODE_FILTERS["ranges"]:
+        if len(postal_range) != 2:
+            raise ValueError(
+                "Postal code filter ranges must have exactly two numbers.", postal_range
+            )
+        if postal_range[0] > postal_range[1]:
+            raise ValueError(
+                "Invalid postal code range: start value is greater than end value.",
+                postal_range,
+            )
+
+
+def _compile_postal_code_filter() -> bytearray:
+    """Compiles the postal code filters into a bitset with one bit per postal code."""
+    bitset = bytearray(POSTAL_CODE_SPACE // 8)
+    postal_codes: list = list(POSTAL_CODE_FILTERS["individual"])
+    for start, end in POSTAL_CODE_FILTERS["ranges"]:
+        postal_codes.extend(range(max(start, 0), min(end, POSTAL_CODE_SPACE - 1) + 1))
+    for postal_code in postal_codes:
+        if 0 <= postal_code < POSTAL_CODE_SPACE:
+            bitset[postal_code >> 3] |= 1 << (postal_code & 7)
+    return bitset
+
+
+# Built when the config is loaded, so every entry point filters the same way
+_validate_config()
+POSTAL_CODE_BITSET: bytearray = _compile_postal_code_filter()
+
+
+def _is_wanted_postal_code(postal_code: int) -> bool:
+    if not 0 <= postal_code < POSTAL_CODE_SPACE:
+        return False
+    return bool(POSTAL_CODE_BITSET[postal_code >> 3] & (1 << (postal_code & 7)))
+
 
 SESSION: requests.Session = requests.Session()
 HEADERS: dict = {"User-Agent": USER_AGENT}
+# All GET requests go through HTTP, which hedges slow requests if enabled in the config
+HTTP: HedgedSession = HedgedSession(SESSION, **HEDGING)
+coordinates.GET = HTTP.get
+
+# IDs of the boliger already in the output folder, loaded by the first run and kept up to date
+SCRAPED_IDS: set = set()
+# IDs of the boliger the delta crawl has handed to the detail stage, whatever came of them, so
+# unsupported redirects and failed boliger count as known in the next runs
+SEEN_IDS: set = set()
+SEEN_PATH: str = DELTA["seen_path"]
+
+# Loaded when the first run starts, as replaying the history takes a while
+HISTORY: Optional[HistoryStore] = None
+RUN_TIMESTAMP: str = run_timestamp()
+# Set while the scraped boliger are streamed as NDJSON, see ndjson_output
+NDJSON: Optional[NdjsonWriter] = None
+
+GEOCODER: coordinates.Geocoder = coordinates.Geocoder(
+    PIPELINE["geocode_workers"], PIPELINE["queue_size"]
+)
+
+# Sessions are only started when a site that needs JS is scraped
+BROWSER_POOL: BrowserPool = BrowserPool(
+    BROWSER["pool_size"], BROWSER["max_pages_per_session"]
+)
+# Sites whose detail pages are rendered in the browser pool, and the button that has to be
+# pressed to show all facts. The button is found by its text, not its position in the page.
+JS_SITES: frozenset = frozenset({"home"})
+HOME_FACTS_BUTTON: str = "//button[contains(normalize-space(.), 'Se flere fakta')]"
+HOME_FACTS_CLASS: str = "property-details-facts-tab"
+# The labels of the home facts, and the field each one is read into
+HOME_FACT_LABELS: tuple = (
+    ("Boligareal", "size"),
+    ("Kælder", "basement_size"),
+    ("Værelser", "rooms"),
+    ("Byggeår", "year_built"),
+    ("Ombygget", "year_rebuilt"),
+    ("Energimærke", "energy_label"),
+)
+# The last elements the data of a detail page is extracted from, as (tag, class). A streamed
+# detail page is only read until all of them are closed, which skips the image carousels and
+# scripts after them. Sites without markers are read in full.
+DETAIL_MARKERS: dict = {
+    "nybolig": (
+        # The address parts, the price, the facts, the floorplan count and the floorplan. Facts
+        # and address parts are read by their container, which closes after all of them.
+        ("h1", "case-info__property__info__main__title"),
+        ("span", "case-info__property__info__text__price"),
+        ("div", "case-facts__box"),
+        ("nav", "sliderControls"),
+        ("div", "floorplan__drawing-container"),
+    ),
+    "danbolig": (
+        # The address, the price (the first label with these exact classes), the facts table
+        # and the floorplan
+        ("h1", "a-lead o-propertyHero__address"),
+        ("li", "a-label u-none md:u-flex"),
+        ("div", "m-table o-propertyPresentationInNumbers__table"),
+        ("o-property-floorplan", None),
+    ),
+    "estate": (
+        ("h1", "case-info__property__info__main__title"),
+        ("span", "case-info__property__info__text__price"),
+        ("div", "case-facts__box"),
+        ("img", "floorplan__drawing lazy"),
+    ),
+}
+# The fields a bolig cannot be saved without. If one is missing from a page that was read only
+# up to the markers, the page is read again in full.
+REQUIRED_FIELDS: tuple = ("address", "price")
 
 
 def _get_soup(url: str) -> BeautifulSoup:
-    response = SESSION.get(url, headers=HEADERS)
+    response = HTTP.get(url, headers=HEADERS)
     response.raise_for_status()  # Check if the request was successful
     return BeautifulSoup(response.text, HTML_PARSER)
 
 
-def _get_max_pages() -> int:
-    soup = _get_soup(r"https://www.nybolig.dk/til-salg")
+def _query_postal_range() -> Optional[tuple]:
+    """The postal codes pushed into the search query, as the bounding range of all the filters,
+    as the site only supports a single range."""
+    postal_codes: list = list(POSTAL_CODE_FILTERS["individual"])
+    for postal_range in POSTAL_CODE_FILTERS["ranges"]:
+        postal_codes.extend(postal_range)
+    if not postal_codes:
+        return None
+    return min(postal_codes), max(postal_codes)
+
+
+# The filters pushed into the search query. The exact filters are still applied locally to each
+# tile, so the search may return more than they let through.
+QUERY_TYPES: frozenset = (
+    ENABLED_BOLIG_TYPES if ENABLED_BOLIG_TYPES != set(BOLIG_TYPES) else frozenset()
+)
+QUERY_POSTAL_RANGE: Optional[tuple] = _query_postal_range()
+
+
+def _build_search_query() -> str:
+    """
+    Pushes the configured bolig types and postal codes into the search query, so nybolig only
+    returns pages with relevant listings.
+    """
+    params: list = []
+    if QUERY_TYPES:
+        params.append((SEARCH_QUERY["type_param"], ",".join(sorted(QUERY_TYPES))))
+    if QUERY_POSTAL_RANGE is not None:
+        params.append((SEARCH_QUERY["postal_code_from_param"], QUERY_POSTAL_RANGE[0]))
+        params.append((SEARCH_QUERY["postal_code_to_param"], QUERY_POSTAL_RANGE[1]))
+    return urlencode(params)
+
+
+SEARCH_QUERY_STRING: str = _build_search_query()
+
+
+NEWEST_FIRST_QUERY_STRING: str = urlencode(SEARCH_QUERY["newest_first_params"])
+
+
+def _build_sale_url(page: int, newest_first: bool = False) -> str:
+    query: str = f"{SEARCH_QUERY_STRING}&" if SEARCH_QUERY_STRING else ""
+    if newest_first:
+        query += f"{NEWEST_FIRST_QUERY_STRING}&"
+    return f"{URL}/til-salg?{query}page={page}"
+
+
+def _get_search_overview() -> tuple:
+    """Gets the number of pages and listings per page for the filtered search."""
+    soup = _get_soup(_build_sale_url(1))
+    listings_per_page: int = len(soup.find_all("li", class_=LISTING_CLASS))
     pagination = soup.find("div", class_="results-pagination")
     if not pagination:
-        return 1
+        return 1, listings_per_page
     last_page = pagination.find_all("span")[-1].text
-    return int(last_page)
+    return int(last_page), listings_per_page
 
 
-MAX_PAGES: int = _get_max_pages()
+MAX_PAGES, LISTINGS_PER_PAGE = _get_search_overview()
 
 
 def _load_postal_avg_sqm_price() -> dict:
@@ -133,47 +326,91 @@ def _load_postal_avg_sqm_price() -> dict:
 POSTAL_AVG_SQM_PRICE: dict = _load_postal_avg_sqm_price()
 
 
-def _validate_config():
-    for postal_range in POSTAL_CODE_FILTERS["ranges"]:
-        if len(postal_range) != 2:
-            raise ValueError(
-                "Postal code filter ranges must have exactly two numbers.", postal_range
-            )
-        if postal_range[0] > postal_range[1]:
-            raise ValueError(
-                "Invalid postal code range: start value is greater than end value.",
-                postal_range,
-            )
-
-
-def _extract_bolig_data(bolig_url: str, bolig_type: str, bolig_site: str) -> tuple:
-    source: requests.Response = SESSION.get(bolig_url, headers=HEADERS).text
-    soup = BeautifulSoup(source, HTML_PARSER)
-    bolig_data: dict = {}
+def _render_soup(bolig_url: str) -> BeautifulSoup:
+    """Renders a home page in a pooled browser session, with all facts shown."""
+    with BROWSER_POOL.lease() as driver:
+        driver.get(bolig_url)
+        wait = WebDriverWait(driver, BROWSER["wait_timeout"])
+        button = wait.until(EC.element_to_be_clickable((By.XPATH, HOME_FACTS_BUTTON)))
+        button.click()
+        wait.until(EC.presence_of_element_located((By.CLASS_NAME, HOME_FACTS_CLASS)))
+        page_source: str = driver.page_source
+    return BeautifulSoup(page_source, HTML_PARSER)
+
+
+def _get_detail_soup(bolig_url: str, bolig_site: str, full: bool = False) -> tuple:
+    """Returns the soup of a detail page, and whether the page was only read up to its
+    markers."""
+    if bolig_site in JS_SITES:
+        return _render_soup(bolig_url), False
+    if not STREAM_DETAILS or full:
+        return _get_soup(bolig_url), False
+    # The images of nybolig are in the carousel, so the whole page is needed for them
+    markers: tuple = DETAIL_MARKERS.get(bolig_site, ())
+    if INCLUDE_IMAGES and bolig_site == "nybolig":
+        markers = ()
+    response: requests.Response = HTTP.get(bolig_url, headers=HEADERS, stream=True)
+    if not response.ok:
+        # An error page is not a listing, and is not read at all
+        response.close()
+        response.raise_for_status()
+    encoding: Optional[str] = response.encoding
+    source, stopped = read_until(response, markers)
+    return BeautifulSoup(source, HTML_PARSER, from_encoding=encoding), stopped
+
+
+def _extract_bolig_data(
+    bolig_url: str, bolig_type: str, bolig_site: str, listing_id: str
+) -> tuple:
+    soup, stopped = _get_detail_soup(bolig_url, bolig_site)
+    if not stopped:
+        return _read_bolig_data(soup, bolig_url, bolig_type, bolig_site, listing_id)
+    try:
+        bolig, image_urls = _read_bolig_data(
+            soup, bolig_url, bolig_type, bolig_site, listing_id
+        )
+        missing: list = [field for field in REQUIRED_FIELDS if getattr(bolig, field) is None]
+        if not missing:
+            return bolig, image_urls
+        reason: str = f"no {', '.join(missing)}"
+    except (AttributeError, IndexError, TypeError, ValueError) as e:
+        reason = str(e) or type(e).__name__
+    # The markers were seen before the data, e.g. after a change to the site
+    print(f"Reading {bolig_url} in full, as the start of the page had {reason}")
+    soup, _ = _get_detail_soup(bolig_url, bolig_site, full=True)
+    return _read_bolig_data(soup, bolig_url, bolig_type, bolig_site, listing_id)
+
+
+def _read_bolig_data(
+    soup: BeautifulSoup, bolig_url: str, bolig_type: str, bolig_site: str, listing_id: str
+) -> tuple:
     image_urls: list = []
 
-    # Extract the data from the bolig
-    bolig_data["url"] = bolig_url
-    bolig_data["address"] = _extract_address(soup, bolig_site)
-    bolig_data["lattitude"], bolig_data["longitude"] = coordinates.get_coordinates(
-        bolig_data["address"]
-    )
-    bolig_data["postal_code"] = _extract_postal_code(bolig_url, bolig_site)
-    bolig_data["type"] = bolig_type
-    bolig_data["price"] = _extract_price(soup, bolig_site)
-    bolig_data["postal_avg_sqm_price"] = POSTAL_AVG_SQM_PRICE.get(
-        bolig_data["postal_code"], 0.0
+    # Extract the data from the bolig. The coordinates are added by the geocoder and the average
+    # square meter price by the enrich stage.
+    bolig = Bolig(
+        listing_id=listing_id,
+        url=bolig_url,
+        address=_extract_address(soup, bolig_site),
+        postal_code=_extract_postal_code(bolig_url, bolig_site),
+        type=bolig_type,
+        price=_extract_price(soup, bolig_site),
+        **_extract_bolig_facts_box(soup, bolig_site, bolig_url),
     )
-    bolig_data.update(_extract_bolig_facts_box(soup, bolig_site, bolig_url))
 
     # Extract floor plan from the bolig
     image_urls.append(_extract_floorplan(soup, bolig_site))
 
     # Extract the images from the bolig
     if INCLUDE_IMAGES:
-        image_urls.append(_extract_images(soup, bolig_site))
+        image_urls.extend(_extract_images(soup, bolig_site))
+
+    return bolig, image_urls
 
-    return bolig_data, image_urls
+
+def _enrich_bolig_data(bolig: Bolig) -> Bolig:
+    bolig.set_postal_avg_sqm_price(POSTAL_AVG_SQM_PRICE.get(bolig.postal_code))
+    return bolig
 
 
 def _create_bolig_folder(bolig_folder: Path) -> None:
@@ -183,110 +420,721 @@ def _create_bolig_folder(bolig_folder: Path) -> None:
         print(f"Skipping existing folder: {bolig_folder}")
 
 
-def _save_data_and_images(bolig_folder: Path, bolig_data: dict, images: list) -> None:
-    with open(bolig_folder / "data.json", "w", encoding="utf-8") as f:
-        json.dump(bolig_data, f, indent=4)
+def _save_data(bolig_folder: Path, bolig: Bolig) -> None:
+    # Write to a temporary file first, as the geocoder may rewrite the file at the same time
+    temp_path = bolig_folder / f"data.json.{threading.get_ident()}.tmp"
+    save_bolig(temp_path, bolig)
+    os.replace(temp_path, bolig_folder / "data.json")
+
+
+def _save_coordinates(bolig_folder: Path, bolig: Bolig, coordinates_: tuple) -> None:
+    bolig.set_coordinates(coordinates_)
+    _save_data(bolig_folder, bolig)
+
+
+def _save_data_and_images(bolig_folder: Path, bolig: Bolig, images: list) -> None:
+    _save_data(bolig_folder, bolig)
 
     for i, image_url in enumerate(images):
-        image_data = SESSION.get(image_url).content
+        image_data = HTTP.get(image_url).content
         with open(bolig_folder / f"{i}.jpg", "wb") as f:
             f.write(image_data)
 
 
-def _process_bolig(bolig: BeautifulSoup) -> None:
+LISTING_ID_PATTERN = re.compile(r"\d+-\d+")
+
+
+def _migrate_legacy_folder(folder_path: str) -> str:
+    """
+    Renames a folder named after the address, as written by older versions, to the listing ID
+    of its bolig, and returns the ID. Boliger without listing numbers keep the address as their
+    ID, which is the name the folder already has.
+    """
+    name: str = os.path.basename(folder_path)
+    data_path: str = os.path.join(folder_path, "data.json")
+    try:
+        bolig: Bolig = load_bolig(data_path)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {data_path}: {e}")
+        return name
+    listing_id: Optional[str] = bolig.listing_id
+    if listing_id is None and bolig.url and bolig.url.startswith(URL):
+        listing_id = _listing_id_from_url(bolig.url)
+    if listing_id is None or listing_id == name:
+        return name
+    new_path: str = os.path.join(os.path.dirname(folder_path), listing_id)
+    if os.path.exists(new_path):
+        print(f"Not migrating {folder_path}, {new_path} already exists")
+        return name
+    bolig.listing_id = listing_id
+    save_bolig(data_path, bolig)
+    os.rename(folder_path, new_path)
+    print(f"Migrated {folder_path} to {new_path}")
+    return listing_id
+
+
+def _load_scraped_ids() -> set:
+    """Loads the IDs of the boliger that already have data in the output folder. Folders named
+    after the address by older versions are renamed to their listing ID on the way."""
+    output_path = Path(OUTPUT_PATH)
+    if not output_path.is_dir():
+        return set()
+    scraped_ids: set = set()
+    with os.scandir(output_path) as it:
+        entries: list = list(it)
+    for entry in entries:
+        if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, "data.json")):
+            continue
+        if LISTING_ID_PATTERN.fullmatch(entry.name):
+            scraped_ids.add(entry.name)
+        else:
+            scraped_ids.add(_migrate_legacy_folder(entry.path))
+    return scraped_ids
+
+
+def _record_error(bolig_url: str, error: Exception) -> None:
+    error_string: str = str(error)
+    print(f"Error extracting data from {bolig_url}: {error_string}")
+    # Count the times the same error has occured, if it does not exist, create it
+    with error_count_lock:
+        error_count[error_string] = error_count.get(error_string, 0) + 1
+
+
+def _fetch_page(page: int) -> Iterator:
+    """Page fetch stage: yields the listing tiles of a page."""
+    print(f"Scraping page {page}")
+    soup: BeautifulSoup = _get_soup(_build_sale_url(page))
+    yield from soup.find_all("li", class_=LISTING_CLASS)
+
+
+def _check_bolig(bolig: BeautifulSoup) -> Optional[tuple]:
+    """Checks if the bolig of a tile is wanted, returning its url, type and listing id if so."""
     div_tile = bolig.find("div", class_="tile")
     if not div_tile:
-        return
+        return None
 
-    # Check if appropriate bolig type
+    # The search query filters are only a hint, these checks decide which boliger are wanted
     bolig_type = _extract_bolig_type(bolig)
-    if bolig_type not in BOLIG_TYPES:
-        return
-    if BOLIG_TYPES[bolig_type] is False:
-        return
+    wanted: bool = bolig_type in ENABLED_BOLIG_TYPES
+    outside_query: bool = bool(QUERY_TYPES) and not wanted
+    if wanted:
+        try:
+            postal_code: int = _extract_postal_code_page_wise(bolig)
+        except ValueError as ve:
+            print(ve)
+            return None
+        wanted = _is_wanted_postal_code(postal_code)
+        outside_query = QUERY_POSTAL_RANGE is not None and not (
+            QUERY_POSTAL_RANGE[0] <= postal_code <= QUERY_POSTAL_RANGE[1]
+        )
+    with error_count_lock:
+        filter_count["tiles"] += 1
+        filter_count["outside_query"] += outside_query
+    if not wanted:
+        return None
 
-    # Check if appropriate postal code
-    try:
-        postal_code: int = _extract_postal_code_page_wise(bolig)
-    except ValueError as ve:
-        print(ve)
+    a_tag = bolig.find("a", class_="tile__image-container")
+    bolig_url = URL + a_tag["href"]
+    listing_id: str = _extract_listing_id(a_tag["href"], div_tile)
+    return bolig_url, bolig_type, listing_id
+
+
+def _filter_bolig(bolig: BeautifulSoup) -> Iterator:
+    """Tile filter stage: yields the bolig if it is wanted and not already scraped."""
+    checked_bolig: Optional[tuple] = _check_bolig(bolig)
+    if checked_bolig is None:
         return
+    if _should_scrape(checked_bolig[2]):
+        yield checked_bolig
 
-    in_range: bool = False
-    in_individual: bool = False
-    for postal_range in POSTAL_CODE_FILTERS["ranges"]:
-        if postal_range[0] <= postal_code <= postal_range[1]:
-            in_range = True
-    if postal_code in POSTAL_CODE_FILTERS["individual"]:
-        in_individual = True
-    if not (in_range or in_individual):
+
+def _should_scrape(listing_id: str) -> bool:
+    if OVERRIDE_PREVIOUS_DATA or listing_id not in SCRAPED_IDS:
+        return True
+    print(f"Skipping existing data for: {listing_id}")
+    return False
+
+
+def _check_listing_url(bolig_url: str) -> Optional[tuple]:
+    """
+    Checks if the bolig of a listing url is wanted, returning its url, type and listing id if so.
+    The type and postal code are read from the url, e.g.
+    /ejerlejlighed/2840/kongevejen/104242/297423.
+    """
+    parts: list = [part for part in urlparse(bolig_url).path.split("/") if part]
+    if len(parts) < 5 or not parts[1].isdigit():
+        return None
+    bolig_type: str = unquote(parts[0]).lower()
+    if bolig_type not in ENABLED_BOLIG_TYPES or not _is_wanted_postal_code(int(parts[1])):
+        return None
+    listing_id: Optional[str] = _listing_id_from_url(bolig_url)
+    if listing_id is None:
+        return None
+    return bolig_url, bolig_type, listing_id
+
+
+def _sitemap_boliger() -> Iterator:
+    """Yields the wanted boliger of the sitemap that are not scraped yet."""
+    listing_urls: Iterator = iter_sitemap_urls(
+        SITEMAP["url"], SESSION, HEADERS, tuple(SITEMAP["include"])
+    )
+    for bolig_url in listing_urls:
+        checked_bolig: Optional[tuple] = _check_listing_url(bolig_url)
+        if checked_bolig is not None and _should_scrape(checked_bolig[2]):
+            yield checked_bolig
+
+
+def _extract_tile_data(bolig: BeautifulSoup, checked_bolig: tuple) -> Bolig:
+    """Extracts the fields shown on a listing tile: the address, postal code, type, size and,
+    where shown, the price."""
+    bolig_url, bolig_type, listing_id = checked_bolig
+    address: str = bolig.find("p", class_="tile__address").text.strip()
+    mix: str = bolig.find("p", class_="tile__mix").text
+    size_match = re.search(r"(\d+)\s*m²", mix)
+    price_tag = bolig.find("p", class_="tile__price")
+    price_digits: str = "" if price_tag is None else "".join(filter(str.isdigit, price_tag.text))
+    return Bolig(
+        listing_id=listing_id,
+        url=bolig_url,
+        address=" ".join(address.replace(",", " ").split()),
+        postal_code=_extract_postal_code_page_wise(bolig),
+        type=bolig_type,
+        price=price_digits or None,
+        size=size_match.group(1) if size_match else None,
+    )
+
+
+def _extract_tile(bolig: BeautifulSoup) -> Iterator:
+    """Tile stage of the fast mode: yields the data of the tile if the bolig is wanted."""
+    checked_bolig: Optional[tuple] = _check_bolig(bolig)
+    if checked_bolig is None:
         return
+    try:
+        yield _extract_tile_data(bolig, checked_bolig)
+    except (AttributeError, ValueError) as e:
+        _record_error(checked_bolig[0], e)
 
-    a_tag = bolig.find("a", class_="tile__image-container")
-    bolig_url = URL + a_tag["href"]
+
+def _newest_boliger(known_streak: int) -> Iterator:
+    """
+    Yields the wanted boliger that are not known yet, newest first, one listing page at a time.
+    Known boliger are those already scraped, and those handed out by an earlier run even if
+    they could not be scraped. Stops once `known_streak` wanted boliger in a row are known, as
+    everything after them is older.
+    """
+    streak: int = 0
+    for page in range(1, MAX_PAGES + 1):
+        print(f"Scraping page {page} (newest first)")
+        soup: BeautifulSoup = _get_soup(_build_sale_url(page, newest_first=True))
+        for bolig in soup.find_all("li", class_=LISTING_CLASS):
+            checked_bolig: Optional[tuple] = _check_bolig(bolig)
+            if checked_bolig is None:
+                continue
+            listing_id: str = checked_bolig[2]
+            if listing_id in SCRAPED_IDS or listing_id in SEEN_IDS:
+                streak += 1
+                if streak >= known_streak:
+                    print(f"Found {streak} known boliger in a row, stopping at page {page}")
+                    return
+                continue
+            streak = 0
+            _mark_seen(listing_id)
+            yield checked_bolig
+
+
+def _fetch_bolig(item: tuple) -> Iterator:
+    """Detail fetch/parse stage: follows redirects and extracts the data of the bolig."""
+    bolig_url, bolig_type, listing_id = item
+    bolig_folder = Path(OUTPUT_PATH).joinpath(listing_id)
 
     # Check if redirecting to another page
     bolig_url, bolig_site = _check_redirect(bolig_url)
     if bolig_site == "unsupported":
         return
 
-    address_paragraph_raw = div_tile.find("p", class_="tile__address")
-    address_paragraph: str = address_paragraph_raw.text.replace(",", "")
-    address_paragraph = address_paragraph.replace("\n", "")
-    address_paragraph = address_paragraph.replace(" ", "_")
+    try:
+        bolig, images = _extract_bolig_data(bolig_url, bolig_type, bolig_site, listing_id)
+    except Exception as e:
+        _record_error(bolig_url, e)
+        return
+    yield bolig_folder, bolig, images
 
-    bolig_folder = Path(OUTPUT_PATH).joinpath(address_paragraph)
 
-    if OVERRIDE_PREVIOUS_DATA or not (bolig_folder / "data.json").exists():
-        try:
-            bolig_data, images = _extract_bolig_data(bolig_url, bolig_type, bolig_site)
-            _create_bolig_folder(bolig_folder)
-            _save_data_and_images(bolig_folder, bolig_data, images)
-            print(f"{address_paragraph} extracted")
-        except Exception as e:
-            error_string: str = str(e)
-            print(f"Error extracting data from {bolig_url}: {error_string}")
-            # Count the times the same error has occured, if it does not exist, create it
-            if error_string not in error_count:
-                error_count[error_string] = 1
-            else:
-                error_count[error_string] += 1
+def _enrich_bolig(item: tuple) -> Iterator:
+    """Enrich stage: adds the average square meter price."""
+    bolig_folder, bolig, images = item
+    try:
+        bolig = _enrich_bolig_data(bolig)
+    except Exception as e:
+        _record_error(bolig.url, e)
+        return
+    yield bolig_folder, bolig, images
+
+
+def _complete_bolig(bolig_folder: Optional[Path], bolig: Bolig, coordinates_: tuple) -> None:
+    """Adds the coordinates once they are ready, and writes the bolig to the NDJSON output."""
+    if bolig_folder is None:
+        bolig.set_coordinates(coordinates_)
     else:
-        print(f"Skipping existing data in folder: {bolig_folder}")
+        _save_coordinates(bolig_folder, bolig, coordinates_)
+    if NDJSON is not None:
+        NDJSON.write(bolig.to_json(indent=None))
+
+
+def _write_bolig(item: tuple) -> Iterator:
+    """Write stage: saves the data and images and yields the listing id of the bolig."""
+    bolig_folder, bolig, images = item
+    # Streaming without images needs no folder at all
+    if NDJSON is not None and not INCLUDE_IMAGES:
+        bolig_folder = None
+    try:
+        if bolig_folder is not None:
+            _create_bolig_folder(bolig_folder)
+            _save_data_and_images(bolig_folder, bolig, images)
+    except Exception as e:
+        _record_error(bolig.url, e)
+        return
+    SCRAPED_IDS.add(bolig.listing_id)
+    # The coordinates are saved when they are ready, without holding up the pipeline
+    GEOCODER.submit(
+        bolig.address,
+        lambda coordinates_: _complete_bolig(bolig_folder, bolig, coordinates_),
+    )
+    changes: dict = HISTORY.record(bolig, RUN_TIMESTAMP)
+    if "price" in changes and len(HISTORY.price_trajectory(bolig.listing_id)) > 1:
+        print(f"Price change for {bolig.listing_id}: {changes['price']}")
+    yield bolig.listing_id
+
+
+def _build_stages() -> list:
+    queue_size: int = PIPELINE["queue_size"]
+    return [
+        Stage("page", _fetch_page, PIPELINE["page_workers"], queue_size),
+        Stage("filter", _filter_bolig, PIPELINE["filter_workers"], queue_size),
+        Stage("detail", _fetch_bolig, PIPELINE["detail_workers"], queue_size),
+        Stage("enrich", _enrich_bolig, PIPELINE["enrich_workers"], queue_size),
+        Stage("write", _write_bolig, PIPELINE["write_workers"], queue_size),
+    ]
+
+
+def _load_seen_ids() -> set:
+    if not os.path.exists(SEEN_PATH):
+        return set()
+    with open(SEEN_PATH, "r", encoding="utf-8") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def _mark_seen(listing_id: str) -> None:
+    if listing_id in SEEN_IDS:
+        return
+    SEEN_IDS.add(listing_id)
+    with open(SEEN_PATH, "a", encoding="utf-8") as file:
+        file.write(f"{listing_id}\n")
+
+
+def _start_run() -> None:
+    global RUN_TIMESTAMP, HISTORY  # pylint: disable=global-statement
+    if HISTORY is None:
+        # The first run loads the state, and later runs (e.g. the polls of watch) keep it up to
+        # date in place instead of reading the output folder again
+        HISTORY = HistoryStore(HISTORY_PATH)
+        SCRAPED_IDS.update(_load_scraped_ids())
+        SEEN_IDS.update(_load_seen_ids())
+    RUN_TIMESTAMP = run_timestamp()
+    print(f"Found {len(SCRAPED_IDS)} already scraped boliger")
+    with error_count_lock:
+        filter_count.update(tiles=0, outside_query=0)
+
+
+def _check_search_filter() -> None:
+    """Warns if most tiles are of types or postal codes the search query should have left out,
+    which means the search query filters of config.json are not understood by the site. Tiles
+    inside the queried postal code range that the exact filters reject do not count."""
+    with error_count_lock:
+        tiles, outside_query = filter_count["tiles"], filter_count["outside_query"]
+    if SEARCH_QUERY_STRING and tiles >= 20 and outside_query / tiles > 0.5:
+        print(
+            f"Warning: {outside_query} of {tiles} listings did not match the search query, the "
+            "site seems to ignore the search_query parameters in config.json"
+        )
+
+
+def _stop_event() -> Optional[threading.Event]:
+    # Nothing scraped can be written once the reader of the NDJSON output has gone away
+    return None if NDJSON is None else NDJSON.broken
+
+
+def _finish_run(stage_results: Iterator) -> int:
+    # Results stream out of the pipeline as soon as they have been written
+    extracted: int = 0
+    try:
+        for listing_id in stage_results:
+            extracted += 1
+            print(f"{listing_id} extracted")
+    finally:
+        # Also when the listings could not be read, so the scraped boliger are complete
+        _check_search_filter()
+        BROWSER_POOL.close()
+        print("Waiting for the geocoder to finish...")
+        GEOCODER.wait()
+        HISTORY.close()
+        print(HTTP.summary())
+    return extracted
 
 
 def scrape() -> None:
     """Start scraping housing data from nybolig.dk"""
-    try:
-        _validate_config()
-    except ValueError as ve:
-        raise ve
+    _start_run()
 
     total_pages: int = _get_pages(PAGES)
+    print(
+        f"Planned requests: {total_pages} listing pages and up to "
+        f"{total_pages * LISTINGS_PER_PAGE} detail pages"
+    )
+
+    pages = range(1, total_pages + 1)
+    extracted: int = _finish_run(
+        run_pipeline(pages, _build_stages(), PIPELINE["queue_size"], _stop_event())
+    )
+
+    print(f"Finished scraping {total_pages} pages, extracted {extracted} boliger")
+    print(error_count)  # NOTE: For debugging purposes
 
-    with ThreadPoolExecutor() as executor:
-        futures: list = []
 
-        for page in range(1, total_pages + 1):
-            # for page in range(600, 650):
-            print(f"Scraping page {page} of {total_pages}")
-            sale_url: str = f"{URL}/til-salg?page={page}"
-            soup: BeautifulSoup = _get_soup(sale_url)
-            for bolig in soup.find_all("li", class_=LISTING_CLASS):
-                futures.append(executor.submit(_process_bolig, bolig))
+def scrape_new() -> int:
+    """
+    Scrape only the boliger listed since the last run. The listing pages are walked newest
+    first, and the walk stops at the first run of already scraped boliger.
 
-        # Wait for all threads to finish
-        for future in futures:
-            future.result()
+    Returns:
+        int: The number of new boliger.
+    """
+    _start_run()
+
+    # The listing pages are read one by one, as the stop depends on the order of the boliger,
+    # so the pipeline starts from the detail stage
+    extracted: int = _finish_run(
+        run_pipeline(
+            _newest_boliger(DELTA["known_streak"]),
+            _build_stages()[2:],
+            PIPELINE["queue_size"],
+            _stop_event(),
+        )
+    )
 
-    print(f"Finished scraping {total_pages} pages")
+    print(f"Finished scraping new boliger, extracted {extracted} boliger")
     print(error_count)  # NOTE: For debugging purposes
+    return extracted
+
+
+def scrape_sitemap() -> int:
+    """
+    Scrape the boliger listed in the sitemap of the site, instead of reading the listing pages.
+    Boliger redirected to other sites are not in the sitemap.
+
+    Returns:
+        int: The number of boliger scraped.
+    """
+    _start_run()
+
+    # The sitemap is streamed straight into the detail stage
+    extracted: int = _finish_run(
+        run_pipeline(
+            _sitemap_boliger(), _build_stages()[2:], PIPELINE["queue_size"], _stop_event()
+        )
+    )
+
+    print(f"Finished scraping the sitemap, extracted {extracted} boliger")
+    print(error_count)  # NOTE: For debugging purposes
+    return extracted
+
+
+def scrape_tiles() -> int:
+    """
+    Scrape only what the listing tiles show (type, address, postal code, size and price), without
+    opening any detail pages. The records are written to TILES_PATH, one JSON line per bolig,
+    and price changes are added to the history. While the NDJSON output is on, the lines are
+    also written to it. Use upgrade() to scrape selected boliger fully.
+
+    Returns:
+        int: The number of boliger written.
+    """
+    _start_run()
+
+    total_pages: int = _get_pages(PAGES)
+    print(f"Planned requests: {total_pages} listing pages")
+    queue_size: int = PIPELINE["queue_size"]
+    stages: list = [
+        Stage("page", _fetch_page, PIPELINE["page_workers"], queue_size),
+        Stage("tile", _extract_tile, PIPELINE["filter_workers"], queue_size),
+    ]
+    temp_path: str = f"{TILES_PATH}.tmp"
+    written: int = 0
+    # A single writer, so the lines are never interleaved
+    with open(temp_path, "w", encoding="utf-8") as file:
+        pages = range(1, total_pages + 1)
+        for bolig in run_pipeline(pages, stages, queue_size, _stop_event()):
+            line: str = bolig.to_json(indent=None)
+            file.write(line + "\n")
+            if NDJSON is not None:
+                NDJSON.write(line)
+            written += 1
+            # Only the price is the same on the tiles as on the detail pages, and a tile without
+            # a price says nothing about it
+            if bolig.price is None:
+                continue
+            changes: dict = HISTORY.record(bolig, RUN_TIMESTAMP, ("price",))
+            if "price" in changes and len(HISTORY.price_trajectory(bolig.listing_id)) > 1:
+                print(f"Price change for {bolig.listing_id}: {changes['price']}")
+    os.replace(temp_path, TILES_PATH)
+    HISTORY.close()
+
+    print(f"Finished scraping {total_pages} pages, wrote {written} boliger to {TILES_PATH}")
+    print(error_count)  # NOTE: For debugging purposes
+    return written
+
+
+def upgrade(listing_ids: Optional[list] = None) -> int:
+    """
+    Scrape boliger from the last fast mode run fully, from their detail pages.
+
+    Args:
+        listing_ids (list): The boliger to scrape. Defaults to those not scraped fully yet.
+
+    Returns:
+        int: The number of boliger scraped.
+    """
+    _start_run()
+    wanted: Optional[set] = None if listing_ids is None else set(listing_ids)
+
+    def _tile_boliger() -> Iterator:
+        with open(TILES_PATH, "r", encoding="utf-8") as file:
+            for line in file:
+                bolig: Bolig = Bolig.from_json(line)
+                if wanted is None and bolig.listing_id in SCRAPED_IDS:
+                    continue
+                if wanted is not None and bolig.listing_id not in wanted:
+                    continue
+                yield bolig.url, bolig.type, bolig.listing_id
+
+    extracted: int = _finish_run(
+        run_pipeline(
+            _tile_boliger(), _build_stages()[2:], PIPELINE["queue_size"], _stop_event()
+        )
+    )
+
+    print(f"Finished upgrading, extracted {extracted} boliger")
+    print(error_count)  # NOTE: For debugging purposes
+    return extracted
+
+
+def _sample_pages(total_pages: int, sample_pages: int) -> list:
+    """Up to sample_pages page numbers spread evenly from the first to the last page."""
+    if sample_pages <= 1 or total_pages <= 1:
+        return [1]
+    step: float = (total_pages - 1) / (sample_pages - 1)
+    return sorted({round(1 + i * step) for i in range(sample_pages)})
+
+
+def _mean(values: list) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def plan(sample_pages: int = 3, sample_details: int = 5) -> dict:
+    """
+    Estimate the cost of a full scrape with the current config, without writing anything. A few
+    listing pages are sampled to measure how many boliger pass the filters, and a few of those
+    are fetched like in a real scrape to measure the redirect mix, sizes and times. The totals
+    are projected from those samples.
+
+    Args:
+        sample_pages (int): The number of listing pages to sample, spread over all pages.
+        sample_details (int): The number of wanted boliger to fetch.
+
+    Returns:
+        dict: The projected requests, megabytes, wall time in minutes and disk use in megabytes,
+            and the samples they are based on.
+    """
+    _start_run()
+    total_pages: int = _get_pages(PAGES)
+
+    # Every request through the session is recorded as (bytes, seconds)
+    responses: list = []
+
+    def _record_response(response: requests.Response, *args, **kwargs) -> None:
+        if kwargs.get("stream"):
+            # Reading the content here would download all of a streamed page. Its size is what
+            # has been read when the response is closed.
+            responses.append((response.raw, response.elapsed.total_seconds()))
+        else:
+            responses.append((len(response.content), response.elapsed.total_seconds()))
+
+    def _measured(entries: list) -> list:
+        return [
+            (size if isinstance(size, int) else size.tell(), seconds) for size, seconds in entries
+        ]
+
+    SESSION.hooks["response"].append(_record_response)
+    try:
+        tiles: int = 0
+        wanted: list = []
+        for page in _sample_pages(total_pages, sample_pages):
+            for bolig in _get_soup(_build_sale_url(page)).find_all("li", class_=LISTING_CLASS):
+                tiles += 1
+                checked_bolig: Optional[tuple] = _check_bolig(bolig)
+                if checked_bolig is not None:
+                    wanted.append(checked_bolig)
+        page_responses: list = _measured(responses)
+        responses.clear()
+
+        sites: dict = {}
+        redirect_times: list = []
+        detail_times: list = []
+        detail_bytes: list = []
+        image_times: list = []
+        image_bytes: list = []
+        images_per_bolig: list = []
+        data_sizes: list = []
+        geocode_times: list = []
+        step: int = max(1, len(wanted) // max(1, sample_details))
+        for bolig_url, bolig_type, listing_id in wanted[::step][:sample_details]:
+            start_time: float = time.perf_counter()
+            bolig_url, bolig_site = _check_redirect(bolig_url)
+            if bolig_site != "nybolig":
+                redirect_times.append(time.perf_counter() - start_time)
+            sites[bolig_site] = sites.get(bolig_site, 0) + 1
+            if bolig_site == "unsupported":
+                continue
+
+            responses.clear()
+            start_time = time.perf_counter()
+            try:
+                bolig, image_urls = _extract_bolig_data(
+                    bolig_url, bolig_type, bolig_site, listing_id
+                )
+            except Exception as e:
+                _record_error(bolig_url, e)
+                continue
+            detail_times.append(time.perf_counter() - start_time)
+            detail_bytes.append(sum(size for size, _ in _measured(responses)))
+            data_sizes.append(len(bolig.to_json().encode("utf-8")))
+            images_per_bolig.append(len(image_urls))
+
+            # The floorplan and at most two images are downloaded, the rest are assumed similar
+            for image_url in image_urls[:3]:
+                responses.clear()
+                SESSION.get(image_url)
+                image_bytes.extend(size for size, _ in responses)
+                image_times.extend(seconds for _, seconds in responses)
+
+            start_time = time.perf_counter()
+            coordinates.get_coordinates(bolig.address)
+            geocode_times.append(time.perf_counter() - start_time)
+    finally:
+        SESSION.hooks["response"].remove(_record_response)
+
+    # Project the samples onto all pages
+    acceptance: float = len(wanted) / tiles if tiles else 0.0
+    new_share: float = 1.0
+    if wanted and not OVERRIDE_PREVIOUS_DATA:
+        new_share = sum(1 for item in wanted if item[2] not in SCRAPED_IDS) / len(wanted)
+    sampled: int = sum(sites.values())
+    supported_share: float = 1 - sites.get("unsupported", 0) / sampled if sampled else 1.0
+    redirect_share: float = len(redirect_times) / sampled if sampled else 0.0
+    boliger: float = total_pages * LISTINGS_PER_PAGE * acceptance * new_share
+    scraped: float = boliger * supported_share
+    images: float = _mean(images_per_bolig)
+    page_bytes: float = _mean([size for size, _ in page_responses])
+    page_time: float = _mean([seconds for _, seconds in page_responses])
+
+    # A detail page, the images (including the floorplan) and a geocode for each scraped bolig
+    requests_total: float = total_pages + boliger * redirect_share + scraped * (images + 2)
+    megabytes: float = (
+        total_pages * page_bytes + scraped * (_mean(detail_bytes) + images * _mean(image_bytes))
+    ) / 1024 / 1024
+    # The stages run at the same time, so the slowest stage sets the pace
+    stage_minutes: dict = {
+        "page": total_pages * page_time / PIPELINE["page_workers"] / 60,
+        "detail": (
+            boliger * redirect_share * _mean(redirect_times) + scraped * _mean(detail_times)
+        ) / PIPELINE["detail_workers"] / 60,
+        "write": scraped * images * _mean(image_times) / PIPELINE["write_workers"] / 60,
+        "geocode": scraped * _mean(geocode_times) / PIPELINE["geocode_workers"] / 60,
+    }
+    disk_megabytes: float = (
+        scraped * (_mean(data_sizes) + images * _mean(image_bytes)) / 1024 / 1024
+    )
+
+    estimate: dict = {
+        "pages": total_pages,
+        "sampled_pages": len(page_responses),
+        "sampled_tiles": tiles,
+        "acceptance_rate": acceptance,
+        "site_mix": {site: count / sampled for site, count in sites.items()} if sampled else {},
+        "boliger": round(scraped),
+        "requests": round(requests_total),
+        "megabytes": megabytes,
+        "stage_minutes": stage_minutes,
+        "minutes": max(stage_minutes.values()),
+        "disk_megabytes": disk_megabytes,
+    }
+    print(f"Pages: {total_pages} ({len(page_responses)} sampled, {tiles} tiles)")
+    print(f"Acceptance rate: {acceptance:.1%}, of which new: {new_share:.1%}")
+    print(
+        "Site mix: "
+        + ", ".join(f"{site} {share:.0%}" for site, share in estimate["site_mix"].items())
+    )
+    print(f"Boliger: {estimate['boliger']}, requests: {estimate['requests']}")
+    print(f"Download: {megabytes:.1f} MB, disk: {disk_megabytes:.1f} MB")
+    print(
+        f"Wall time: {estimate['minutes']:.1f} minutes ("
+        + ", ".join(f"{stage} {minutes:.1f}" for stage, minutes in stage_minutes.items())
+        + ")"
+    )
+    BROWSER_POOL.close()
+    return estimate
+
+
+@contextlib.contextmanager
+def ndjson_output(stream: Optional[TextIO] = None) -> Iterator:
+    """
+    While in this context, each scraped bolig is written to stream (stdout by default) as a JSON
+    line as soon as its coordinates are ready. Everything else printed goes to stderr, so the
+    output can be piped straight into other tools. Without images, no folders are written.
+    """
+    global NDJSON  # pylint: disable=global-statement
+    stream = stream or sys.stdout
+    NDJSON = NdjsonWriter(stream)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            yield
+    finally:
+        NDJSON.close()
+        print(f"Wrote {NDJSON.lines} boliger as NDJSON", file=sys.stderr)
+        NDJSON = None
+
+
+def watch(poll_interval: Optional[float] = None) -> None:
+    """Keep scraping new boliger, waiting poll_interval seconds between runs."""
+    if poll_interval is None:
+        poll_interval = DELTA["poll_interval"]
+    while True:
+        try:
+            scrape_new()
+        except Exception as e:  # pylint: disable=broad-except
+            # E.g. a listing page that could not be fetched. The next poll tries again.
+            print(f"Could not scrape new boliger: {e}")
+        if NDJSON is not None and NDJSON.broken.is_set():
+            print("Stopped watching, as the NDJSON output was closed")
+            return
+        print(f"Waiting {poll_interval} seconds for new boliger...")
+        time.sleep(poll_interval)
 
 
 def _check_redirect(bolig_url: str) -> tuple:
     supported_sites = [  # Number of listings (02/03/2024)
         "danbolig",  # 918
-        # "home",             # 1140 # NOTE: facts does not show up without JS, so hard to extract
+        "home",  # 1140 # NOTE: rendered in BROWSER_POOL, as the facts need JS
         "lokalbolig",  # 372
         # "eltoftnielsen",    # 72
         # "realmaeglerne",    # 325
@@ -309,11 +1157,11 @@ def _check_redirect(bolig_url: str) -> tuple:
     if "viderestillingekstern" in bolig_url or "estate.dk" in bolig_url:
         bolig_site = "unsupported"
         # Remove the 'https://www.nybolig.dkhttps//' part of the url
-        bolig_url = bolig_url.replace("https://www.nybolig.dk", "")
+        bolig_url = bolig_url.replace(URL, "", 1)
         # Follow the redirect
         new_session = requests.Session()
         try:
-            bolig_url_redirect = new_session.get(bolig_url, headers=HEADERS).url
+            bolig_url_redirect = HTTP.get(bolig_url, session=new_session, headers=HEADERS).url
         except UnicodeDecodeError:
             print(f"UnicodeDecodeError: {bolig_url}")
             return bolig_url, bolig_site
@@ -355,6 +1203,12 @@ def _extract_floorplan(soup: BeautifulSoup, bolig_site: str) -> str:
         )
     elif bolig_site == "lokalbolig":
         floor_plan_url = soup.find("img", class_="object-contain").get("src", "")
+    elif bolig_site == "home":
+        # The floorplan is the image described as a floorplan (plantegning)
+        for img in soup.find_all("img"):
+            description: str = f"{img.get('alt', '')} {img.get('src', '')}".lower()
+            if "plantegning" in description:
+                return img.get("src") or img.get("data-src", "")
     raise ValueError("No floor plan found.")
 
 
@@ -405,21 +1259,22 @@ def _extract_bolig_facts_box(
                     fact.contents[3].get("class")[1].split("-")[2]
                 )
     elif bolig_site == "home":
-        # Press the "Se flere fakta" button to reveal all facts using selenium
-        driver = webdriver.Chrome()
-        driver.get(bolig_url)
-
-        button = driver.find_element(
-            By.XPATH,
-            '//*[@id="__nuxt"]/div/div[3]/div[2]/div/div[2]/div[3]/div[2]/div/button',
-        )
-        driver.implicitly_wait(5)
-        button.click()
-
-        soup = BeautifulSoup(driver.page_source, HTML_PARSER)
-
-        for fact in soup.find_all("div", class_="property-details-facts-tab"):
-            print(fact.text)
+        # The page is rendered with all facts shown, see _render_soup. Each fact is a label
+        # followed by its value, e.g. "Boligareal" "112 m²".
+        for facts_tab in soup.find_all("div", class_=HOME_FACTS_CLASS):
+            strings: list = list(facts_tab.stripped_strings)
+            for label, value in zip(strings, strings[1:]):
+                for fact_label, field in HOME_FACT_LABELS:
+                    if not label.startswith(fact_label) or bolig_data[field] is not None:
+                        continue
+                    if field == "energy_label":
+                        bolig_data[field] = value.strip().lower()[:1] or None
+                    elif field == "rooms":
+                        # "3 (heraf 1 stue)" or "3"
+                        bolig_data[field] = int(value.split()[0])
+                    else:
+                        digits: str = value.split()[0].replace(".", "")
+                        bolig_data[field] = int(digits) if digits.isdigit() else None
     elif bolig_site == "danbolig":
         facts_table = soup.find(
             "div", class_="m-table o-propertyPresentationInNumbers__table"
@@ -627,6 +1482,26 @@ def _extract_postal_code_page_wise(bolig: BeautifulSoup) -> int:
     return postal_code
 
 
+def _listing_id_from_url(href: str) -> Optional[str]:
+    # The url ends with the case and listing numbers, which stay the same when the address is
+    # reformatted. Example: /ejerlejlighed/2840/kongevejen/104242/297423 -> 104242-297423
+    numbers: list = [part for part in urlparse(href).path.split("/") if part.isdigit()]
+    if len(numbers) >= 3:
+        return "-".join(numbers[-2:])
+    return None
+
+
+def _extract_listing_id(href: str, div_tile: BeautifulSoup) -> str:
+    listing_id: Optional[str] = _listing_id_from_url(href)
+    if listing_id is not None:
+        return listing_id
+
+    # Redirects to other sites have no listing numbers, so fall back to the address
+    address_paragraph: str = div_tile.find("p", class_="tile__address").text
+    address_paragraph = address_paragraph.replace(",", "").replace("\n", "")
+    return address_paragraph.replace(" ", "_")
+
+
 def _extract_bolig_type(bolig: BeautifulSoup) -> str:
     bolig_type_raw = bolig.find("p", class_="tile__mix").text.strip().lower()
     bolig_type = bolig_type_raw.split(" ")[0]
@@ -0,0 +1,129 @@
+"""Streams the page urls of a sitemap, following sitemap indexes and gzipped sitemaps. Each
+sitemap is parsed as it downloads and read to the end before its urls are yielded, so a slow
+consumer does not hold the connection open, and only the urls of one sitemap are held in
+memory."""
+
+import argparse
+import zlib
+from typing import Iterator, Optional
+from xml.etree import ElementTree
+import requests
+
+GZIP_MAGIC: bytes = b"\x1f\x8b"
+CHUNK_SIZE: int = 64 * 1024
+
+
+def _local_name(tag: str) -> str:
+    # Sitemap tags are namespaced, e.g. {http://www.sitemaps.org/schemas/sitemap/0.9}loc
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_locs(chunks: Iterator) -> Iterator:
+    """
+    Parses a sitemap or sitemap index incrementally, as its chunks arrive.
+
+    Yields:
+        tuple: ("sitemap" or "url", loc) for each entry.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    loc: Optional[str] = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if root is None:
+                root = element
+                continue
+            if event != "end":
+                continue
+            tag: str = _local_name(element.tag)
+            if tag == "loc":
+                loc = (element.text or "").strip()
+            elif tag in ("sitemap", "url"):
+                if loc:
+                    yield tag, loc
+                loc = None
+                # Drop the finished entries, so memory does not grow with the size of the sitemap
+                root.clear()
+    parser.close()
+
+
+def _decompressed(chunks: Iterator) -> Iterator:
+    """Decompresses the chunks of a gzipped sitemap, or passes them through if not gzipped."""
+    # Content-Encoding: gzip is undone by requests, but .xml.gz files are gzipped themselves
+    decompressor = None
+    for chunk in chunks:
+        if decompressor is None:
+            if not chunk.startswith(GZIP_MAGIC):
+                yield chunk
+                yield from chunks
+                return
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        yield decompressor.decompress(chunk)
+    if decompressor is not None:
+        yield decompressor.flush()
+        if not decompressor.eof:
+            raise EOFError("the gzip stream is incomplete")
+
+
+def _read_sitemap(session: requests.Session, url: str, headers: Optional[dict]) -> list:
+    """
+    Downloads and parses a whole sitemap. If it ends early, e.g. when the connection drops, that
+    is reported and the entries read before the end are returned.
+
+    Returns:
+        list: ("sitemap" or "url", loc) for each entry.
+    """
+    entries: list = []
+    with session.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        chunks: Iterator = response.iter_content(CHUNK_SIZE)
+        try:
+            for entry in _iter_locs(_decompressed(chunks)):
+                entries.append(entry)
+        except (
+            ElementTree.ParseError,
+            EOFError,
+            zlib.error,
+            requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ConnectionError,
+        ) as e:
+            print(f"Sitemap {url} ended early, after {len(entries)} entries: {e}")
+    return entries
+
+
+def iter_sitemap_urls(
+    sitemap_url: str,
+    session: Optional[requests.Session] = None,
+    headers: Optional[dict] = None,
+    include: tuple = (),
+) -> Iterator:
+    """
+    Yields the page urls of a sitemap. The sitemaps of a sitemap index are read one at a time,
+    each to the end before its urls are yielded.
+
+    Args:
+        sitemap_url (str): The url of a sitemap or sitemap index.
+        session (requests.Session): The session to fetch the sitemaps with.
+        headers (dict): Headers sent with every request.
+        include (tuple): If given, only sitemaps of an index whose url contains one of these
+            strings are read.
+    """
+    session = session or requests.Session()
+    pending: list = [sitemap_url]
+    while pending:
+        url: str = pending.pop(0)
+        for kind, loc in _read_sitemap(session, url, headers):
+            if kind == "url":
+                yield loc
+            elif not include or any(part in loc for part in include):
+                pending.append(loc)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the page urls of a sitemap.")
+    parser.add_argument("sitemap_url")
+    parser.add_argument("--include", nargs="*", default=[])
+    args = parser.parse_args()
+    for page_url in iter_sitemap_urls(args.sitemap_url, include=tuple(args.include)):
+        print(page_url)
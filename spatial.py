@@ -0,0 +1,179 @@
+"""A spatial index over the scraped boliger, and neighbourhood features computed from it."""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Coordinates are projected to meters around the latitude of Denmark, which is accurate to within
+# a few percent across the country and lets the index work with plain euclidean distances.
+REFERENCE_LATITUDE: float = 56.0
+METERS_PER_DEGREE_LAT: float = 110_574.0
+METERS_PER_DEGREE_LNG: float = 111_320.0 * np.cos(np.radians(REFERENCE_LATITUDE))
+
+FEATURES_PATH: str = "neighbourhood_features.csv"
+
+
+def project(lat, lng) -> np.ndarray:
+    """Projects latitudes and longitudes to (n, 2) coordinates in meters."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    return np.column_stack((lng * METERS_PER_DEGREE_LNG, lat * METERS_PER_DEGREE_LAT))
+
+
+class SpatialIndex:
+    """
+    A KD-tree over the coordinates of the boliger. New boliger are kept in a small buffer that is
+    searched directly, and the tree is only rebuilt once the buffer outgrows `rebuild_fraction`
+    of the tree, so adding the boliger of a crawl does not rebuild the tree for each of them.
+
+    Args:
+        rebuild_fraction (float): The size of the buffer, relative to the tree, that triggers
+            a rebuild.
+    """
+
+    def __init__(self, rebuild_fraction: float = 0.1) -> None:
+        self._rebuild_fraction: float = rebuild_fraction
+        self._tree = None
+        self._tree_ids: np.ndarray = np.empty(0, dtype=object)
+        self._buffer_points: list = []
+        self._buffer_ids: list = []
+
+    def __len__(self) -> int:
+        return len(self._tree_ids) + sum(len(points) for points in self._buffer_points)
+
+    def add(self, ids, lat, lng) -> None:
+        """Adds boliger to the index."""
+        self._buffer_points.append(project(lat, lng))
+        self._buffer_ids.append(np.asarray(ids, dtype=object))
+        buffered: int = sum(len(points) for points in self._buffer_points)
+        if buffered > self._rebuild_fraction * len(self._tree_ids):
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        """Merges the buffer into the tree."""
+        if not self._buffer_points:
+            return
+        points: list = self._buffer_points
+        if self._tree is not None:
+            points = [self._tree.data] + points
+        self._tree = cKDTree(np.concatenate(points))
+        self._tree_ids = np.concatenate([self._tree_ids] + self._buffer_ids)
+        self._buffer_points, self._buffer_ids = [], []
+
+    def _buffered(self) -> tuple:
+        if not self._buffer_points:
+            return np.empty((0, 2)), np.empty(0, dtype=object)
+        return np.concatenate(self._buffer_points), np.concatenate(self._buffer_ids)
+
+    def knn(self, lat: float, lng: float, k: int) -> tuple:
+        """
+        Finds the k nearest boliger of a point.
+
+        Returns:
+            tuple: The distances in meters and the ids of the boliger, nearest first.
+        """
+        point: np.ndarray = project(lat, lng)[0]
+        buffer_points, buffer_ids = self._buffered()
+        distances: np.ndarray = np.linalg.norm(buffer_points - point, axis=1)
+        ids: np.ndarray = buffer_ids
+        if self._tree is not None:
+            tree_distances, indices = self._tree.query(point, k=min(k, len(self._tree_ids)))
+            distances = np.concatenate((np.atleast_1d(tree_distances), distances))
+            ids = np.concatenate((self._tree_ids[np.atleast_1d(indices)], ids))
+        nearest: np.ndarray = np.argsort(distances, kind="stable")[:k]
+        return distances[nearest], ids[nearest]
+
+    def radius(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        """Finds the ids of the boliger within radius_m meters of a point."""
+        point: np.ndarray = project(lat, lng)[0]
+        buffer_points, buffer_ids = self._buffered()
+        ids: np.ndarray = buffer_ids[np.linalg.norm(buffer_points - point, axis=1) <= radius_m]
+        if self._tree is not None:
+            indices: list = self._tree.query_ball_point(point, radius_m)
+            ids = np.concatenate((self._tree_ids[indices], ids))
+        return ids
+
+
+def _comparable_knn_median(points: np.ndarray, values: np.ndarray, k: int) -> tuple:
+    """Finds the median value and mean distance of the k nearest neighbours of every point, not
+    counting the point itself, in a single batch query."""
+    n: int = len(points)
+    if n < 2:
+        return np.full(n, np.nan), np.full(n, np.nan)
+    k = min(k, n - 1)
+    tree = cKDTree(points)
+    distances, indices = tree.query(points, k=k + 1, workers=-1)
+
+    # Drop the point itself from its neighbours. Boliger in the same building share their
+    # coordinates, so it is not always the first neighbour, and if it is not found at all the
+    # farthest neighbour is dropped instead.
+    is_self: np.ndarray = indices == np.arange(n)[:, None]
+    is_self[~is_self.any(axis=1), -1] = True
+    indices = indices[~is_self].reshape(n, k)
+    distances = distances[~is_self].reshape(n, k)
+
+    return np.nanmedian(values[indices], axis=1), distances.mean(axis=1)
+
+
+def neighbourhood_features(
+    boliger: pd.DataFrame, k: int = 10, radius_m: float = 500.0
+) -> pd.DataFrame:
+    """
+    Computes neighbourhood features for every bolig in one batch.
+
+    Args:
+        boliger (pd.DataFrame): Boliger with "lat", "lng", "price", "size" and "type" columns.
+        k (int): The number of neighbours to use.
+        radius_m (float): The radius in meters to count neighbours within.
+
+    Returns:
+        pd.DataFrame: With the index of boliger and the columns:
+            knn_median_sqm_price: Median price per square meter of the k nearest boliger of
+                the same type.
+            knn_mean_distance: Mean distance in meters to those boliger.
+            radius_count: The number of boliger of any type within radius_m meters.
+    """
+    features = pd.DataFrame(
+        np.nan,
+        index=boliger.index,
+        columns=["knn_median_sqm_price", "knn_mean_distance", "radius_count"],
+    )
+    has_location: pd.Series = (
+        boliger["lat"].notna() & boliger["lng"].notna() & (boliger["lat"] != 0)
+    )
+    located: pd.DataFrame = boliger[has_location]
+    if located.empty:
+        return features
+
+    points: np.ndarray = project(located["lat"], located["lng"])
+    sizes: np.ndarray = located["size"].to_numpy(dtype=np.float64)
+    sqm_prices: np.ndarray = np.where(
+        sizes > 0, located["price"].to_numpy(dtype=np.float64) / sizes, np.nan
+    )
+
+    tree = cKDTree(points)
+    counts: np.ndarray = tree.query_ball_point(points, radius_m, workers=-1, return_length=True)
+    features.loc[located.index, "radius_count"] = counts - 1
+
+    # Only boliger of the same type are comparable
+    types: np.ndarray = located["type"].astype(str).to_numpy()
+    for bolig_type in np.unique(types):
+        mask: np.ndarray = types == bolig_type
+        medians, mean_distances = _comparable_knn_median(points[mask], sqm_prices[mask], k)
+        features.loc[located.index[mask], "knn_median_sqm_price"] = medians
+        features.loc[located.index[mask], "knn_mean_distance"] = mean_distances
+
+    return features
+
+
+if __name__ == "__main__":
+    from dataset import load_dataset
+
+    boliger_df: pd.DataFrame = load_dataset(
+        columns=["listing_id", "lat", "lng", "price", "size", "type"]
+    ).to_pandas()
+    print(f"Computing neighbourhood features for {len(boliger_df)} boliger...")
+    features_df = neighbourhood_features(boliger_df)
+    features_df.insert(0, "listing_id", boliger_df["listing_id"])
+    features_df.to_csv(FEATURES_PATH, index=False)
+    print(f"Features written to {FEATURES_PATH}")
@@ -0,0 +1,319 @@
+"""Market statistics per postal code, computed from the scraped boliger.
+
+The statistics are kept as partial aggregates (counts, sums and histograms) in dense arrays with
+one row per postal code. Aggregates of two sets of boliger are merged by adding them and split by
+subtracting them, so after a crawl only the new boliger are read and added to the stored
+aggregates, removed boliger are subtracted, and boliger whose data changed according to the price
+history are subtracted with their old values and added again with the new ones."""
+
+import argparse
+import os
+from typing import Optional
+import numpy as np
+import pandas as pd
+from history import HISTORY_PATH, read_changed_ids
+from record import ENERGY_LABELS, Bolig, load_bolig
+
+INPUT_FOLDER: str = "output"
+STATE_PATH: str = "market_stats_state.npz"
+STATS_PATH: str = "market_stats.csv"
+
+POSTAL_CODES: int = 10_000
+# Decades from the 1800s to the 2020s, with a bucket for older or unknown years at the end
+FIRST_DECADE: int = 1800
+DECADES: int = 23
+
+# The square meter prices are counted in logarithmic bins, which bounds the relative error of
+# the quantiles to half a bin (about 1.4%), however many boliger are added.
+SQM_PRICE_MIN: float = 1_000.0
+SQM_PRICE_MAX: float = 1_000_000.0
+SQM_PRICE_BINS: int = 256
+_LOG_BIN_WIDTH: float = np.log(SQM_PRICE_MAX / SQM_PRICE_MIN) / SQM_PRICE_BINS
+
+# The values of each bolig kept with the aggregates, so they can be subtracted again
+BOLIG_COLUMNS: list = ["postal_code", "price", "size", "rooms", "energy_label", "year_built"]
+# Boliger without a postal code are kept with this one, so they are not read again, but they are
+# not part of any statistics
+NO_POSTAL_CODE: int = -1
+
+SUM_FIELDS: tuple = (
+    "count",
+    "price_count",
+    "price_sum",
+    "sized_price_sum",
+    "size_sum",
+    "rooms_count",
+    "price_per_room_sum",
+)
+
+
+def empty_aggregates() -> dict:
+    """The aggregates of no boliger."""
+    aggregates: dict = {field: np.zeros(POSTAL_CODES) for field in SUM_FIELDS}
+    aggregates["sqm_price_hist"] = np.zeros((POSTAL_CODES, SQM_PRICE_BINS), dtype=np.int64)
+    aggregates["energy_label_hist"] = np.zeros(
+        (POSTAL_CODES, len(ENERGY_LABELS) + 1), dtype=np.int64
+    )
+    aggregates["decade_hist"] = np.zeros((POSTAL_CODES, DECADES + 1), dtype=np.int64)
+    return aggregates
+
+
+def _histogram(postal_codes: np.ndarray, bins: np.ndarray, n_bins: int) -> np.ndarray:
+    flat: np.ndarray = postal_codes * n_bins + bins
+    return np.bincount(flat, minlength=POSTAL_CODES * n_bins).reshape(POSTAL_CODES, n_bins)
+
+
+def aggregate(boliger: pd.DataFrame) -> dict:
+    """
+    Computes the aggregates of a set of boliger.
+
+    Args:
+        boliger (pd.DataFrame): With "postal_code", "price", "size", "rooms", "energy_label" and
+            "year_built" columns.
+    """
+    boliger = boliger[boliger["postal_code"].between(0, POSTAL_CODES - 1)]
+    postal_codes: np.ndarray = boliger["postal_code"].to_numpy(dtype=np.int64)
+    price: np.ndarray = pd.to_numeric(boliger["price"], errors="coerce").to_numpy(np.float64)
+    size: np.ndarray = pd.to_numeric(boliger["size"], errors="coerce").to_numpy(np.float64)
+    rooms: np.ndarray = pd.to_numeric(boliger["rooms"], errors="coerce").to_numpy(np.float64)
+
+    def _sum(values: np.ndarray) -> np.ndarray:
+        valid: np.ndarray = ~np.isnan(values)
+        return np.bincount(postal_codes[valid], values[valid], minlength=POSTAL_CODES)
+
+    def _count(mask: np.ndarray) -> np.ndarray:
+        return np.bincount(postal_codes[mask], minlength=POSTAL_CODES).astype(np.float64)
+
+    has_price: np.ndarray = ~np.isnan(price)
+    has_size: np.ndarray = has_price & (size > 0)
+    has_rooms: np.ndarray = has_price & (rooms > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        aggregates: dict = {
+            "count": _count(np.ones(len(postal_codes), dtype=bool)),
+            "price_count": _count(has_price),
+            "price_sum": _sum(price),
+            "sized_price_sum": _sum(np.where(has_size, price, np.nan)),
+            "size_sum": _sum(np.where(has_size, size, np.nan)),
+            "rooms_count": _count(has_rooms),
+            "price_per_room_sum": _sum(np.where(has_rooms, price / rooms, np.nan)),
+        }
+        sqm_price: np.ndarray = np.where(has_size, price / size, np.nan)
+    valid: np.ndarray = ~np.isnan(sqm_price)
+    bins: np.ndarray = np.clip(
+        (np.log(sqm_price[valid] / SQM_PRICE_MIN) / _LOG_BIN_WIDTH).astype(np.int64),
+        0,
+        SQM_PRICE_BINS - 1,
+    )
+    aggregates["sqm_price_hist"] = _histogram(postal_codes[valid], bins, SQM_PRICE_BINS)
+
+    labels: pd.Series = boliger["energy_label"].astype("string").str.lower().str[:1]
+    label_bins: np.ndarray = (
+        pd.Categorical(labels, categories=ENERGY_LABELS).codes.astype(np.int64)
+    )
+    label_bins[label_bins < 0] = len(ENERGY_LABELS)
+    aggregates["energy_label_hist"] = _histogram(
+        postal_codes, label_bins, len(ENERGY_LABELS) + 1
+    )
+
+    year_built: np.ndarray = pd.to_numeric(boliger["year_built"], errors="coerce").to_numpy()
+    decades: np.ndarray = (np.nan_to_num(year_built, nan=0) - FIRST_DECADE) // 10
+    decades = np.where((decades < 0) | (decades >= DECADES), DECADES, decades).astype(np.int64)
+    aggregates["decade_hist"] = _histogram(postal_codes, decades, DECADES + 1)
+    return aggregates
+
+
+def merge(first: dict, second: dict) -> dict:
+    """Merges the aggregates of two disjoint sets of boliger."""
+    return {key: first[key] + second[key] for key in first}
+
+
+def subtract(total: dict, part: dict) -> dict:
+    """Removes the aggregates of a set of boliger from those of a set that includes it."""
+    return {key: total[key] - part[key] for key in total}
+
+
+def _quantile(hist: np.ndarray, quantile: float) -> np.ndarray:
+    """Estimates a quantile of every row of a histogram of square meter prices."""
+    counts: np.ndarray = hist.sum(axis=1)
+    cumulative: np.ndarray = np.cumsum(hist, axis=1)
+    bins: np.ndarray = (cumulative < (quantile * counts)[:, None]).sum(axis=1)
+    # The geometric middle of the bin
+    values: np.ndarray = SQM_PRICE_MIN * np.exp((bins + 0.5) * _LOG_BIN_WIDTH)
+    return np.where(counts > 0, values, np.nan)
+
+
+def summarize(aggregates: dict) -> pd.DataFrame:
+    """Turns the aggregates into statistics, with a row for each postal code with boliger."""
+    rows: np.ndarray = np.flatnonzero(aggregates["count"])
+    count: np.ndarray = aggregates["count"][rows]
+    hist: np.ndarray = aggregates["sqm_price_hist"][rows]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = pd.DataFrame(
+            {
+                "count": count.astype(np.int64),
+                "mean_price": aggregates["price_sum"][rows] / aggregates["price_count"][rows],
+                "mean_sqm_price": aggregates["sized_price_sum"][rows]
+                / aggregates["size_sum"][rows],
+                "p25_sqm_price": _quantile(hist, 0.25),
+                "median_sqm_price": _quantile(hist, 0.5),
+                "p75_sqm_price": _quantile(hist, 0.75),
+                "mean_price_per_room": aggregates["price_per_room_sum"][rows]
+                / aggregates["rooms_count"][rows],
+            },
+            index=pd.Index(rows, name="postal_code"),
+        )
+    for i, label in enumerate(ENERGY_LABELS + ("unknown",)):
+        stats[f"energy_label_{label}"] = aggregates["energy_label_hist"][rows, i]
+    for i in range(DECADES):
+        stats[f"built_{FIRST_DECADE + 10 * i}s"] = aggregates["decade_hist"][rows, i]
+    stats["built_unknown"] = aggregates["decade_hist"][rows, DECADES]
+    return stats
+
+
+_BOLIG_DTYPES: dict = {
+    "postal_code": np.int64,
+    "price": np.float64,
+    "size": np.float64,
+    "rooms": np.float64,
+    "year_built": np.float64,
+}
+
+
+def _empty_boliger() -> pd.DataFrame:
+    boliger = pd.DataFrame(columns=BOLIG_COLUMNS, index=pd.Index([], name="folder", dtype=str))
+    return boliger.astype(_BOLIG_DTYPES)
+
+
+def load_state(state_path: str = STATE_PATH) -> tuple:
+    """
+    Loads the stored aggregates, the values of the boliger they include, indexed by folder, and
+    the position in the price history they are up to date with. A state without the values of
+    the boliger, as written by older versions, cannot be updated and is returned empty.
+    """
+    if not os.path.exists(state_path):
+        return empty_aggregates(), _empty_boliger(), 0
+    with np.load(state_path, allow_pickle=False) as state:
+        if "bolig_postal_code" not in state:
+            print(f"{state_path} is from an older version, recomputing the statistics.")
+            return empty_aggregates(), _empty_boliger(), 0
+        aggregates: dict = {key: state[key] for key in empty_aggregates()}
+        boliger = pd.DataFrame(
+            {column: state[f"bolig_{column}"] for column in BOLIG_COLUMNS},
+            index=pd.Index(state["ids"], name="folder"),
+        )
+        history_offset: int = int(state["history_offset"])
+    boliger["energy_label"] = boliger["energy_label"].replace("", None)
+    return aggregates, boliger, history_offset
+
+
+def save_state(
+    aggregates: dict, boliger: pd.DataFrame, history_offset: int, state_path: str = STATE_PATH
+) -> None:
+    """Stores the aggregates, the values of the boliger they include and the history position."""
+    temp_path: str = f"{state_path}.tmp.npz"
+    columns: dict = {
+        f"bolig_{column}": boliger[column].to_numpy(dtype=np.float64)
+        for column in BOLIG_COLUMNS
+        if _BOLIG_DTYPES.get(column) is np.float64
+    }
+    np.savez_compressed(
+        temp_path,
+        ids=boliger.index.to_numpy(dtype=str),
+        bolig_postal_code=boliger["postal_code"].to_numpy(dtype=np.int64),
+        bolig_energy_label=boliger["energy_label"].fillna("").to_numpy(dtype=str),
+        history_offset=np.int64(history_offset),
+        **columns,
+        **aggregates,
+    )
+    os.replace(temp_path, state_path)
+
+
+def list_folders(input_path: str) -> set:
+    """The names of the bolig folders. Their data.json files are not opened."""
+    with os.scandir(input_path) as it:
+        return {entry.name for entry in it if entry.is_dir()}
+
+
+def read_boliger(input_path: str, folders: set) -> pd.DataFrame:
+    """Reads the values of the boliger in the given folders, indexed by folder."""
+    records: list = []
+    for folder in sorted(folders):
+        try:
+            bolig: Bolig = load_bolig(os.path.join(input_path, folder, "data.json"))
+        except (OSError, ValueError):
+            continue
+        records.append(
+            (
+                folder,
+                NO_POSTAL_CODE if bolig.postal_code is None else bolig.postal_code,
+                bolig.price,
+                bolig.size,
+                bolig.rooms,
+                bolig.energy_label,
+                bolig.year_built,
+            )
+        )
+    boliger = pd.DataFrame.from_records(records, columns=["folder"] + BOLIG_COLUMNS)
+    return boliger.set_index("folder").astype(_BOLIG_DTYPES)
+
+
+def update_stats(
+    input_path: str = INPUT_FOLDER,
+    state_path: str = STATE_PATH,
+    stats_path: Optional[str] = STATS_PATH,
+    rebuild: bool = False,
+    history_path: str = HISTORY_PATH,
+) -> pd.DataFrame:
+    """
+    Brings the stored aggregates up to date with the bolig folders, and writes the statistics
+    per postal code. New folders are added, removed folders are subtracted, and folders of
+    boliger with changes in the price history since the last update are read again.
+
+    Args:
+        input_path (str): The folder with a folder for each bolig.
+        state_path (str): Where the aggregates are stored between updates.
+        stats_path (str): Where the statistics are written as csv. None to not write them.
+        rebuild (bool): Ignore the stored aggregates and read all boliger.
+        history_path (str): The price history written by the scraper.
+    """
+    aggregates, known, history_offset = (
+        (empty_aggregates(), _empty_boliger(), 0) if rebuild else load_state(state_path)
+    )
+    folders: set = list_folders(input_path)
+    changed, history_offset = read_changed_ids(history_path, history_offset)
+
+    known_folders: set = set(known.index)
+    added: set = folders - known_folders
+    removed: set = known_folders - folders
+    updated: set = known_folders & folders & changed
+    print(
+        f"Adding {len(added)} new boliger, updating {len(updated)} and removing {len(removed)} "
+        f"in the statistics of {len(known)} boliger."
+    )
+
+    # Removed and updated boliger are subtracted with the values they were added with
+    stale: list = sorted(removed | updated)
+    aggregates = subtract(aggregates, aggregate(known.loc[stale]))
+    read: pd.DataFrame = read_boliger(input_path, added | updated)
+    aggregates = merge(aggregates, aggregate(read))
+    known = pd.concat([known.drop(stale), read])
+    save_state(aggregates, known, history_offset, state_path)
+
+    stats: pd.DataFrame = summarize(aggregates)
+    if stats_path is not None:
+        stats.to_csv(stats_path)
+        print(f"Statistics for {len(stats)} postal codes written to {stats_path}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Market statistics per postal code.")
+    parser.add_argument("input_path", nargs="?", default=INPUT_FOLDER)
+    parser.add_argument("--state-path", default=STATE_PATH)
+    parser.add_argument("--stats-path", default=STATS_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute from all boliger.")
+    parser.add_argument("--history-path", default=HISTORY_PATH)
+    args = parser.parse_args()
+    update_stats(
+        args.input_path, args.state_path, args.stats_path, args.rebuild, args.history_path
+    )
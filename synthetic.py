@@ -0,0 +1,206 @@
+"""Generates synthetic bolig data in the format of the scraper output, for testing the tools on
+far more boliger than a real scrape gives.
+
+Postal codes, cities and square meter prices come from postal_avg_sqm_price.csv, so the data
+has realistic distributions. Each bolig is generated from the seed and its index alone, so the
+same seed gives the same data however many processes generate it."""
+
+import argparse
+import csv
+import io
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from PIL import Image
+from record import ENERGY_LABELS, Bolig
+
+POSTAL_AVG_SQM_PRICE_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "postal_avg_sqm_price.csv"
+)
+FLOORPLAN: str = "0.jpg"
+CHUNK_SIZE: int = 10_000
+
+STREETS: tuple = (
+    "Kongevejen",
+    "Nørrebrogade",
+    "Vesterbrogade",
+    "Amagerbrogade",
+    "Strandvejen",
+    "Algade",
+    "Østergade",
+    "Vestergade",
+    "Skolevej",
+    "Møllevej",
+    "Kirkevej",
+    "Bygaden",
+    "Parkvej",
+    "Engvej",
+    "Birkevej",
+    "Skovvej",
+    "Havnegade",
+    "Jernbanegade",
+    "Søndergade",
+    "Nørregade",
+)
+BOLIG_TYPES: tuple = ("ejerlejlighed", "villa", "rækkehus", "andelsbolig", "fritidsbolig")
+BOLIG_TYPE_WEIGHTS: tuple = (0.35, 0.35, 0.15, 0.1, 0.05)
+
+
+def load_postal_codes(path: str = POSTAL_AVG_SQM_PRICE_PATH) -> list:
+    """Reads (postal code, city, average square meter price) for each area in the price table."""
+    postal_codes: list = []
+    with open(path, "r", encoding="utf-8") as file:
+        reader = csv.reader(file, delimiter=";")
+        next(reader)
+        for row in reader:
+            if len(row) < 7:
+                continue
+            area: str = row[2]
+            code: str = area.split(" ", 1)[0].split("-")[0]
+            if not code.isdigit():
+                continue
+            prices: list = [int(value) for value in row[3:7] if value.isdigit() and value != "0"]
+            city: str = area.split(" ", 1)[1] if " " in area else "By"
+            postal_codes.append((int(code), city, sum(prices) / len(prices) if prices else None))
+    return postal_codes
+
+
+def _coordinates(postal_code: int, rng: random.Random) -> tuple:
+    # Places each postal code at a fixed spot inside the bounding box of Denmark, with the
+    # boliger spread around it
+    spot = random.Random(postal_code)
+    lat: float = 54.6 + spot.random() * 3.0 + rng.gauss(0, 0.02)
+    lng: float = 8.2 + spot.random() * 4.4 + rng.gauss(0, 0.03)
+    return lat, lng
+
+
+def _case_number(seed: int) -> int:
+    # Drawn from the seed, so datasets generated with different seeds do not share listing IDs
+    # and can be merged or compared
+    return random.Random(f"case-{seed}").randrange(100_000, 1_000_000)
+
+
+def generate_bolig(index: int, seed: int, postal_codes: list) -> Bolig:
+    """Generates the bolig with the given index. The listing ID is made of a case number drawn
+    from the seed and a listing number from the index."""
+    rng = random.Random(seed * 1_000_003 + index)
+    postal_code, city, sqm_price = rng.choice(postal_codes)
+    bolig_type: str = rng.choices(BOLIG_TYPES, BOLIG_TYPE_WEIGHTS)[0]
+    size: int = max(20, int(rng.lognormvariate(4.5, 0.4)))
+    price: int = round(size * (sqm_price or 20_000) * rng.lognormvariate(0, 0.2), -4)
+    year_built: int = rng.randint(1850, 2024)
+    case_number: int = _case_number(seed)
+    listing_number: int = 200_000 + index
+    street: str = rng.choice(STREETS)
+    lat, lng = _coordinates(postal_code, rng)
+    return Bolig(
+        listing_id=f"{case_number}-{listing_number}",
+        url=(
+            f"https://www.nybolig.dk/{bolig_type}/{postal_code}/{street.lower()}/"
+            f"{case_number}/{listing_number}"
+        ),
+        address=f"{street} {rng.randint(1, 200)} {postal_code} {city}",
+        lat=lat,
+        lng=lng,
+        postal_code=postal_code,
+        type=bolig_type,
+        price=price,
+        postal_avg_sqm_price=sqm_price,
+        size=size,
+        # Some fields are often missing in the real data
+        basement_size=rng.randint(10, 80) if rng.random() < 0.2 else None,
+        rooms=max(1, round(size / 25 + rng.gauss(0, 0.7))),
+        year_built=year_built,
+        year_rebuilt=rng.randint(year_built, 2024) if rng.random() < 0.25 else None,
+        energy_label=rng.choice(ENERGY_LABELS) if rng.random() < 0.9 else None,
+    )
+
+
+def placeholder_floorplan(size: int = 64) -> bytes:
+    """A small valid JPEG, so tools that decode floorplans can read it."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (255, 255, 255)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _write_chunk(args: tuple) -> int:
+    output_path, start, stop, seed, floorplan_path = args
+    postal_codes: list = load_postal_codes()
+    for index in range(start, stop):
+        bolig: Bolig = generate_bolig(index, seed, postal_codes)
+        folder: str = os.path.join(output_path, bolig.listing_id)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, "data.json"), "w", encoding="utf-8") as file:
+            file.write(bolig.to_json())
+        if floorplan_path is not None:
+            image_path: str = os.path.join(folder, FLOORPLAN)
+            if not os.path.exists(image_path):
+                # Hard links keep a million floorplans from taking a million times the space
+                try:
+                    os.link(floorplan_path, image_path)
+                except OSError:
+                    with open(floorplan_path, "rb") as src, open(image_path, "wb") as dst:
+                        dst.write(src.read())
+    return stop - start
+
+
+def generate(
+    output_path: str,
+    count: int,
+    seed: int = 42,
+    images: bool = True,
+    output_format: str = "tree",
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Generates synthetic boliger.
+
+    Args:
+        output_path (str): The folder to write a folder per bolig to, or the NDJSON file.
+        count (int): The number of boliger.
+        seed (int): The seed. The same seed and count give the same boliger.
+        images (bool): Write a placeholder floorplan for each bolig. Only for the tree format.
+        output_format (str): "tree" for a folder per bolig with data.json and 0.jpg, like the
+            scraper writes, or "ndjson" for a single file with one bolig per line.
+        workers (int): The number of processes writing folders. Defaults to the number of CPUs.
+    """
+    if output_format == "ndjson":
+        postal_codes: list = load_postal_codes()
+        with open(output_path, "w", encoding="utf-8") as file:
+            for index in range(count):
+                file.write(generate_bolig(index, seed, postal_codes).to_json(indent=None) + "\n")
+        print(f"Generated {count} boliger in {output_path}")
+        return
+
+    os.makedirs(output_path, exist_ok=True)
+    floorplan_path: Optional[str] = None
+    if images:
+        floorplan_path = os.path.join(output_path, ".placeholder.jpg")
+        with open(floorplan_path, "wb") as file:
+            file.write(placeholder_floorplan())
+    chunks: list = [
+        (output_path, start, min(start + CHUNK_SIZE, count), seed, floorplan_path)
+        for start in range(0, count, CHUNK_SIZE)
+    ]
+    generated: int = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for written in executor.map(_write_chunk, chunks):
+            generated += written
+            print(f"Generated {generated}/{count} boliger")
+    if floorplan_path is not None:
+        os.remove(floorplan_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic bolig data.")
+    parser.add_argument("output_path")
+    parser.add_argument("-n", "--count", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["tree", "ndjson"], default="tree")
+    parser.add_argument("--no-images", action="store_true")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    generate(
+        args.output_path, args.count, args.seed, not args.no_images, args.format, args.workers
+    )
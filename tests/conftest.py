@@ -0,0 +1,6 @@
+"""The modules live at the top level of the repository, so it is put on the import path."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,71 @@
+"""Tests for the browser session pool, with fake sessions."""
+
+import threading
+import time
+import pytest
+from browser_pool import BrowserPool
+
+
+class _FakeDriver:
+    started = 0
+
+    def __init__(self):
+        _FakeDriver.started += 1
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+@pytest.fixture(autouse=True)
+def fixture_reset_count():
+    _FakeDriver.started = 0
+
+
+def test_sessions_are_reused_and_recycled():
+    pool = BrowserPool(size=2, max_pages=3, factory=_FakeDriver)
+    drivers = []
+    for _ in range(4):
+        with pool.lease() as driver:
+            drivers.append(driver)
+    # One session serves three pages, then a new one is started
+    assert drivers[0] is drivers[1] is drivers[2]
+    assert drivers[0].quit_called
+    assert drivers[3] is not drivers[0]
+    pool.close()
+    assert drivers[3].quit_called
+
+
+def test_failed_sessions_are_not_reused():
+    pool = BrowserPool(size=1, max_pages=10, factory=_FakeDriver)
+    with pytest.raises(RuntimeError):
+        with pool.lease() as driver:
+            raise RuntimeError("page crashed")
+    assert driver.quit_called
+    with pool.lease() as second:
+        assert second is not driver
+
+
+def test_at_most_size_sessions_exist():
+    pool = BrowserPool(size=2, max_pages=100, factory=_FakeDriver)
+    lock = threading.Lock()
+    leased = [0]
+    most_leased = [0]
+
+    def _render():
+        with pool.lease():
+            with lock:
+                leased[0] += 1
+                most_leased[0] = max(most_leased[0], leased[0])
+            time.sleep(0.01)
+            with lock:
+                leased[0] -= 1
+
+    threads = [threading.Thread(target=_render) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert most_leased[0] == 2
+    assert _FakeDriver.started == 2
+    pool.close()
@@ -0,0 +1,69 @@
+"""Tests for the coalesced geocoding."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import coordinates
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture(name="requested")
+def fixture_requested(monkeypatch):
+    """Answers geoapi.dk queries locally and records them."""
+    requested = []
+    lock = threading.Lock()
+
+    def _get(url, timeout):  # pylint: disable=unused-argument
+        with lock:
+            requested.append(url)
+        time.sleep(0.05)
+        return _Response({"lat": 55.6, "lng": 12.5})
+
+    monkeypatch.setattr(coordinates, "GET", _get)
+    monkeypatch.setattr(coordinates, "_responses", coordinates.OrderedDict())
+    return requested
+
+
+def test_concurrent_queries_share_one_request(requested):
+    barrier = threading.Barrier(16)
+
+    def _query(_):
+        barrier.wait()
+        return coordinates._query("Nytorv 10", 1)  # pylint: disable=protected-access
+
+    with ThreadPoolExecutor(16) as executor:
+        results = list(executor.map(_query, range(16)))
+    assert len(requested) == 1
+    assert all(result == {"lat": 55.6, "lng": 12.5} for result in results)
+    assert not coordinates._in_flight  # pylint: disable=protected-access
+
+
+def test_the_response_cache_is_bounded(requested, monkeypatch):
+    monkeypatch.setattr(coordinates, "MAX_CACHED_RESPONSES", 2)
+    for address in ("A 1", "B 1", "A 1", "C 1", "A 1", "B 1"):
+        coordinates._query(address, 1)  # pylint: disable=protected-access
+    # A stays cached as it was used recently, B was evicted by C and is requested again
+    assert [url.rsplit("=", 1)[1] for url in requested] == ["A 1", "B 1", "C 1", "B 1"]
+    assert len(coordinates._responses) == 2  # pylint: disable=protected-access
+
+
+def test_geocoder_calls_back_with_the_coordinates(requested):
+    found = []
+    geocoder = coordinates.Geocoder(workers=2, max_pending=2)
+    for number in range(6):
+        geocoder.submit(f"Nytorv {number}", found.append)
+    geocoder.wait()
+    assert found == [(55.6, 12.5)] * 6
+    assert len(requested) == 6
+    geocoder.shutdown()
@@ -0,0 +1,50 @@
+"""Tests for the columnar dataset export."""
+
+import json
+import os
+from dataset import export_dataset, load_dataset
+
+
+def _write_bolig(output, name, postal_code, price):
+    os.makedirs(output / name)
+    bolig = {
+        "url": f"https://www.nybolig.dk/{name}",
+        "address": f"{name} 1",
+        "postal_code": postal_code,
+        "type": "Villa",
+        "price": price,
+        "size": 100,
+        "energy_label": "c",
+        "lat": 55.6,
+        "lng": 12.5,
+    }
+    with open(output / name / "data.json", "w", encoding="utf-8") as file:
+        json.dump(bolig, file)
+
+
+def test_load_filters_columns_and_postal_codes(tmp_path):
+    output = tmp_path / "output"
+    _write_bolig(output, "a", 2100, 2_000_000)
+    _write_bolig(output, "b", 8000, 3_000_000)
+    dataset_path = str(tmp_path / "dataset")
+    export_dataset(str(output), dataset_path)
+
+    table = load_dataset(dataset_path, columns=["price"], postal_codes=[8000])
+    assert table.column_names == ["price"]
+    assert table.column("price").to_pylist() == [3_000_000]
+    assert load_dataset(dataset_path).num_rows == 2
+
+
+def test_export_replaces_postal_codes_that_are_gone(tmp_path):
+    output = tmp_path / "output"
+    _write_bolig(output, "a", 2100, 2_000_000)
+    _write_bolig(output, "b", 8000, 3_000_000)
+    dataset_path = str(tmp_path / "dataset")
+    export_dataset(str(output), dataset_path, file_format="parquet")
+
+    os.remove(output / "b" / "data.json")
+    export_dataset(str(output), dataset_path, file_format="parquet")
+
+    table = load_dataset(dataset_path, file_format="parquet")
+    assert table.column("postal_code").to_pylist() == [2100]
+    assert sorted(os.listdir(tmp_path)) == ["dataset", "output"]
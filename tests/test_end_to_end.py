@@ -0,0 +1,46 @@
+"""Scrapes the mock server with the real scraper, in a separate process, and checks the output
+against the listings the mock server generated."""
+
+import json
+import pytest
+import mock_server
+from loadtest import run_configuration
+
+
+@pytest.mark.parametrize("discovery", ["pages", "sitemap"])
+def test_scraped_boliger_match_the_mock_listings(tmp_path, discovery):
+    config = mock_server.MockConfig(pages=2, latency=0, latency_jitter=0, redirect_rate=0)
+    result = run_configuration(config, {"detail_workers": 4}, tmp_path, discovery)
+    assert result["boliger"] > 0
+    assert result["injected_errors"] == 0
+    # The mock server honours the search query, so the warning about ignored filters stays away
+    assert "did not match the search query" not in (tmp_path / "scrape.log").read_text("utf-8")
+
+    data_paths = sorted((tmp_path / "output").glob("*/data.json"))
+    assert len(data_paths) == result["boliger"]
+    for data_path in data_paths:
+        data = json.loads(data_path.read_text(encoding="utf-8"))
+        index = int(data["listing_id"].split("-")[0]) - 100_000
+        listing = mock_server._listing(config, index)  # pylint: disable=protected-access
+        assert data_path.parent.name == data["listing_id"]
+        address = f'{listing["street"]} {listing["number"]} {listing["postal_code"]} By'
+        assert data["address"] == address
+        assert data["postal_code"] == listing["postal_code"]
+        assert data["price"] == listing["price"]
+        assert data["size"] == listing["size"]
+        assert data["rooms"] == sum(listing["rooms"])
+        assert data["year_built"] == listing["year_built"]
+        assert data["energy_label"] == listing["energy_label"]
+        assert data["lat"] is not None and data["lng"] is not None
+        assert (data_path.parent / "0.jpg").exists()
+
+
+def test_error_pages_are_not_parsed_as_listings(tmp_path):
+    config = mock_server.MockConfig(
+        pages=30, latency=0, latency_jitter=0, redirect_rate=0.3, error_rate=0.05
+    )
+    result = run_configuration(config, {"detail_workers": 4}, tmp_path)
+    assert result["injected_errors"] > 0
+    log = (tmp_path / "scrape.log").read_text("utf-8")
+    assert "Error extracting data from" in log
+    assert "object has no attribute" not in log
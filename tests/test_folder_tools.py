@@ -0,0 +1,86 @@
+"""Tests for the folder maintenance."""
+
+import json
+import os
+import threading
+import time
+import folder_tools
+from folder_tools import maintain
+
+
+def _write_json(path, data):
+    os.makedirs(path.parent, exist_ok=True)
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def _make_tree(output):
+    os.makedirs(output / "empty" / "nested")
+    _write_json(output / "with space" / "data.json", {"address": "Nytorv 1", "price": 1})
+    _write_json(output / "empty_data" / "data.json", {})
+    (output / "broken").mkdir()
+    (output / "broken" / "data.json").write_text("{", encoding="utf-8")
+    _write_json(
+        output / "legacy" / "data.json",
+        {"address": "Nytorv 2", "price": 2, "lattitude": 55.6, "longitude": 12.5, "extra": 1},
+    )
+
+
+def test_dry_run_reports_without_changing_anything(tmp_path):
+    output = tmp_path / "output"
+    _make_tree(output)
+    before = sorted(str(path) for path in output.rglob("*"))
+    report = maintain(str(output), dry_run=True)
+    assert sorted(str(path) for path in output.rglob("*")) == before
+    assert report["rename_folders"] == [
+        (str(output / "with space"), str(output / "with_space"))
+    ]
+    assert report["remove_empty_folders"] == [(str(output / "empty" / "nested"), "")]
+    assert report["remove_empty_data"] == [
+        (str(output / "broken"), "invalid json"),
+        (str(output / "empty_data"), ""),
+    ]
+    assert [entry[0] for entry in report["normalize_data"]] == [
+        str(output / "legacy" / "data.json")
+    ]
+
+
+def test_all_operations_in_one_pass(tmp_path):
+    output = tmp_path / "output"
+    _make_tree(output)
+    maintain(str(output))
+    assert sorted(os.listdir(output)) == ["legacy", "with_space"]
+    data = json.loads((output / "legacy" / "data.json").read_text(encoding="utf-8"))
+    assert (data["lat"], data["lng"]) == (55.6, 12.5)
+    assert "lattitude" not in data and "extra" not in data
+
+
+def test_folders_in_flight_are_bounded(tmp_path, monkeypatch):
+    output = tmp_path / "output"
+    for number in range(200):
+        _write_json(output / f"bolig{number}" / "data.json", {"address": f"Nytorv {number}"})
+    lock = threading.Lock()
+    counts = {"scanned": 0, "done": 0, "most_ahead": 0}
+    scan_folders = folder_tools._scan_folders  # pylint: disable=protected-access
+    maintain_folder = folder_tools._maintain_folder  # pylint: disable=protected-access
+
+    def _counting_scan(path):
+        for folder in scan_folders(path):
+            with lock:
+                counts["scanned"] += 1
+                counts["most_ahead"] = max(
+                    counts["most_ahead"], counts["scanned"] - counts["done"]
+                )
+            yield folder
+
+    def _slow_maintain(*args):
+        time.sleep(0.001)
+        actions = maintain_folder(*args)
+        with lock:
+            counts["done"] += 1
+        return actions
+
+    monkeypatch.setattr(folder_tools, "_scan_folders", _counting_scan)
+    monkeypatch.setattr(folder_tools, "_maintain_folder", _slow_maintain)
+    maintain(str(output), ["list_missing_data"], workers=2, dry_run=True)
+    assert counts["done"] == 200
+    assert counts["most_ahead"] <= 2 * 4 + 1
@@ -0,0 +1,75 @@
+"""Tests for the latency tracking and hedging of GET requests."""
+
+import threading
+import time
+import requests
+from hedging import HedgedSession, LatencyTracker
+
+
+def test_latency_tracker_estimates_the_quantile():
+    tracker = LatencyTracker(window=160)
+    assert tracker.estimate() is None
+    for seconds in range(1, 161):
+        tracker.add(seconds / 100)
+    assert len(tracker) == 160
+    # The 153rd of 160 response times
+    assert tracker.estimate() == 1.53
+
+
+def test_latency_tracker_keeps_only_the_window():
+    tracker = LatencyTracker(window=32)
+    for _ in range(64):
+        tracker.add(10.0)
+    for _ in range(32):
+        tracker.add(0.1)
+    assert len(tracker) == 32
+    assert tracker.estimate() == 0.1
+
+
+def test_latency_tracker_estimate_is_refreshed_every_16_responses():
+    tracker = LatencyTracker()
+    tracker.add(1.0)
+    assert tracker.estimate() == 1.0
+    for _ in range(14):
+        tracker.add(2.0)
+    assert tracker.estimate() == 1.0
+    tracker.add(2.0)
+    assert tracker.estimate() == 2.0
+
+
+class _FakeResponse:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.closed = threading.Event()
+
+    def close(self) -> None:
+        self.closed.set()
+
+
+class _FakeSession:
+    """Answers the first request at once, the second after a second and the third at once."""
+
+    def __init__(self) -> None:
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            response = _FakeResponse(f"response {len(self.responses)}")
+            self.responses.append(response)
+        if response.name == "response 1":
+            time.sleep(1.0)
+        return response
+
+
+def test_a_slow_request_is_hedged_and_the_loser_closed():
+    session = _FakeSession()
+    hedged = HedgedSession(
+        requests.Session(), enabled=True, budget=1.0, min_samples=1, min_delay=0.01
+    )
+    hedged.get("http://host/warm-up", session=session)
+    response = hedged.get("http://host/slow", session=session)
+    assert response.name == "response 2"
+    assert session.responses[1].closed.wait(5)
+    assert not response.closed.is_set()
+    assert "1 answered first by the hedge" in hedged.summary()
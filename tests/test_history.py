@@ -0,0 +1,53 @@
+"""Tests for the price history."""
+
+from history import HistoryStore, read_changed_ids
+from record import Bolig
+
+
+def test_only_changes_are_stored(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    store = HistoryStore(path)
+    bolig = Bolig(listing_id="1-1", address="Nytorv 1", price=2_000_000, size=80)
+    assert store.record(bolig, "2024-01-01T00:00:00")["price"] == 2_000_000
+    assert store.record(bolig, "2024-02-01T00:00:00") == {}
+    bolig.price = 1_900_000
+    assert store.record(bolig, "2024-03-01T00:00:00") == {"price": 1_900_000}
+    store.close()
+
+    with open(path, "r", encoding="utf-8") as file:
+        assert len(file.readlines()) == 2
+    reopened = HistoryStore(path)
+    assert reopened.price_trajectory("1-1") == [
+        ("2024-01-01T00:00:00", 2_000_000),
+        ("2024-03-01T00:00:00", 1_900_000),
+    ]
+    assert reopened.price_changed_since("2024-02-15") == {"1-1": (2_000_000, 1_900_000)}
+    assert reopened.price_changed_since("2024-04-01") == {}
+
+
+def test_only_the_given_fields_are_compared(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.jsonl"))
+    store.record(Bolig(listing_id="1-1", price=2_000_000, size=80), "2024-01-01T00:00:00")
+    # A tile only knows the price, the unknown size is not a change
+    tile = Bolig(listing_id="1-1", price=2_000_000)
+    assert store.record(tile, "2024-02-01T00:00:00", ("price",)) == {}
+    store.close()
+
+
+def test_changed_ids_are_read_from_where_the_last_read_stopped(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    assert read_changed_ids(path) == (set(), 0)
+    store = HistoryStore(path)
+    store.record(Bolig(listing_id="1-1", price=1), "2024-01-01T00:00:00")
+    store.record(Bolig(listing_id="2-2", price=2), "2024-01-01T00:00:00")
+    changed, offset = read_changed_ids(path)
+    assert changed == {"1-1", "2-2"}
+
+    store.record(Bolig(listing_id="2-2", price=3), "2024-02-01T00:00:00")
+    with open(path, "a", encoding="utf-8") as file:
+        # A line still being written is left for the next read
+        file.write('{"id": "3-3"')
+    changed, next_offset = read_changed_ids(path, offset)
+    assert changed == {"2-2"}
+    assert read_changed_ids(path, next_offset)[0] == set()
+    store.close()
@@ -0,0 +1,53 @@
+"""Tests for reading HTML pages only as far as they are needed."""
+
+from html_stream import read_until
+
+PAGE = (
+    b'<html><body><h1 class="title main">Vej 1</h1><span class="price">1.000 kr.</span>'
+    b'<div class="facts"><div class="fact">A</div><div class="fact">B</div></div>'
+    + b'<div class="carousel">' + b"<img>" * 2000 + b"</div></body></html>"
+)
+
+
+class _FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+        self.chunks_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self._body), chunk_size):
+            self.chunks_read += 1
+            yield self._body[start : start + chunk_size]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_reading_stops_once_every_marker_is_closed():
+    response = _FakeResponse(PAGE)
+    source, stopped = read_until(response, (("span", "price"), ("div", "facts")), 64)
+    assert stopped
+    assert response.closed
+    assert b'<div class="fact">B</div></div>' in source
+    assert len(source) < len(PAGE)
+    assert response.chunks_read == -(-len(source) // 64)
+
+
+def test_a_marker_matches_one_class_or_the_whole_attribute():
+    for marker in (("h1", "title"), ("h1", "title main"), ("h1", None)):
+        source, stopped = read_until(_FakeResponse(PAGE), (marker,), 64)
+        assert stopped and len(source) < len(PAGE)
+    _, stopped = read_until(_FakeResponse(PAGE), (("h1", "main title"),), 64)
+    assert not stopped
+
+
+def test_the_whole_page_is_read_without_markers_or_when_one_is_missing():
+    for markers in ((), (("span", "price"), ("footer", None))):
+        response = _FakeResponse(PAGE)
+        source, stopped = read_until(response, markers, 64)
+        assert source == PAGE
+        assert not stopped
+        assert response.closed
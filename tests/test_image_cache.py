@@ -0,0 +1,65 @@
+"""Tests for the floorplan cache."""
+
+import os
+import numpy as np
+from PIL import Image
+import image_cache
+from image_cache import ImageCache, build_cache, load_floorplan
+
+
+def _write_floorplan(output, listing_id, color):
+    os.makedirs(output / listing_id, exist_ok=True)
+    Image.new("RGB", (64, 32), color).save(output / listing_id / "0.jpg", quality=100)
+
+
+def test_appends_fill_the_last_shard_in_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "SHARD_SIZE", 3)
+    output, cache_path = tmp_path / "output", str(tmp_path / "cache")
+    _write_floorplan(output, "a", (255, 0, 0))
+    _write_floorplan(output, "b", (0, 0, 255))
+    build_cache(str(output), cache_path, workers=1)
+    first_shard = tmp_path / "cache" / "shard_00000.npy"
+    inode = os.stat(first_shard).st_ino
+
+    for listing_id, color in (("c", (0, 255, 0)), ("d", (0, 0, 0)), ("e", (255, 255, 0))):
+        _write_floorplan(output, listing_id, color)
+    # The same floorplan as a is stored once
+    _write_floorplan(output, "f", (255, 0, 0))
+    cache = build_cache(str(output), cache_path, workers=1)
+
+    assert os.stat(first_shard).st_ino == inode
+    assert [shard["rows"] for shard in cache.shards] == [3, 2]
+    assert len(cache) == 6
+    cache = ImageCache(cache_path)
+    floorplan = cache.get("c")
+    assert floorplan.shape == (image_cache.IMAGE_SIZE, image_cache.IMAGE_SIZE, 3)
+    # The floorplan is centered on white
+    center = image_cache.IMAGE_SIZE // 2
+    assert floorplan[center, center, 1] > 250 and floorplan[center, center, 0] < 5
+    assert tuple(floorplan[0, 0]) == (255, 255, 255)
+    np.testing.assert_array_equal(cache.get("a"), cache.get("f"))
+
+
+def test_changed_floorplans_are_decoded_again(tmp_path):
+    output, cache_path = tmp_path / "output", str(tmp_path / "cache")
+    _write_floorplan(output, "a", (255, 0, 0))
+    build_cache(str(output), cache_path, workers=1)
+    _write_floorplan(output, "a", (0, 0, 255))
+    os.utime(output / "a" / "0.jpg", ns=(1, 1))
+    cache = build_cache(str(output), cache_path, workers=1)
+    center = image_cache.IMAGE_SIZE // 2
+    assert cache.get("a")[center, center, 2] > 250
+
+
+def test_undecodable_floorplans_are_skipped(tmp_path, monkeypatch):
+    output = tmp_path / "output"
+    _write_floorplan(output, "a", (255, 0, 0))
+    os.makedirs(output / "b")
+    (output / "b" / "0.jpg").write_bytes(b"not a jpeg")
+    cache = build_cache(str(output), str(tmp_path / "cache"), workers=1)
+    assert "a" in cache and "b" not in cache
+    assert len(cache.failed) == 1
+
+    # A floorplan too large to decode safely is skipped like any other bad file
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    assert load_floorplan((str(output / "a" / "0.jpg"), 32)) is None
@@ -0,0 +1,78 @@
+"""Tests for the training data loader."""
+
+import json
+import os
+import threading
+import numpy as np
+from PIL import Image
+from loader import FEATURES, DataLoader, bolig_features
+from record import Bolig
+
+
+def _make_split(split_path, count):
+    for number in range(count):
+        folder = split_path / f"{100_000 + number}-{200_000 + number}"
+        os.makedirs(folder)
+        bolig = {"postal_code": 2100, "price": 1_000_000 + number, "size": 50 + number}
+        (folder / "data.json").write_text(json.dumps(bolig), encoding="utf-8")
+        Image.new("RGB", (8, 8), (number, 0, 0)).save(folder / "0.jpg")
+
+
+def _epoch(loader, epoch=0):
+    return list(loader.iter_epoch(epoch))
+
+
+def _prices(batches):
+    column = FEATURES.index("price")
+    return [int(price) for features, _ in batches for price in features[:, column]]
+
+
+def test_batches_do_not_depend_on_the_number_of_workers(tmp_path):
+    _make_split(tmp_path, 45)
+    args = {"batch_size": 8, "shuffle_buffer": 10, "image_size": 16}
+    serial = _epoch(DataLoader(str(tmp_path), workers=0, **args))
+    threaded = _epoch(DataLoader(str(tmp_path), workers=3, **args))
+    assert [len(features) for features, _ in serial] == [8, 8, 8, 8, 8, 5]
+    for (features, floorplans), (threaded_features, threaded_floorplans) in zip(serial, threaded):
+        np.testing.assert_array_equal(features, threaded_features)
+        np.testing.assert_array_equal(floorplans, threaded_floorplans)
+    assert serial[0][1].shape == (8, 16, 16, 3)
+    assert sorted(_prices(serial)) == [1_000_000 + number for number in range(45)]
+    # Each epoch is shuffled differently
+    assert _prices(serial) != _prices(_epoch(DataLoader(str(tmp_path), workers=0, **args), 1))
+
+
+def test_shards_split_each_epoch(tmp_path):
+    _make_split(tmp_path, 20)
+    shards = [
+        DataLoader(str(tmp_path), batch_size=4, workers=0, shard=shard, shards=3, image_size=16)
+        for shard in range(3)
+    ]
+    prices = [_prices(_epoch(loader)) for loader in shards]
+    assert sorted(sum(prices, [])) == [1_000_000 + number for number in range(20)]
+    assert [len(loader) for loader in shards] == [2, 2, 2]
+
+
+def test_drop_last_skips_the_short_batch(tmp_path):
+    _make_split(tmp_path, 10)
+    loader = DataLoader(str(tmp_path), batch_size=4, workers=2, drop_last=True, image_size=16)
+    assert len(loader) == 2
+    assert [len(features) for features, _ in loader] == [4, 4]
+
+
+def test_stopping_early_ends_the_prefetch_thread(tmp_path):
+    _make_split(tmp_path, 30)
+    loader = DataLoader(str(tmp_path), batch_size=2, workers=2, image_size=16)
+    batches = iter(loader)
+    next(batches)
+    batches.close()
+    assert "loader-prefetch" not in [thread.name for thread in threading.enumerate()]
+
+
+def test_features_of_a_bolig():
+    bolig = Bolig(postal_code=2100, price=2_000_000, size=80, energy_label="c2")
+    features = bolig_features(bolig)
+    assert features.dtype == np.float32
+    assert features[FEATURES.index("energy_label")] == 2
+    assert features[FEATURES.index("price")] == 2_000_000
+    assert np.isnan(features[FEATURES.index("rooms")])
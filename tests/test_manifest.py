@@ -0,0 +1,68 @@
+"""Tests for the content hash manifests."""
+
+import tarfile
+import pytest
+import manifest
+
+
+@pytest.fixture(name="output")
+def _output(tmp_path):
+    output = tmp_path / "output"
+    for name, content in (("a", "1"), ("b", "2"), ("c", "3")):
+        (output / name).mkdir(parents=True)
+        (output / name / "data.json").write_text(content, encoding="utf-8")
+    return output
+
+
+def test_manifests_round_trip(output, tmp_path):
+    built = manifest.build_manifest(str(output), workers=2)
+    assert list(built) == ["a", "b", "c"]
+    path = str(tmp_path / "manifest.tsv")
+    digest = manifest.write_manifest(built, path)
+    assert manifest.read_manifest(path) == built
+    assert digest == manifest.manifest_digest(built)
+    assert (tmp_path / "manifest.tsv").read_text(encoding="utf-8").startswith("# digest\t")
+
+
+def test_diff_finds_added_removed_and_changed_folders(output):
+    old = manifest.build_manifest(str(output))
+    assert manifest.diff(old, manifest.build_manifest(str(output))) == {
+        "added": [],
+        "removed": [],
+        "changed": [],
+    }
+    (output / "b" / "data.json").write_text("changed", encoding="utf-8")
+    (output / "d").mkdir()
+    (output / "d" / "data.json").write_text("4", encoding="utf-8")
+    for path in (output / "a").iterdir():
+        path.unlink()
+    (output / "a").rmdir()
+    new = manifest.build_manifest(str(output))
+    assert manifest.manifest_digest(new) != manifest.manifest_digest(old)
+    assert manifest.diff(old, new) == {"added": ["d"], "removed": ["a"], "changed": ["b"]}
+
+
+def test_unchanged_folders_are_not_hashed_again(output, monkeypatch):
+    previous = manifest.build_manifest(str(output))
+
+    def _fail(path):
+        raise AssertionError(f"{path} was hashed again")
+
+    monkeypatch.setattr(manifest, "_hash_file", _fail)
+    assert manifest.build_manifest(str(output), previous) == previous
+
+
+def test_temporary_files_are_not_hashed_or_exported(output, tmp_path):
+    old = manifest.build_manifest(str(output))
+    (output / "a" / "data.json.123.tmp").write_text("half written", encoding="utf-8")
+    assert manifest.build_manifest(str(output), old) == old
+
+    (output / "a" / "data.json").write_text("changed", encoding="utf-8")
+    new = manifest.build_manifest(str(output))
+    archive_path = str(tmp_path / "changes.tar")
+    changes = manifest.export_changes(str(output), old, new, archive_path)
+    assert changes["changed"] == ["a"]
+    with tarfile.open(archive_path) as archive:
+        names = archive.getnames()
+        assert sorted(names) == ["a", "a/data.json", manifest.MANIFEST_PATH, manifest.REMOVED_FILE]
+        assert archive.extractfile("a/data.json").read() == b"changed"
@@ -0,0 +1,41 @@
+"""Tests for the NDJSON writer."""
+
+import io
+import time
+from ndjson import NdjsonWriter
+
+
+def test_lines_are_written_in_order():
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream, batch_size=3)
+    for i in range(10):
+        writer.write(f'{{"i": {i}}}')
+    writer.close()
+    assert stream.getvalue() == "".join(f'{{"i": {i}}}\n' for i in range(10))
+    assert writer.lines == 10
+
+
+def test_a_waiting_line_is_flushed_after_the_interval():
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream, batch_size=100, flush_interval=0.05)
+    writer.write("{}")
+    deadline = time.monotonic() + 5
+    while not stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stream.getvalue() == "{}\n"
+    writer.close()
+
+
+class _ClosedPipe(io.StringIO):
+    def write(self, text):
+        raise BrokenPipeError()
+
+
+def test_a_closed_reader_sets_broken_and_drops_the_rest(capsys):
+    writer = NdjsonWriter(_ClosedPipe(), batch_size=1)
+    writer.write("{}")
+    assert writer.broken.wait(5)
+    writer.write("{}")
+    writer.close()
+    assert writer.lines == 0
+    assert "The output stream was closed" in capsys.readouterr().err
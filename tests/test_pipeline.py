@@ -0,0 +1,102 @@
+"""Tests for the threaded pipeline."""
+
+import threading
+import time
+import pytest
+from pipeline import Stage, run_pipeline
+
+
+def test_items_go_through_all_stages():
+    stages = [
+        Stage("double", lambda item: [item * 2], workers=3),
+        Stage("even", lambda item: [item] if item % 4 == 0 else None, workers=2),
+    ]
+    assert sorted(run_pipeline(range(10), stages)) == [0, 4, 8, 12, 16]
+
+
+def test_a_stage_can_yield_several_items():
+    stages = [Stage("split", lambda item: [item, item])]
+    assert sorted(run_pipeline(range(3), stages)) == [0, 0, 1, 1, 2, 2]
+
+
+def test_stage_errors_drop_only_their_item(capsys):
+    def _fail_on_three(item):
+        if item == 3:
+            raise ValueError("three")
+        return [item]
+
+    assert sorted(run_pipeline(range(5), [Stage("check", _fail_on_three)])) == [0, 1, 2, 4]
+    assert "Error in check stage: three" in capsys.readouterr().out
+
+
+def test_source_errors_are_raised_after_the_items_fed_before():
+    def _source():
+        yield from range(3)
+        raise RuntimeError("listing page failed")
+
+    results = []
+    with pytest.raises(RuntimeError, match="listing page failed"):
+        for item in run_pipeline(_source(), [Stage("copy", lambda item: [item], workers=2)]):
+            results.append(item)
+    assert sorted(results) == [0, 1, 2]
+
+
+def test_full_queues_pause_the_source():
+    pulled = []
+
+    def _source():
+        for item in range(1000):
+            pulled.append(item)
+            yield item
+
+    results = run_pipeline(
+        _source(), [Stage("copy", lambda item: [item], workers=1, queue_size=1)], 1
+    )
+    next(results)
+    time.sleep(0.2)
+    # One item in each queue, one held by the worker, one by the feed and the one consumed
+    assert len(pulled) <= 6
+    assert len(list(results)) == 999
+
+
+def test_stop_ends_the_pipeline_early():
+    stop = threading.Event()
+
+    def _source():
+        for item in range(1000):
+            if item == 10:
+                stop.set()
+            yield item
+
+    results = list(run_pipeline(_source(), [Stage("copy", lambda item: [item])], stop=stop))
+    assert len(results) <= 10
+
+
+def test_stopping_early_ends_all_threads():
+    pulled = []
+
+    def _source():
+        for item in range(1000):
+            pulled.append(item)
+            yield item
+
+    results = run_pipeline(
+        _source(), [Stage("copy", lambda item: [item], workers=2, queue_size=1)], 1
+    )
+    next(results)
+    results.close()
+    assert len(pulled) < 1000
+    names = [thread.name for thread in threading.enumerate()]
+    assert "feed" not in names and "copy-0" not in names and "copy-1" not in names
+
+
+def test_source_errors_are_printed_when_stopping_early(capsys):
+    def _source():
+        yield 1
+        raise RuntimeError("listing page failed")
+
+    results = run_pipeline(_source(), [Stage("copy", lambda item: [item])])
+    next(results)
+    time.sleep(0.1)
+    results.close()
+    assert "Error in feed: listing page failed" in capsys.readouterr().out
@@ -0,0 +1,59 @@
+"""Tests for the Bolig record."""
+
+import json
+import pytest
+from record import FIELD_NAMES, Bolig, load_bolig, save_bolig
+
+
+def test_validate_converts_the_field_types():
+    bolig = Bolig(price="2500000", size=85.0, lat="55.1", postal_code="2100", address="")
+    assert bolig.price == 2_500_000 and type(bolig.price) is int
+    assert bolig.size == 85 and type(bolig.size) is int
+    assert bolig.lat == 55.1
+    assert bolig.postal_code == 2100
+    assert bolig.address is None
+
+
+def test_validate_rejects_values_of_the_wrong_type():
+    with pytest.raises(ValueError, match="price"):
+        Bolig(price="on request")
+
+
+def test_zero_lookups_are_stored_as_not_found():
+    bolig = Bolig(lat=0, lng=0, postal_avg_sqm_price=0)
+    assert bolig.lat is None and bolig.lng is None and bolig.postal_avg_sqm_price is None
+    assert bolig.not_found == ("coordinates", "postal_avg_sqm_price")
+    assert bolig.is_looked_up("coordinates")
+    assert not Bolig().is_looked_up("coordinates")
+
+
+def test_a_found_lookup_clears_not_found():
+    bolig = Bolig()
+    bolig.set_coordinates((0, 0))
+    bolig.set_postal_avg_sqm_price(None)
+    assert bolig.not_found == ("coordinates", "postal_avg_sqm_price")
+    bolig.set_coordinates((55.7, 12.5))
+    assert (bolig.lat, bolig.lng) == (55.7, 12.5)
+    assert bolig.not_found == ("postal_avg_sqm_price",)
+
+
+def test_unknown_not_found_names_are_rejected():
+    with pytest.raises(ValueError, match="not_found"):
+        Bolig(not_found=["price"])
+
+
+def test_not_found_is_stored_only_when_not_empty(tmp_path):
+    assert "not_found" not in Bolig(listing_id="1-2").to_dict()
+    assert "not_found" not in FIELD_NAMES
+    assert len(Bolig().to_row()) == len(FIELD_NAMES)
+
+    path = tmp_path / "data.json"
+    save_bolig(path, Bolig(listing_id="1-2", lat=0, lng=0))
+    assert json.loads(path.read_text(encoding="utf-8"))["not_found"] == ["coordinates"]
+    assert load_bolig(path).is_looked_up("coordinates")
+
+
+def test_legacy_keys_are_read_and_unknown_keys_ignored():
+    bolig = Bolig.from_dict({"lattitude": 55.1, "longitude": 12.2, "garden": True})
+    assert (bolig.lat, bolig.lng) == (55.1, 12.2)
+    assert Bolig.from_json(bolig.to_json()) == bolig
@@ -0,0 +1,97 @@
+"""Tests for reading sitemaps."""
+
+import gzip
+import requests
+from sitemap import iter_sitemap_urls
+
+NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _urlset(urls: list) -> bytes:
+    entries = "".join(f"<url><loc>{url}</loc></url>" for url in urls)
+    return f'<?xml version="1.0"?><urlset xmlns="{NAMESPACE}">{entries}</urlset>'.encode()
+
+
+def _index(sitemaps: list) -> bytes:
+    entries = "".join(f"<sitemap><loc>{url}</loc></sitemap>" for url in sitemaps)
+    return (
+        f'<?xml version="1.0"?><sitemapindex xmlns="{NAMESPACE}">{entries}</sitemapindex>'
+    ).encode()
+
+
+class _FakeResponse:
+    def __init__(self, body: bytes, drop_after: int = -1) -> None:
+        self._body = body
+        self._drop_after = drop_after
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int):
+        body = self._body if self._drop_after < 0 else self._body[: self._drop_after]
+        for start in range(0, len(body), 100):
+            yield body[start : start + 100]
+        if self._drop_after >= 0:
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+
+class _FakeSession:
+    def __init__(self, pages: dict) -> None:
+        self.pages = pages
+        self.responses = []
+
+    def get(self, url, **kwargs):
+        response = self.pages[url]
+        self.responses.append(response)
+        return response
+
+
+def test_indexes_and_gzipped_sitemaps_are_followed():
+    pages_urls = [f"https://site/page/{i}" for i in range(3)]
+    boliger_urls = [f"https://site/bolig/{i}" for i in range(200)]
+    session = _FakeSession(
+        {
+            "https://site/sitemap.xml": _FakeResponse(
+                _index(["https://site/sitemap-pages.xml", "https://site/sitemap-boliger.xml.gz"])
+            ),
+            "https://site/sitemap-pages.xml": _FakeResponse(_urlset(pages_urls)),
+            "https://site/sitemap-boliger.xml.gz": _FakeResponse(
+                gzip.compress(_urlset(boliger_urls))
+            ),
+        }
+    )
+    urls = list(iter_sitemap_urls("https://site/sitemap.xml", session, include=("boliger",)))
+    assert urls == boliger_urls
+    assert len(session.responses) == 2
+
+
+def test_urls_are_yielded_after_the_sitemap_is_read():
+    session = _FakeSession(
+        {"https://site/sitemap.xml": _FakeResponse(_urlset(["https://site/a", "https://site/b"]))}
+    )
+    for _ in iter_sitemap_urls("https://site/sitemap.xml", session):
+        assert session.responses[0].closed
+
+
+def test_a_sitemap_that_ends_early_is_reported(capsys):
+    body = _urlset([f"https://site/bolig/{i}" for i in range(100)])
+    session = _FakeSession({"https://site/sitemap.xml": _FakeResponse(body, len(body) // 2)})
+    urls = list(iter_sitemap_urls("https://site/sitemap.xml", session))
+    assert 0 < len(urls) < 100
+    assert urls == [f"https://site/bolig/{i}" for i in range(len(urls))]
+    assert f"ended early, after {len(urls)} entries" in capsys.readouterr().out
+
+
+def test_a_truncated_gzip_sitemap_is_reported(capsys):
+    body = gzip.compress(_urlset([f"https://site/bolig/{i}" for i in range(1000)]))
+    session = _FakeSession({"https://site/sitemap.xml.gz": _FakeResponse(body[: len(body) // 2])})
+    urls = list(iter_sitemap_urls("https://site/sitemap.xml.gz", session))
+    assert len(urls) < 1000
+    assert "ended early" in capsys.readouterr().out
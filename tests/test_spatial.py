@@ -0,0 +1,71 @@
+"""Tests for the spatial index and the neighbourhood features."""
+
+import numpy as np
+import pandas as pd
+from spatial import SpatialIndex, neighbourhood_features, project
+
+
+def _brute_force_knn(points, ids, point, k):
+    distances = np.linalg.norm(points - point, axis=1)
+    nearest = np.argsort(distances, kind="stable")[:k]
+    return distances[nearest], ids[nearest]
+
+
+def _check_against_brute_force(index, lat, lng, ids, queries):
+    points = project(lat, lng)
+    for query_lat, query_lng in queries:
+        point = project(query_lat, query_lng)[0]
+        distances, found = index.knn(query_lat, query_lng, 5)
+        expected_distances, expected_ids = _brute_force_knn(points, ids, point, 5)
+        np.testing.assert_allclose(distances, expected_distances)
+        assert list(found) == list(expected_ids)
+
+        within = ids[np.linalg.norm(points - point, axis=1) <= 800]
+        assert sorted(index.radius(query_lat, query_lng, 800)) == sorted(within)
+
+
+def test_queries_match_brute_force_before_and_after_a_rebuild():
+    rng = np.random.default_rng(3)
+    lat = rng.uniform(55.6, 55.7, 400)
+    lng = rng.uniform(12.5, 12.6, 400)
+    ids = np.array([f"id{i}" for i in range(400)], dtype=object)
+    queries = list(zip(rng.uniform(55.6, 55.7, 20), rng.uniform(12.5, 12.6, 20)))
+
+    index = SpatialIndex(rebuild_fraction=0.1)
+    index.add(ids[:300], lat[:300], lng[:300])
+    # A few boliger stay in the buffer and are searched directly
+    index.add(ids[300:320], lat[300:320], lng[300:320])
+    assert len(index._buffer_ids) == 1  # pylint: disable=protected-access
+    _check_against_brute_force(index, lat[:320], lng[:320], ids[:320], queries)
+
+    # More than 10% of the tree triggers a rebuild
+    index.add(ids[320:], lat[320:], lng[320:])
+    assert not index._buffer_ids  # pylint: disable=protected-access
+    assert len(index) == 400
+    _check_against_brute_force(index, lat, lng, ids, queries)
+
+
+def test_an_empty_index_finds_nothing():
+    index = SpatialIndex()
+    distances, ids = index.knn(55.6, 12.5, 3)
+    assert len(distances) == len(ids) == 0
+    assert len(index.radius(55.6, 12.5, 1000)) == 0
+
+
+def test_neighbourhood_features_leave_out_the_bolig_itself():
+    boliger = pd.DataFrame(
+        {
+            "lat": [55.60, 55.60, 55.601, 0.0],
+            "lng": [12.50, 12.50, 12.501, 0.0],
+            "price": [1_000_000, 2_000_000, 3_000_000, 4_000_000],
+            "size": [100, 100, 100, 100],
+            "type": ["Villa", "Villa", "Villa", "Villa"],
+        }
+    )
+    features = neighbourhood_features(boliger, k=1, radius_m=50)
+    # The first two share their coordinates, so each is the nearest neighbour of the other
+    assert features.loc[0, "knn_median_sqm_price"] == 20_000
+    assert features.loc[1, "knn_median_sqm_price"] == 10_000
+    assert features.loc[0, "knn_mean_distance"] == 0
+    assert features.loc[0, "radius_count"] == 1
+    assert features.loc[3].isna().all()
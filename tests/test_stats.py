@@ -0,0 +1,82 @@
+"""Tests for the market statistics."""
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import stats
+from history import HistoryStore
+from record import Bolig, load_bolig, save_bolig
+
+
+def _boliger(rows: list) -> pd.DataFrame:
+    return pd.DataFrame.from_records(rows, columns=stats.BOLIG_COLUMNS)
+
+
+def test_summary_of_one_postal_code():
+    boliger = _boliger(
+        [
+            (2100, 2_000_000, 50, 2, "C", 1932),
+            (2100, 4_000_000, 100, 4, "a2020", 2015),
+            (2100, None, 80, 3, None, None),
+        ]
+    )
+    summary = stats.summarize(stats.aggregate(boliger))
+    row = summary.loc[2100]
+    assert row["count"] == 3
+    assert row["mean_price"] == 3_000_000
+    assert row["mean_sqm_price"] == 40_000
+    assert row["mean_price_per_room"] == 1_000_000
+    # The quantiles are the middle of a logarithmic bin, within 1.4% of the true value
+    assert abs(row["median_sqm_price"] / 40_000 - 1) < 0.015
+    assert (row["energy_label_a"], row["energy_label_c"], row["energy_label_unknown"]) == (1, 1, 1)
+    assert (row["built_1930s"], row["built_2010s"], row["built_unknown"]) == (1, 1, 1)
+    assert list(summary.index) == [2100]
+
+
+def test_subtract_undoes_merge():
+    first = stats.aggregate(_boliger([(2100, 2_000_000, 50, 2, "c", 1932)]))
+    second = stats.aggregate(_boliger([(8000, 3_000_000, 60, 3, "b", 1990)]))
+    merged = stats.merge(first, second)
+    for key, value in stats.subtract(merged, second).items():
+        np.testing.assert_array_equal(value, first[key])
+
+
+def test_boliger_without_a_postal_code_are_left_out():
+    boliger = _boliger([(stats.NO_POSTAL_CODE, 2_000_000, 50, 2, "c", 1932)])
+    assert stats.summarize(stats.aggregate(boliger)).empty
+
+
+def test_updates_match_a_rebuild(tmp_path):
+    from synthetic import generate  # pylint: disable=import-outside-toplevel
+
+    output = tmp_path / "output"
+    history_path = str(tmp_path / "history.jsonl")
+    state_path = str(tmp_path / "state.npz")
+    generate(str(output), 120)
+    stats.update_stats(str(output), state_path, None, history_path=history_path)
+
+    folders = sorted(os.listdir(output))
+    for folder in folders[:10]:
+        shutil.rmtree(output / folder)
+    history = HistoryStore(history_path)
+    for folder in folders[10:20]:
+        data_path = output / folder / "data.json"
+        bolig: Bolig = load_bolig(data_path)
+        bolig.price = (bolig.price or 1_000_000) * 2
+        save_bolig(data_path, bolig)
+        history.record(bolig, "2024-03-01T12:00:00", ("price",))
+    history.close()
+    generate(str(tmp_path / "more"), 5, seed=7)
+    for folder in os.listdir(tmp_path / "more"):
+        shutil.move(tmp_path / "more" / folder, output / f"new-{folder}")
+
+    updated = stats.update_stats(str(output), state_path, None, history_path=history_path)
+    rebuilt = stats.update_stats(
+        str(output), str(tmp_path / "rebuilt.npz"), None, rebuild=True, history_path=history_path
+    )
+    pd.testing.assert_frame_equal(updated, rebuilt)
+    assert updated["count"].sum() == 115
+
+    _, known, _ = stats.load_state(state_path)
+    assert len(known) == 115
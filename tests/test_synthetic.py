@@ -0,0 +1,37 @@
+"""Tests for the synthetic data generator."""
+
+import json
+import os
+from record import load_bolig
+from synthetic import generate, generate_bolig, load_postal_codes
+
+
+def test_the_same_seed_gives_the_same_boliger():
+    postal_codes = load_postal_codes()
+    first = [generate_bolig(index, 42, postal_codes) for index in range(50)]
+    second = [generate_bolig(index, 42, postal_codes) for index in range(50)]
+    assert first == second
+    assert len({bolig.listing_id for bolig in first}) == 50
+
+
+def test_different_seeds_do_not_share_listing_ids():
+    postal_codes = load_postal_codes()
+    first = {generate_bolig(index, 42, postal_codes).listing_id for index in range(100)}
+    second = {generate_bolig(index, 7, postal_codes).listing_id for index in range(100)}
+    assert not first & second
+
+
+def test_tree_and_ndjson_hold_the_same_boliger(tmp_path):
+    generate(str(tmp_path / "tree"), 20, workers=1)
+    generate(str(tmp_path / "boliger.ndjson"), 20, output_format="ndjson")
+
+    folders = sorted(os.listdir(tmp_path / "tree"))
+    assert len(folders) == 20
+    assert all((tmp_path / "tree" / folder / "0.jpg").exists() for folder in folders)
+    tree = {
+        folder: load_bolig(tmp_path / "tree" / folder / "data.json").to_dict()
+        for folder in folders
+    }
+    with open(tmp_path / "boliger.ndjson", "r", encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file]
+    assert {line["listing_id"]: line for line in lines} == tree